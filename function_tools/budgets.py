@@ -0,0 +1,96 @@
+import threading
+from typing import (
+    Optional,
+    Union,
+)
+
+from function_tools.strings import (
+    MEMORY_BUDGET_LIMIT_ERROR,
+)
+
+
+# Оценка дополнительной памяти на строку кеша сверх размера объекта:
+# элемент списка объектов, элемент хеш-таблицы и вторичных индексов
+ROW_OVERHEAD_SIZE = 120
+
+
+class MemoryBudget:
+    """
+    Бюджет памяти кешей.
+
+    Кеш перед загрузкой оценивает требуемую память и резервирует ее в
+    бюджете. Если резервирование не удалось, то кеш хранит строки на диске
+    (см. EntityCache). Один бюджет может использоваться несколькими кешами,
+    в том числе подготавливаемыми параллельно, например, всеми кешами
+    хранилища кешей.
+    """
+
+    def __init__(self, limit: int):
+        if limit <= 0:
+            raise ValueError(MEMORY_BUDGET_LIMIT_ERROR)
+
+        self._lock = threading.Lock()
+        self._limit = limit
+        self._reserved_size = 0
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @limit="{self._limit}" '
+            f'@reserved_size="{self._reserved_size}">'
+        )
+
+    def __str__(self):
+        return self.__repr__()
+
+    @property
+    def limit(self) -> int:
+        """
+        Ограничение памяти в байтах
+        """
+        return self._limit
+
+    @property
+    def reserved_size(self) -> int:
+        """
+        Зарезервированная кешами память в байтах
+        """
+        return self._reserved_size
+
+    @property
+    def available_size(self) -> int:
+        """
+        Доступная для резервирования память в байтах
+        """
+        return max(self._limit - self._reserved_size, 0)
+
+    def reserve(self, size: int) -> bool:
+        """
+        Резервирование памяти. Возвращает False, если резервирование
+        превысит ограничение
+        """
+        with self._lock:
+            is_reserved = self._reserved_size + size <= self._limit
+
+            if is_reserved:
+                self._reserved_size += size
+
+        return is_reserved
+
+    def release(self, size: int):
+        """
+        Освобождение зарезервированной памяти
+        """
+        with self._lock:
+            self._reserved_size = max(self._reserved_size - size, 0)
+
+
+def prepare_memory_budget(
+    memory_budget: Optional[Union[int, MemoryBudget]],
+) -> Optional[MemoryBudget]:
+    """
+    Получение бюджета памяти по ограничению в байтах или готовому бюджету
+    """
+    if memory_budget is not None and not isinstance(memory_budget, MemoryBudget):  # noqa
+        memory_budget = MemoryBudget(memory_budget)
+
+    return memory_budget
@@ -1,48 +1,163 @@
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+import weakref
 from collections import (
     Iterable,
     OrderedDict,
     Sequence,
 )
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
 from copy import (
     deepcopy,
 )
 from datetime import (
     date,
 )
+from functools import (
+    partial,
+    reduce,
+    wraps,
+)
 from operator import (
     attrgetter,
+    itemgetter,
+    or_,
+)
+from time import (
+    perf_counter,
 )
 from typing import (
     Any,
+    Callable,
     Dict,
+    Iterator,
     List,
     Optional,
+    Set,
     Tuple,
     Type,
     Union,
 )
 
+from django.core.exceptions import (
+    FieldDoesNotExist,
+)
+from django.db import (
+    connections,
+)
 from django.db.models import (
+    BooleanField,
+    Case,
+    Field,
     Model,
+    Q,
+    Value,
+    When,
 )
 
+from function_tools.budgets import (
+    ROW_OVERHEAD_SIZE,
+    MemoryBudget,
+    prepare_memory_budget,
+)
+from function_tools.decorators import (
+    cache_access,
+)
 from function_tools.enums import (
+    AggregateFunctionEnum,
+    HashTableLayoutEnum,
     TransferPeriodEnum,
 )
+from function_tools.indexes import (
+    BaseIndex,
+    TrieIndex,
+    prepare_index,
+)
+from function_tools.interning import (
+    RelatedEntitiesInterner,
+    ValuesDictionary,
+)
+from function_tools.lookups import (
+    LOOKUP_SEPARATOR,
+    compile_filter_predicate,
+    prepare_filter,
+    prepare_filter_key,
+    split_lookup,
+)
+from function_tools.records import (
+    EntityRecord,
+    prepare_record_class,
+    prepare_record_column,
+    prepare_record_columns,
+)
+from function_tools.snapshots import (
+    EntitySnapshot,
+    SnapshotHashTable,
+    SnapshotRows,
+    write_entity_snapshot,
+)
+from function_tools.statistics import (
+    MEMORY_SAMPLE_SIZE,
+    CacheStatistics,
+    estimate_container_size,
+    estimate_objects_size,
+)
 from function_tools.strings import (
+    CACHE_DEPENDENCIES_CYCLE_ERROR,
+    CACHES_PREPARATION_ERROR,
+    CHANGE_MARKER_FIELD_IS_REQUIRED_ERROR,
     DATE_FROM_MORE_OR_EQUAL_DATE_TO_ERROR,
+    NOT_STRICT_MODE_IS_NOT_SUPPORTED_ERROR,
+    PREFIX_INDEX_IS_REQUIRED_FOR_NOT_STRICT_MODE_ERROR,
+    RELATED_CACHE_FIELD_ERROR,
+    RELATED_CACHE_IS_NOT_BOUND_ERROR,
     SEARCHING_KEY_SIZE_LESS_THAN_DEFAULT_SEARCHING_KEY_ERROR,
     SEARCHING_KEY_SIZE_MORE_THAN_DEFAULT_SEARCHING_KEY_ERROR,
+    SHARED_CACHE_IS_READ_ONLY_ERROR,
+    TRIE_INDEX_IS_REQUIRED_ERROR,
+    UNKNOWN_CACHE_DEPENDENCY_ERROR,
+    UNKNOWN_RELATED_CACHE_ERROR,
 )
 from function_tools.types import (
     QueryType,
 )
 from function_tools.utils import (
+    compile_attrs_getter,
     date2str,
-    deep_getattr,
+    prepare_model_attr_path,
 )
 
 
+# Размер пачки строк при записи кеша на диск, если размер пачки не указан
+SPILL_CHUNK_SIZE = 2000
+
+
+# Параметры создания кешей, действующие в пределах потока. Заполняются
+# хранилищем кешей на время его инициализации
+_caches_creation_settings = threading.local()
+
+
+def is_lazy_caches_creation() -> bool:
+    """
+    Создаются ли кеши по умолчанию ленивыми в текущем потоке
+    """
+    return getattr(_caches_creation_settings, 'lazy', False)
+
+
+def get_caches_creation_memory_budget() -> Optional[MemoryBudget]:
+    """
+    Бюджет памяти кешей, создаваемых в текущем потоке
+    """
+    return getattr(_caches_creation_settings, 'memory_budget', None)
+
+
 class BaseCache:
     """
     Кеш-заглушка
@@ -51,11 +166,159 @@ class BaseCache:
     def __init__(self, *args, **kwargs):
         super().__init__()
 
+        # Было ли обращение к данным кеша
+        self._is_touched = False
+        # Является ли кеш разделяемым между потребителями
+        self._is_shared = False
+        # Статистика подготовки и использования кеша
+        self._statistics = CacheStatistics()
+
+    @property
+    def is_touched(self) -> bool:
+        """
+        Было ли обращение к данным кеша
+        """
+        return self._is_touched
+
+    @property
+    def is_shared(self) -> bool:
+        """
+        Является ли кеш разделяемым между потребителями
+        """
+        return self._is_shared
+
+    def mark_as_shared(self):
+        """
+        Отметка кеша как разделяемого между потребителями. Разделяемый кеш
+        доступен только для чтения
+        """
+        self._is_shared = True
+
+    def _get_rows_count(self) -> int:
+        """
+        Количество строк в кеше без отметки факта обращения к данным. Служит
+        для оценки занимаемой кешем памяти
+        """
+        return 0
+
+    def _get_child_caches(self) -> Dict[str, 'BaseCache']:
+        """
+        Вложенные кеши по наименованиям. Их статистика включается в
+        статистику кеша
+        """
+        return {}
+
+    @property
+    def statistics(self) -> CacheStatistics:
+        """
+        Статистика кеша с учетом статистики вложенных кешей
+        """
+        child_caches = self._get_child_caches()
+
+        if child_caches:
+            statistics = CacheStatistics.sum([
+                self._statistics,
+                *(cache.statistics for cache in child_caches.values()),
+            ])
+        else:
+            statistics = self._statistics
+
+        return statistics
+
+    def _estimate_memory_size(self) -> int:
+        """
+        Приблизительная оценка занимаемой кешем памяти в байтах без учета
+        вложенных кешей
+        """
+        return 0
+
+    def estimate_memory_size(self) -> int:
+        """
+        Оценка занимаемой кешем и вложенными кешами памяти в байтах. Оценка
+        запоминается в статистике кеша
+        """
+        self._statistics.memory_size = self._estimate_memory_size()
+
+        return self._statistics.memory_size + sum(
+            cache.estimate_memory_size()
+            for cache in self._get_child_caches().values()
+        )
+
+    def get_statistics_report(
+        self,
+        estimate_memory: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Формирование отчета о статистике кеша и вложенных кешей в виде
+        словаря, пригодного для сериализации, например, в JSON.
+
+        :param estimate_memory: выполнять ли оценку занимаемой памяти. Оценка
+            требует обхода хеш-таблиц кешей
+        """
+        if estimate_memory:
+            self.estimate_memory_size()
+
+        report = {
+            'cache': repr(self),
+            'statistics': self.statistics.as_dict(),
+        }
+
+        child_caches = self._get_child_caches()
+
+        if child_caches:
+            report['caches'] = OrderedDict(
+                (name, cache.get_statistics_report(estimate_memory=False))
+                for name, cache in child_caches.items()
+            )
+
+        return report
+
+    def _touch(self):
+        """
+        Отметка факта обращения к данным кеша
+        """
+        self._is_touched = True
+
+    def prepare(self):
+        """
+        Принудительная подготовка кеша. Имеет смысл для ленивых кешей
+        """
+
+    def close(self):
+        """
+        Освобождение ресурсов кеша и вложенных кешей: памяти, зарезервированной
+        в бюджете памяти, и строк, хранящихся на диске. Разделяемые вложенные
+        кеши принадлежат реестру разделяемых кешей и не закрываются
+        """
+        if self._is_shared:
+            raise ValueError(SHARED_CACHE_IS_READ_ONLY_ERROR)
+
+        self._close_owned(is_owned=lambda cache: not cache.is_shared)
+
+    def _close_owned(
+        self,
+        is_owned: Callable[['BaseCache'], bool],
+    ):
+        """
+        Освобождение ресурсов кеша и вложенных кешей, которыми он владеет.
+        Вызывается также реестром разделяемых кешей для удаленных из него
+        кешей
+        """
+        for cache in self._get_child_caches().values():
+            if is_owned(cache):
+                cache._close_owned(is_owned)
+
 
 class EntityCache(BaseCache):
     """
     Базовый класс кеша объектов сущности
     """
+
+    # Может ли кеш хранить строки на диске при превышении бюджета памяти
+    supports_spilling = True
+    # Может ли кеш строить индекс префиксов ключей плоской хеш-таблицы
+    supports_prefix_index = True
+
     def __init__(
         self,
         model: Type[Model],
@@ -64,14 +327,96 @@ class EntityCache(BaseCache):
         only_fields: Optional[Tuple[str, ...]] = None,
         additional_filter_params: Optional[Dict[str, Any]] = None,
         searching_key: Union[str, Tuple[str, ...]] = ('pk', ),
+        indexes: Optional[Tuple[Union[str, Tuple[str, ...], BaseIndex], ...]] = None,  # noqa
+        records_mode: bool = False,
+        lazy: Optional[bool] = None,
+        chunk_size: Optional[int] = None,
+        keyset_pagination: bool = False,
+        hash_table_layout: str = HashTableLayoutEnum.NESTED,
+        prefix_index: bool = False,
+        change_marker_field: Optional[str] = None,
+        memory_budget: Optional[Union[int, MemoryBudget]] = None,
+        spill_dir: Optional[str] = None,
+        related_caches: Optional[Dict[str, Union[str, 'EntityCache']]] = None,
+        intern_related_entities: bool = False,
+        dictionary_fields: Optional[Tuple[str, ...]] = None,
         **kwargs,
 
     ):
         super().__init__(*args, **kwargs)
 
         self._model = model
-        self._select_related_fields = select_related_fields
         self._only_fields = only_fields
+
+        # Кеши, по которым разрешаются внешние ключи вместо select_related:
+        # наименование внешнего ключа - кеш либо наименование кеша в
+        # хранилище кешей. Связанные объекты получаются из связанного кеша по
+        # значению колонки внешнего ключа и являются общими для всех
+        # ссылающихся на них объектов кеша
+        self._related_caches: Dict[str, Union[str, EntityCache]] = dict(
+            related_caches or {},
+        )
+        self._related_fields = {
+            field_name: self._prepare_related_field(model, field_name)
+            for field_name in self._related_caches
+        }
+        self._select_related_fields = tuple(
+            field_name
+            for field_name in (select_related_fields or ())
+            if field_name not in self._related_caches
+        )
+
+        # Интернирование связанных объектов, полученных через select_related,
+        # при построении хеш-таблицы: строки, ссылающиеся на одну запись,
+        # получают общий связанный объект вместо собственной копии
+        # (см. RelatedEntitiesInterner)
+        self._intern_related_entities = intern_related_entities
+
+        # Поля с часто повторяющимися значениями (коды, статусы,
+        # наименования), значения которых при загрузке приводятся к общим
+        # объектам по словарю значений колонки. Колоночный кеш хранит такие
+        # поля кодами словаря. В режиме объектов модели поддерживаются только
+        # собственные поля модели. Словари создаются при подготовке кеша
+        self._dictionary_columns = tuple(
+            prepare_record_column(model, field_name)
+            for field_name in (dictionary_fields or ())
+        )
+        self._dictionaries: Dict[str, ValuesDictionary] = {}
+        self._dictionary_items: Tuple[Tuple[Union[int, str], ValuesDictionary], ...] = ()  # noqa
+
+        # Поле-маркер изменения строк (например, дата и время последнего
+        # изменения или первичный ключ) для инкрементального обновления кеша.
+        # Наибольшее значение маркера среди загруженных строк запоминается
+        # после построения кеша
+        self._change_marker_field = change_marker_field
+        self._change_marker_path = (
+            prepare_model_attr_path(model, change_marker_field) if
+            change_marker_field else
+            None
+        )
+        self._change_marker_value = None
+        self._row_indexes_by_pk: Optional[Dict[Any, int]] = None
+
+        # Источник объектов кеша, используемый вместо запроса, например, при
+        # объединении запросов кешей хранилищем
+        self._entities_source: Optional[Callable[[], List[Model]]] = None
+
+        # Бюджет памяти (ограничение в байтах или бюджет, общий для
+        # нескольких кешей). Если бюджет не указан, то используется бюджет
+        # хранилища кешей, в котором создается кеш. Если память, требуемая
+        # для загрузки кеша, не умещается в бюджете, то строки кеша хранятся
+        # в файле во временном каталоге spill_dir
+        self._memory_budget = (
+            get_caches_creation_memory_budget() if
+            memory_budget is None else
+            prepare_memory_budget(memory_budget)
+        )
+        self._spill_dir = spill_dir
+        self._spilled_snapshot: Optional[EntitySnapshot] = None
+        # Резерв памяти в бюджете. Освобождается при повторной подготовке,
+        # ошибке подготовки и закрытии кеша, а если кеш не был закрыт - при
+        # его удалении сборщиком мусора
+        self._memory_reservation: Optional[weakref.finalize] = None
         self._actual_entities_queryset = self._prepare_actual_entities_queryset()  # noqa
 
         self._searching_key = (
@@ -82,14 +427,85 @@ class EntityCache(BaseCache):
             (searching_key, )
         )
 
+        # Пути к значениям частей ключа поиска с заменой на колонки модели, где
+        # это возможно, и функция получения значений ключа, создаваемая
+        # однократно на весь процесс
+        self._searching_key_paths = tuple(
+            prepare_model_attr_path(model, key_item)
+            for key_item in self._searching_key
+        )
+        self._searching_key_getter = compile_attrs_getter(
+            self._searching_key_paths,
+        )
+
         self._additional_filter_params = additional_filter_params or {}
 
+        # Вторичные индексы для ускорения фильтрации объектов кеша
+        self._indexes: Tuple[BaseIndex, ...] = tuple(
+            deepcopy(prepare_index(index))
+            for index in (indexes or ())
+        )
+
+        # Колонки внешних ключей модели по их наименованиям. Условия
+        # фильтрации по внешнему ключу проверяются по его колонке, а значения
+        # внешнего ключа в режиме записей приводятся к объектам модели
+        self._relation_attnames = {
+            field.name: field.attname
+            for field in model._meta.concrete_fields
+            if field.is_relation
+        }
+
+        # В режиме записей вместо объектов модели хранятся компактные записи
+        # со слотами, получаемые через values_list
+        self._records_mode = records_mode
+        self._record_class: Optional[Type[EntityRecord]] = (
+            self._prepare_record_class() if
+            records_mode else
+            None
+        )
+
+        # При указании размера пачки кеш строится в потоковом режиме: строки
+        # получаются пачками через серверный курсор (QuerySet.iterator) или,
+        # при keyset_pagination=True, запросами с сортировкой и отбором по
+        # первичному ключу. Кеш результата QuerySet при этом не заполняется
+        self._chunk_size = chunk_size
+        self._keyset_pagination = keyset_pagination
+
+        # Структура хеш-таблицы. В плоской хеш-таблице ключом является кортеж
+        # значений всех частей ключа поиска. Для поиска по части ключа
+        # (strict_mode=False) в плоской хеш-таблице необходим индекс
+        # префиксов ключей, который строится только при prefix_index=True
+        self._hash_table_layout = hash_table_layout
+        self._is_flat_hash_table = (
+            hash_table_layout == HashTableLayoutEnum.FLAT
+        )
+        self._is_prefix_index_enabled = prefix_index
+
         self._entities = None
+        self._entities_list: List[Model] = []
         self._entities_hash_table = None
-
-        self._before_prepare()
-        self._prepare()
-        self._after_prepare()
+        self._entities_prefix_index: Optional[Dict[Tuple, List[Tuple]]] = None
+
+        # Результаты агрегации по параметрам вызова. Сбрасываются при
+        # подготовке и обновлении кеша
+        self._aggregations: Dict[Tuple, Any] = {}
+
+        # Ленивый кеш выполняет запрос и строит хеш-таблицу при первом
+        # обращении к данным. Если режим не указан явно, то он определяется
+        # хранилищем кешей, в котором создается кеш
+        self._lazy = is_lazy_caches_creation() if lazy is None else lazy
+        self._is_prepared = False
+        # Блокировка подготовки кеша и структур, заполняемых при обращениях к
+        # данным (соответствие первичных ключей номерам строк, результаты
+        # агрегации): кеш может быть общим для нескольких потоков (хранилище
+        # с параллельной подготовкой кешей, реестр разделяемых кешей), и
+        # первые обращения из разных потоков не должны строить кеш
+        # одновременно или видеть недостроенный кеш
+        self._lock = threading.RLock()
+        self._is_preparing = False
+
+        if not self._lazy:
+            self.prepare()
 
     def __repr__(self):
         return (
@@ -101,6 +517,7 @@ class EntityCache(BaseCache):
         return self.__repr__()
 
     @property
+    @cache_access
     def entities(self) -> Union[QueryType[Model], List[Model]]:
         """
         Возвращает список объектов либо QuerySet в зависимости от подхода к
@@ -108,6 +525,199 @@ class EntityCache(BaseCache):
         """
         return self._entities
 
+    def _prepare_record_class(self) -> Type[EntityRecord]:
+        """
+        Получение класса записи для режима записей.
+
+        В запись попадают поля only_fields (или все поля модели), поля ключа
+        поиска и вторичных индексов.
+        """
+        fields = list(
+            self._only_fields or
+            (field.attname for field in self._model._meta.concrete_fields)
+        )
+        fields.extend(self._searching_key_paths)
+
+        for secondary_index in self._indexes:
+            fields.extend(secondary_index.fields)
+
+        if self._change_marker_path:
+            fields.append(self._change_marker_path)
+
+        fields.extend(field.attname for field in self._related_fields.values())
+
+        return prepare_record_class(
+            model=self._model,
+            columns=prepare_record_columns(self._model, fields),
+        )
+
+    def as_model(self, entity: Any) -> Model:
+        """
+        Получение объекта модели по объекту кеша. В режиме записей запись
+        преобразуется в объект модели, иначе объект возвращается как есть.
+        """
+        if isinstance(entity, EntityRecord):
+            entity = entity.to_model(using=self._actual_entities_queryset.db)
+
+        return entity
+
+    def _get_rows_count(self) -> int:
+        return len(self._entities_list)
+
+    def _estimate_memory_size(self) -> int:
+        size = (
+            sys.getsizeof(self._entities_list) +
+            self._estimate_entities_size() +
+            estimate_container_size(self._entities_hash_table) +
+            estimate_container_size(self._entities_prefix_index)
+        )
+
+        for secondary_index in self._indexes:
+            size += estimate_container_size(vars(secondary_index))
+
+        return size
+
+    def _estimate_entities_size(self) -> int:
+        """
+        Оценка размера объектов кеша по выборке объектов. Записи строк,
+        хранящихся на диске, в памяти не остаются
+        """
+        return (
+            0 if
+            self._spilled_snapshot is not None else
+            estimate_objects_size(self._entities_list)
+        )
+
+    @property
+    def is_lazy(self) -> bool:
+        """
+        Является ли кеш ленивым
+        """
+        return self._lazy
+
+    @property
+    def is_prepared(self) -> bool:
+        """
+        Подготовлен ли кеш
+        """
+        return self._is_prepared
+
+    @property
+    def is_spilled(self) -> bool:
+        """
+        Хранятся ли строки кеша на диске из-за превышения бюджета памяти
+        """
+        return self._spilled_snapshot is not None
+
+    def prepare(self):
+        """
+        Подготовка кеша. Повторно не выполняется.
+
+        Кеш отмечается подготовленным только после успешного построения. При
+        ошибке (например, временной ошибке БД) данные частично построенного
+        кеша сбрасываются, и подготовка повторяется при следующем обращении.
+        Обращения к данным кеша из процесса его подготовки в том же потоке
+        повторную подготовку не запускают.
+        """
+        if self._is_prepared:
+            return
+
+        with self._lock:
+            if self._is_prepared or self._is_preparing:
+                return
+
+            self._is_preparing = True
+
+            try:
+                self._prepare_with_statistics()
+            except Exception:
+                self._clear_prepared_data()
+
+                raise
+            finally:
+                self._is_preparing = False
+
+            self._is_prepared = True
+
+    def _prepare_with_statistics(self):
+        """
+        Подготовка кеша с учетом времени подготовки, количества строк и
+        занятой памяти в статистике кеша
+        """
+        self._aggregations = {}
+        self._prepare_dictionaries()
+
+        statistics = self._statistics
+        statistics.query_time = 0.0
+        is_tracing = tracemalloc.is_tracing()
+        traced_memory_size = (
+            tracemalloc.get_traced_memory()[0] if
+            is_tracing else
+            None
+        )
+        started_at = perf_counter()
+
+        self._before_prepare()
+        self._prepare()
+        self._join_related_caches()
+        self._after_prepare()
+
+        statistics.build_time = (
+            perf_counter() - started_at - statistics.query_time
+        )
+        statistics.rows_count = self._get_rows_count()
+
+        if is_tracing:
+            statistics.traced_memory_size = (
+                tracemalloc.get_traced_memory()[0] - traced_memory_size
+            )
+
+    def _clear_prepared_data(self):
+        """
+        Сброс данных кеша, построенных при подготовке, с освобождением
+        резерва памяти. Используется при ошибке подготовки, чтобы не хранить
+        частично построенный кеш, и при закрытии кеша
+        """
+        self._release_spilled_snapshot()
+        self._release_memory()
+
+        self._entities = None
+        self._entities_list = []
+        self._entities_hash_table = None
+        self._entities_prefix_index = None
+        self._row_indexes_by_pk = None
+        self._aggregations = {}
+
+        for secondary_index in self._indexes:
+            secondary_index.clear()
+
+    def close(self):
+        """
+        Освобождение ресурсов кеша: памяти, зарезервированной в бюджете
+        памяти, и строк, хранящихся на диске. Данные кеша сбрасываются, при
+        следующем обращении кеш подготавливается заново
+        """
+        super().close()
+
+    def _close_owned(
+        self,
+        is_owned: Callable[[BaseCache], bool],
+    ):
+        super()._close_owned(is_owned)
+
+        with self._lock:
+            self._clear_prepared_data()
+            self._is_prepared = False
+
+    def _touch(self):
+        """
+        Отметка факта обращения к данным кеша с подготовкой ленивого кеша
+        """
+        super()._touch()
+
+        if not self._is_prepared:
+            self.prepare()
+
     def _before_prepare(self):
         """
         Точка расширения перед подготовкой кеша
@@ -122,225 +732,1939 @@ class EntityCache(BaseCache):
 
     def _prepare(self):
         """
-        Метод подготовки кеша
+        Метод подготовки кеша. Время получения выборки учитывается как время
+        запроса, т.к. источник объектов выполняет запрос сразу. Резерв памяти
+        предыдущей подготовки кеша освобождается
         """
+        self._release_memory()
+
+        if (
+            self._memory_budget is not None and
+            self.supports_spilling and
+            not self._reserve_memory()
+        ):
+            self._prepare_spilled()
+
+            return
+
+        started_at = perf_counter()
         self._prepare_entities()
+        self._statistics.increment(query_time=perf_counter() - started_at)
+
         self._prepare_entities_hash_table()
 
     def _prepare_entities(self):
         """
         Получение выборки объектов модели по указанными параметрам
         """
-        self._entities = self._actual_entities_queryset.filter(
-            **self._additional_filter_params,
+        if self._entities_source is not None:
+            self._entities = self._entities_source()
+        else:
+            self._entities = self._prepare_entities_queryset()
+
+    def _estimate_required_memory_size(self) -> int:
+        """
+        Оценка памяти, требуемой для загрузки кеша, по количеству строк
+        запроса и размеру объектов первых строк
+        """
+        queryset = self._prepare_entities_queryset()
+
+        started_at = perf_counter()
+        rows_count = queryset.count()
+        sample = list(queryset[:MEMORY_SAMPLE_SIZE]) if rows_count else []
+        self._statistics.increment(query_time=perf_counter() - started_at)
+
+        if self._records_mode:
+            # Записи создаются из строк напрямую, без _prepare_entity, чтобы
+            # значения строк выборки не попадали в словари значений
+            record_class = self._record_class
+            sample = [record_class(row) for row in sample]
+
+        entity_size = (
+            estimate_objects_size(sample) // len(sample) if
+            sample else
+            0
+        )
+
+        return rows_count * (entity_size + ROW_OVERHEAD_SIZE)
+
+    def _reserve_memory(self) -> bool:
+        """
+        Резервирование в бюджете памяти, требуемой для загрузки кеша.
+        Возвращает False, если память не умещается в бюджете
+        """
+        memory_budget = self._memory_budget
+        size = self._estimate_required_memory_size()
+        is_reserved = memory_budget.reserve(size)
+
+        if is_reserved:
+            self._memory_reservation = weakref.finalize(
+                self,
+                memory_budget.release,
+                size,
+            )
+
+        return is_reserved
+
+    def _release_memory(self):
+        """
+        Освобождение памяти, зарезервированной кешем в бюджете памяти
+        """
+        if self._memory_reservation is not None:
+            self._memory_reservation()
+            self._memory_reservation = None
+
+    def _prepare_spilled(self):
+        """
+        Подготовка кеша с хранением строк на диске.
+
+        Кеш переходит в режим записей с плоской хеш-таблицей, поиск по части
+        ключа не поддерживается. Строки получаются пачками и записываются в
+        снимок во временном файле без построения кеша в памяти, после чего
+        снимок открывается через mmap, а файл удаляется (место на диске
+        освобождается при закрытии снимка). Записи строк создаются при каждом
+        обращении и не запоминаются. Вторичные индексы строятся проходом по
+        снимку и хранятся в памяти.
+        """
+        if not self._records_mode:
+            self._records_mode = True
+            self._record_class = self._prepare_record_class()
+
+        self._chunk_size = self._chunk_size or SPILL_CHUNK_SIZE
+        self._is_flat_hash_table = True
+        self._is_prefix_index_enabled = False
+
+        started_at = perf_counter()
+        self._prepare_entities()
+        self._statistics.increment(query_time=perf_counter() - started_at)
+
+        file_descriptor, path = tempfile.mkstemp(
+            suffix='.snapshot',
+            dir=self._spill_dir,
         )
+        os.close(file_descriptor)
+
+        try:
+            write_entity_snapshot(
+                path=path,
+                version='',
+                columns=self._record_class._columns,
+                key_positions=self._get_snapshot_key_positions(),
+                rows=self._iterate_rows(),
+            )
+            snapshot = EntitySnapshot(path)
+        finally:
+            os.remove(path)
 
-        if self._only_fields:
-            self._entities = self._entities.only(*self._only_fields)
+        self._spilled_snapshot = snapshot
+        self._prepare_from_snapshot(snapshot, is_caching_records=False)
 
-        self._entities = self._entities.distinct()
+        if self._change_marker_path:
+            self._change_marker_value = self._get_max_change_marker_value(
+                entities=self._entities_list,
+            )
 
-    def _prepare_entities_hash_table(self):
+    def _release_spilled_snapshot(self):
         """
-        Отвечает за построение хеш таблицы для дальнейшего поиска. В качестве
-        ключа можно задавать строку - наименование поля или кортеж наименований
-        полей.
+        Закрытие снимка строк кеша, хранящихся на диске
+        """
+        if self._spilled_snapshot is not None:
+            self._spilled_snapshot.close()
+            self._spilled_snapshot = None
 
-        Если требуется доступ через внешний ключ, то необходимо использовать
-        точку в качестве разделителей. Например,
-        searching_key = tuple('account_id', 'supplier.code')
+    def _get_snapshot_key_positions(self) -> Tuple[int, ...]:
         """
-        hash_table = {}
+        Номера колонок записи, составляющих ключ поиска
+        """
+        columns = self._record_class._columns
 
-        key_items_count = len(self._searching_key)
-        for entity in self._entities:
-            temp_hash_item = hash_table
-
-            for index, key_item in enumerate(self._searching_key, start=1):
-                key_item_value = deep_getattr(entity, key_item)
-
-                if key_item_value is not None:
-                    if index == key_items_count:
-                        if key_item_value not in temp_hash_item:
-                            temp_hash_item[key_item_value] = entity
-                        else:
-                            if isinstance(temp_hash_item[key_item_value], set):
-                                temp_hash_item[key_item_value].add(
-                                    entity
-                                )
-                            else:
-                                temp_hash_item[key_item_value] = {
-                                    temp_hash_item[key_item_value], entity
-                                }
-                    else:
-                        if key_item_value not in temp_hash_item:
-                            temp_hash_item[key_item_value] = {}
+        return tuple(
+            columns.index(prepare_record_column(self._model, key_item))
+            for key_item in self._searching_key_paths
+        )
 
-                        temp_hash_item = temp_hash_item[key_item_value]
-                else:
-                    break
+    def _prepare_from_snapshot(
+        self,
+        snapshot: EntitySnapshot,
+        is_caching_records: bool = True,
+    ):
+        """
+        Подготовка хеш-таблицы и вторичных индексов кеша по открытому снимку
+        без загрузки строк в память
+        """
+        self._entities = self._entities_list = SnapshotRows(
+            snapshot=snapshot,
+            record_class=self._record_class,
+            is_caching_records=is_caching_records,
+        )
+        self._entities_hash_table = SnapshotHashTable(
+            snapshot=snapshot,
+            key_items_count=len(self._searching_key),
+            rows=self._entities_list,
+        )
+        self._entities_prefix_index = None
+        self._row_indexes_by_pk = None
 
-        self._entities_hash_table = hash_table
+        for secondary_index in self._indexes:
+            secondary_index.clear()
 
-    def _prepare_actual_entities_queryset(self):
+        if self._indexes:
+            record_class = self._record_class
+
+            # Записи для индексов не запоминаются, т.к. индексы хранят номера
+            # строк
+            for row_index, row in enumerate(snapshot.iterate_rows()):
+                entity = record_class(row)
+
+                for secondary_index in self._indexes:
+                    secondary_index.add(entity, row_index)
+
+    @property
+    def is_coalescable(self) -> bool:
         """
-        Подготовка менеджена с указанием идентификатора учреждения и состояния,
-        если такие имеются у модели
+        Может ли кеш получать объекты из запроса, объединенного с запросами
+        других кешей той же модели.
+
+        Условия, проходящие через многозначные связи (обратные внешние ключи,
+        многие ко многим), присоединяют к объединенному запросу связанные
+        строки, и объект попадает в выборку несколько раз с разными
+        признаками принадлежности кешам. Кеш с такими условиями не
+        объединяется
         """
-        actual_entities_queryset = self._model._base_manager.all()
+        return (
+            not self._is_prepared and
+            not self._records_mode and
+            not self._chunk_size and
+            self._memory_budget is None and
+            self._entities_source is None and
+            type(self)._prepare_entities is EntityCache._prepare_entities and
+            not self._has_multi_valued_filter()
+        )
 
-        if self._select_related_fields:
-            actual_entities_queryset = actual_entities_queryset.select_related(
-                *self._select_related_fields,
-            )
+    def _has_multi_valued_filter(self) -> bool:
+        """
+        Проходит ли какое-либо из дополнительных условий фильтрации через
+        многозначную связь
+        """
+        for param_name in self._additional_filter_params:
+            model = self._model
 
-        return actual_entities_queryset
+            for part in param_name.split(LOOKUP_SEPARATOR):
+                try:
+                    field = model._meta.get_field(part)
+                except FieldDoesNotExist:
+                    break
+
+                if field.one_to_many or field.many_to_many:
+                    return True
+
+                if not field.is_relation:
+                    break
+
+                model = field.related_model
+
+        return False
+
+    def set_entities_source(
+        self,
+        entities_source: Callable[[], List[Model]],
+    ):
+        """
+        Установка источника объектов кеша, используемого вместо запроса при
+        подготовке кеша
+        """
+        self._entities_source = entities_source
+
+    @staticmethod
+    def _prepare_related_field(
+        model: Type[Model],
+        field_name: str,
+    ) -> Field:
+        """
+        Получение внешнего ключа, разрешаемого по связанному кешу. Связанные
+        объекты ищутся в кеше по первичному ключу, поэтому внешний ключ должен
+        ссылаться на первичный ключ связанной модели
+        """
+        field = model._meta.get_field(field_name)
+
+        if not (
+            field.concrete and
+            (field.many_to_one or field.one_to_one) and
+            field.target_field.primary_key
+        ):
+            raise ValueError(
+                RELATED_CACHE_FIELD_ERROR.format(
+                    field_name=field_name,
+                    model=model.__name__,
+                )
+            )
+
+        return field
+
+    @property
+    def related_caches(self) -> Dict[str, Union[str, 'EntityCache']]:
+        """
+        Связанные кеши по наименованиям внешних ключей. Наименования кешей
+        заменяются кешами при создании кеша в хранилище кешей
+        """
+        return dict(self._related_caches)
+
+    def bind_related_caches(self, caches: Dict[str, BaseCache]):
+        """
+        Замена наименований связанных кешей кешами хранилища. Если кеш уже
+        подготовлен, то связанные объекты заполняются сразу
+        """
+        for field_name, related_cache in self._related_caches.items():
+            if isinstance(related_cache, str):
+                cache = caches.get(related_cache)
+
+                if not isinstance(cache, EntityCache):
+                    raise ValueError(
+                        UNKNOWN_RELATED_CACHE_ERROR.format(
+                            field_name=field_name,
+                            name=self,
+                            related_cache=related_cache,
+                        )
+                    )
+
+                self._related_caches[field_name] = cache
+
+                if self._is_prepared:
+                    self._join_related_cache(field_name, cache)
+
+    def _join_related_caches(self, entities: Optional[Iterable[Any]] = None):
+        """
+        Заполнение связанных объектов по связанным кешам, указанным кешами.
+        Связанные кеши, указанные наименованиями, обрабатываются при создании
+        кеша в хранилище кешей (см. bind_related_caches)
+        """
+        for field_name, related_cache in self._related_caches.items():
+            if isinstance(related_cache, EntityCache):
+                self._join_related_cache(field_name, related_cache, entities)
+
+    def _join_related_cache(
+        self,
+        field_name: str,
+        related_cache: 'EntityCache',
+        entities: Optional[Iterable[Any]] = None,
+    ):
+        """
+        Соединение объектов кеша со связанным кешем по колонке внешнего ключа.
+
+        Связанный объект помещается в кеш связанных объектов объекта модели,
+        поэтому обращение к внешнему ключу не выполняет запрос. Объекты,
+        ссылающиеся на отсутствующие в связанном кеше строки, не изменяются,
+        и обращение к их внешнему ключу выполняет запрос, как обычно. Записи
+        не имеют кеша связанных объектов, поэтому в режиме записей связанные
+        объекты получаются через get_related.
+
+        Если связанный кеш хранит записи (режим записей, колоночный кеш, кеш
+        со строками на диске), то записи преобразуются в объекты модели (см.
+        EntityRecord.to_model) однократно на каждое соединение. Поля, не
+        вошедшие в записи, у таких объектов становятся отложенными.
+        """
+        if self._records_mode:
+            return
+
+        field = self._related_fields[field_name]
+        attname = field.attname
+        entities = self._entities_list if entities is None else entities
+
+        related_pks = {getattr(entity, attname) for entity in entities}
+        related_pks.discard(None)
+        related_entities = {
+            pk: related_cache.as_model(related_entity)
+            for pk, related_entity in related_cache.get_by_pks(
+                related_pks,
+            ).items()
+        }
+
+        set_cached_value = field.set_cached_value
+
+        for entity in entities:
+            related_entity = related_entities.get(getattr(entity, attname))
+
+            if related_entity is not None:
+                set_cached_value(entity, related_entity)
+
+    @cache_access
+    def get_by_pks(self, pks: Iterable[Any]) -> Dict[Any, Any]:
+        """
+        Получение объектов кеша по первичным ключам. Отсутствующие в кеше
+        первичные ключи пропускаются
+        """
+        return self._get_entities_by_pks(pks)
+
+    def _get_entities_by_pks(self, pks: Iterable[Any]) -> Dict[Any, Any]:
+        row_indexes_by_pk = self._get_row_indexes_by_pk()
+        entities_list = self._entities_list
+        entities = {}
+
+        for pk in pks:
+            row_index = row_indexes_by_pk.get(pk)
+
+            if row_index is not None:
+                entities[pk] = entities_list[row_index]
+
+        return entities
+
+    @cache_access
+    def get_related(
+        self,
+        entity: Any,
+        field_name: str,
+    ) -> Any:
+        """
+        Получение связанного объекта по внешнему ключу field_name из
+        связанного кеша. В отличие от обращения к атрибуту объекта работает
+        также в режиме записей
+        """
+        related_cache = self._related_caches[field_name]
+
+        if not isinstance(related_cache, EntityCache):
+            raise ValueError(
+                RELATED_CACHE_IS_NOT_BOUND_ERROR.format(
+                    field_name=field_name,
+                    related_cache=related_cache,
+                )
+            )
+
+        pk = getattr(entity, self._related_fields[field_name].attname)
+
+        return related_cache.get_by_pks((pk, )).get(pk)
+
+    def _prepare_entities_queryset(self) -> QueryType[Model]:
+        """
+        Подготовка запроса строк кеша с учетом дополнительных параметров
+        фильтрации и режима записей
+        """
+        queryset = self._actual_entities_queryset.filter(
+            **self._additional_filter_params,
+        )
+
+        if self._records_mode:
+            queryset = queryset.values_list(*self._record_class._columns)
+        elif self._only_fields:
+            queryset = queryset.only(*self._prepare_only_fields())
+
+        return queryset.distinct()
+
+    def _prepare_only_fields(self) -> Tuple[str, ...]:
+        """
+        Получение полей, загружаемых в объекты модели при указании only_fields
+        """
+        only_fields = tuple(self._only_fields)
+
+        if (
+            self._change_marker_field and
+            self._change_marker_field not in only_fields
+        ):
+            # Иначе получение маркера у каждого объекта приведет к
+            # отдельному запросу отложенного поля
+            only_fields = (*only_fields, self._change_marker_field)
+
+        only_fields += tuple(
+            field_name
+            for field_name in self._related_caches
+            if field_name not in only_fields
+        )
+
+        return only_fields
+
+    def _prepare_entities_hash_table(self):
+        """
+        Отвечает за построение хеш таблицы для дальнейшего поиска. В качестве
+        ключа можно задавать строку - наименование поля или кортеж наименований
+        полей.
+
+        Если требуется доступ через внешний ключ, то необходимо использовать
+        точку в качестве разделителей. Например,
+        searching_key = tuple('account_id', 'supplier.code')
+
+        В этом же проходе заполняются вторичные индексы кеша и, при
+        intern_related_entities=True, интернируются связанные объекты.
+        """
+        hash_table = {}
+        entities_list = []
+        interner = (
+            RelatedEntitiesInterner() if (
+                self._intern_related_entities and
+                self._select_related_fields and
+                not self._records_mode
+            ) else
+            None
+        )
+
+        self._prepare_entities_prefix_index()
+
+        for secondary_index in self._indexes:
+            secondary_index.clear()
+
+        for row_index, row in enumerate(self._iterate_rows()):
+            entity = self._prepare_entity(row)
+            entities_list.append(entity)
+
+            if interner is not None:
+                interner.intern(entity)
+
+            for secondary_index in self._indexes:
+                secondary_index.add(entity, row_index)
+
+            self._add_to_hash_table(
+                hash_table=hash_table,
+                key_values=self._searching_key_getter(entity),
+                entity=entity,
+            )
+
+        if (
+            self._records_mode or
+            self._chunk_size or
+            self._entities_source is not None
+        ):
+            # Кортежи значений из результата запроса больше не нужны, а в
+            # потоковом режиме выборка не была вычислена и не должна
+            # выполняться повторно
+            self._entities = entities_list
+
+        self._entities_list = entities_list
+        self._entities_hash_table = hash_table
+        self._row_indexes_by_pk = None
+
+        if interner is not None:
+            self._statistics.interned_entities_count = interner.interned_count
+            self._statistics.interned_memory_size = interner.saved_memory_size
+
+        if self._change_marker_path:
+            self._change_marker_value = self._get_max_change_marker_value(
+                entities=entities_list,
+            )
+
+    def _prepare_entities_prefix_index(self):
+        """
+        Создание пустого индекса префиксов ключей плоской хеш-таблицы
+        """
+        self._entities_prefix_index = (
+            {} if
+            self._is_flat_hash_table and self._is_prefix_index_enabled else
+            None
+        )
+
+    def _iterate_rows(self) -> Iterator[Any]:
+        """
+        Перебор строк результата запроса с учетом потокового режима.
+
+        Вне потокового режима запрос выполняется и все строки получаются при
+        создании итератора, поэтому время его создания учитывается как время
+        запроса
+        """
+        if not self._chunk_size:
+            started_at = perf_counter()
+            rows = iter(self._entities)
+            self._statistics.increment(query_time=perf_counter() - started_at)
+        elif self._keyset_pagination:
+            rows = self._iterate_rows_by_keyset()
+        else:
+            rows = self._entities.iterator(chunk_size=self._chunk_size)
+
+        return rows
+
+    def _iterate_rows_by_keyset(self) -> Iterator[Any]:
+        """
+        Постраничное получение строк с сортировкой по первичному ключу и
+        отбором строк с первичным ключом больше последнего полученного.
+        Используется, когда серверные курсоры недоступны, например, при работе
+        через pgbouncer в режиме пула транзакций
+        """
+        queryset = self._entities.order_by('pk')
+        last_pk = None
+
+        while True:
+            chunk_queryset = (
+                queryset if
+                last_pk is None else
+                queryset.filter(pk__gt=last_pk)
+            )
+            chunk = list(chunk_queryset[:self._chunk_size])
+
+            yield from chunk
+
+            if len(chunk) < self._chunk_size:
+                break
+
+            # В режиме записей первичный ключ - первая колонка строки
+            last_pk = chunk[-1][0] if self._records_mode else chunk[-1].pk
+
+    def _add_to_hash_table(
+        self,
+        hash_table: Dict[Any, Any],
+        key_values: Tuple[Any, ...],
+        entity: Any,
+    ):
+        """
+        Добавление объекта в хеш-таблицу по значениям частей ключа поиска.
+
+        Для каждой части ключа, кроме последней, создается вложенный словарь.
+        Если ключ совпадает у нескольких объектов, то по ключу хранится
+        множество объектов. Добавление прекращается на первом пустом значении
+        части ключа.
+        """
+        if self._is_flat_hash_table:
+            self._add_to_flat_hash_table(hash_table, key_values, entity)
+
+            return
+
+        temp_hash_item = hash_table
+
+        for key_item_value in key_values[:-1]:
+            if key_item_value is None:
+                return
+
+            next_hash_item = temp_hash_item.get(key_item_value)
+
+            if next_hash_item is None:
+                next_hash_item = temp_hash_item[key_item_value] = {}
+
+            temp_hash_item = next_hash_item
+
+        key_item_value = key_values[-1]
+
+        if key_item_value is not None:
+            hash_item = temp_hash_item.get(key_item_value)
+
+            if hash_item is None:
+                temp_hash_item[key_item_value] = entity
+            elif isinstance(hash_item, set):
+                hash_item.add(entity)
+            else:
+                temp_hash_item[key_item_value] = {hash_item, entity}
+
+    def _add_to_flat_hash_table(
+        self,
+        hash_table: Dict[Any, Any],
+        key_values: Tuple[Any, ...],
+        entity: Any,
+    ):
+        """
+        Добавление объекта в плоскую хеш-таблицу.
+
+        Для ключа поиска из одной части ключом является само значение, иначе -
+        кортеж значений. Объекты с пустыми значениями частей ключа в
+        хеш-таблицу не попадают.
+        """
+        is_full_key = None not in key_values
+        key = key_values if len(key_values) > 1 else key_values[0]
+
+        hash_item = hash_table.get(key) if is_full_key else None
+
+        if self._entities_prefix_index is not None:
+            self._add_to_prefix_index(
+                key_values=key_values,
+                is_new_full_key=is_full_key and hash_item is None,
+            )
+
+        if is_full_key:
+            if hash_item is None:
+                hash_table[key] = entity
+            elif isinstance(hash_item, set):
+                hash_item.add(entity)
+            else:
+                hash_table[key] = {hash_item, entity}
+
+    def _add_to_prefix_index(
+        self,
+        key_values: Tuple[Any, ...],
+        is_new_full_key: bool,
+    ):
+        """
+        Добавление ключа в индекс префиксов.
+
+        Для каждого префикса ключа хранится список его продолжений: новых
+        более длинных префиксов и полных ключей. Префиксы создаются до первой
+        пустой части ключа, как и вложенные словари во вложенной хеш-таблице,
+        благодаря чему результаты поиска по части ключа совпадают.
+        """
+        prefix_index = self._entities_prefix_index
+        ancestors = []
+
+        for prefix_length in range(1, len(key_values)):
+            if key_values[prefix_length - 1] is None:
+                break
+
+            prefix = key_values[:prefix_length]
+            extensions = prefix_index.get(prefix)
+
+            if extensions is None:
+                prefix_index[prefix] = []
+
+                for ancestor_extensions in ancestors:
+                    ancestor_extensions.append(prefix)
+
+                extensions = prefix_index[prefix]
+
+            ancestors.append(extensions)
+
+        if is_new_full_key:
+            for ancestor_extensions in ancestors:
+                ancestor_extensions.append(key_values)
+
+    def _remove_from_hash_table(
+        self,
+        hash_table: Dict[Any, Any],
+        key_values: Tuple[Any, ...],
+        entity: Any,
+    ):
+        """
+        Удаление объекта из хеш-таблицы по значениям частей ключа поиска.
+
+        Вложенные словари и префиксы ключей, оставшиеся пустыми, сохраняются,
+        поэтому результаты поиска по части ключа во вложенной и плоской
+        хеш-таблицах по-прежнему совпадают.
+        """
+        if None in key_values:
+            # Объекты с пустыми частями ключа в хеш-таблицу не добавлялись
+            return
+
+        hash_item_container = hash_table
+
+        if self._is_flat_hash_table:
+            key = key_values if len(key_values) > 1 else key_values[0]
+        else:
+            for key_item_value in key_values[:-1]:
+                hash_item_container = hash_item_container.get(key_item_value)
+
+                if hash_item_container is None:
+                    return
+
+            key = key_values[-1]
+
+        hash_item = hash_item_container.get(key)
+
+        if isinstance(hash_item, set):
+            hash_item.discard(entity)
+
+            if len(hash_item) == 1:
+                hash_item_container[key] = next(iter(hash_item))
+        elif hash_item is entity:
+            del hash_item_container[key]
+
+            if self._entities_prefix_index is not None:
+                self._remove_from_prefix_index(key_values)
+
+    def _remove_from_prefix_index(
+        self,
+        key_values: Tuple[Any, ...],
+    ):
+        """
+        Удаление полного ключа из списков продолжений его префиксов
+        """
+        prefix_index = self._entities_prefix_index
+
+        for prefix_length in range(1, len(key_values)):
+            extensions = prefix_index.get(key_values[:prefix_length])
+
+            if extensions is not None and key_values in extensions:
+                extensions.remove(key_values)
+
+    def _get_max_change_marker_value(
+        self,
+        entities: Iterable,
+        initial_value: Any = None,
+    ) -> Any:
+        """
+        Получение наибольшего значения маркера изменения среди объектов
+        """
+        max_value = initial_value
+        marker_getter = compile_attrs_getter((self._change_marker_path, ))
+
+        for entity in entities:
+            value = marker_getter(entity)[0]
+
+            if value is not None and (max_value is None or value > max_value):
+                max_value = value
+
+        return max_value
+
+    def _get_row_indexes_by_pk(self) -> Dict[Any, int]:
+        """
+        Получение соответствия первичных ключей порядковым номерам объектов.
+        Строится при первом обращении и поддерживается при обновлениях кеша
+        """
+        row_indexes_by_pk = self._row_indexes_by_pk
+
+        if row_indexes_by_pk is None:
+            with self._lock:
+                if self._row_indexes_by_pk is None:
+                    self._row_indexes_by_pk = self._prepare_row_indexes_by_pk()
+
+                row_indexes_by_pk = self._row_indexes_by_pk
+
+        return row_indexes_by_pk
+
+    def _prepare_row_indexes_by_pk(self) -> Dict[Any, int]:
+        """
+        Построение соответствия первичных ключей порядковым номерам объектов
+        """
+        return {
+            entity.pk: row_index
+            for row_index, entity in enumerate(self._entities_list)
+        }
+
+    def _insert_entity(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        """
+        Добавление объекта с порядковым номером row_index в хеш-таблицу и
+        вторичные индексы
+        """
+        for secondary_index in self._indexes:
+            secondary_index.add(entity, row_index)
+
+        self._add_to_hash_table(
+            hash_table=self._entities_hash_table,
+            key_values=self._searching_key_getter(entity),
+            entity=entity,
+        )
+
+    def _delete_entity(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        """
+        Удаление объекта с порядковым номером row_index из хеш-таблицы и
+        вторичных индексов
+        """
+        for secondary_index in self._indexes:
+            secondary_index.remove(entity, row_index)
+
+        self._remove_from_hash_table(
+            hash_table=self._entities_hash_table,
+            key_values=self._searching_key_getter(entity),
+            entity=entity,
+        )
+
+    def _upsert_entity(self, entity: Any):
+        """
+        Добавление нового либо замена ранее загруженного объекта кеша
+        """
+        row_indexes_by_pk = self._get_row_indexes_by_pk()
+        row_index = row_indexes_by_pk.get(entity.pk)
+
+        if row_index is None:
+            row_index = len(self._entities_list)
+            self._entities_list.append(entity)
+            row_indexes_by_pk[entity.pk] = row_index
+        else:
+            self._delete_entity(self._entities_list[row_index], row_index)
+            self._entities_list[row_index] = entity
+
+        self._insert_entity(entity, row_index)
+
+    def _drop_entity(self, pk: Any):
+        """
+        Удаление объекта из кеша по первичному ключу.
+
+        На место удаляемого объекта переносится последний объект списка, чтобы
+        не пересчитывать порядковые номера остальных объектов во вторичных
+        индексах.
+        """
+        row_indexes_by_pk = self._get_row_indexes_by_pk()
+        row_index = row_indexes_by_pk.pop(pk, None)
+
+        if row_index is None:
+            return
+
+        entities_list = self._entities_list
+        self._delete_entity(entities_list[row_index], row_index)
+
+        last_row_index = len(entities_list) - 1
+        last_entity = entities_list.pop()
+
+        if row_index != last_row_index:
+            for secondary_index in self._indexes:
+                secondary_index.remove(last_entity, last_row_index)
+                secondary_index.add(last_entity, row_index)
+
+            entities_list[row_index] = last_entity
+            row_indexes_by_pk[last_entity.pk] = row_index
+
+    def refresh(self):
+        """
+        Инкрементальное обновление кеша.
+
+        Загружаются только строки, значение маркера изменения которых больше
+        запомненного при предыдущей загрузке. Измененные и новые строки
+        заменяются или добавляются в хеш-таблицу и вторичные индексы на месте,
+        а строки, переставшие удовлетворять дополнительным параметрам
+        фильтрации, удаляются из кеша.
+
+        Удаленные из БД строки не меняют маркер, поэтому они обнаруживаются
+        сравнением количества строк кеша и выборки: при расхождении
+        загружаются первичные ключи выборки, и отсутствующие в ней строки
+        удаляются из кеша. Если маркером является первичный ключ, то
+        обнаруживаются только новые и удаленные строки.
+        """
+        if self._is_shared:
+            raise ValueError(SHARED_CACHE_IS_READ_ONLY_ERROR)
+
+        if not self._change_marker_field:
+            raise ValueError(CHANGE_MARKER_FIELD_IS_REQUIRED_ERROR)
+
+        if not self._is_prepared:
+            self.prepare()
+
+            return
+
+        started_at = perf_counter()
+
+        if self._spilled_snapshot is not None:
+            # Строки на диске не изменяются на месте, поэтому кеш строится
+            # заново с повторной оценкой памяти
+            self._release_spilled_snapshot()
+            self._is_prepared = False
+            self.prepare()
+
+            self._statistics.increment(
+                refresh_count=1,
+                refresh_time=perf_counter() - started_at,
+            )
+
+            return
+
+        self._refresh_entities()
+
+        self._statistics.increment(
+            refresh_count=1,
+            refresh_time=perf_counter() - started_at,
+        )
+        self._statistics.rows_count = self._get_rows_count()
+
+    def _refresh_entities(self):
+        """
+        Загрузка измененных строк и обновление объектов подготовленного кеша
+        на месте
+        """
+        changed_filter_params = (
+            {f'{self._change_marker_field}__gt': self._change_marker_value} if
+            self._change_marker_value is not None else
+            {}
+        )
+
+        changed_entities = [
+            self._prepare_entity(row)
+            for row in self._prepare_entities_queryset().filter(
+                **changed_filter_params,
+            )
+        ]
+        changed_pks = {entity.pk for entity in changed_entities}
+
+        # Строки с измененным маркером, не попавшие в выборку кеша, больше не
+        # удовлетворяют параметрам фильтрации
+        dropped_pks = set(
+            self._actual_entities_queryset.filter(
+                **changed_filter_params,
+            ).values_list('pk', flat=True)
+        ).difference(changed_pks)
+
+        for pk in dropped_pks:
+            self._drop_entity(pk)
+
+        for entity in changed_entities:
+            self._upsert_entity(entity)
+
+        self._drop_deleted_entities()
+        self._join_related_caches(changed_entities)
+
+        self._entities = self._entities_list
+        self._change_marker_value = self._get_max_change_marker_value(
+            entities=changed_entities,
+            initial_value=self._change_marker_value,
+        )
+        self._aggregations = {}
+
+    def _drop_deleted_entities(self):
+        """
+        Удаление из кеша строк, удаленных из БД. Первичные ключи выборки
+        загружаются, только если количество строк кеша и выборки различается
+        """
+        queryset = self._prepare_entities_queryset()
+
+        if queryset.count() == len(self._entities_list):
+            return
+
+        actual_pks = set(queryset.values_list('pk', flat=True))
+        deleted_pks = [
+            pk
+            for pk in self._get_row_indexes_by_pk()
+            if pk not in actual_pks
+        ]
+
+        for pk in deleted_pks:
+            self._drop_entity(pk)
+
+    def _prepare_entity(self, row: Any) -> Any:
+        """
+        Подготовка объекта кеша из строки результата запроса. В режиме записей
+        кортеж значений преобразуется в компактную запись. Значения полей
+        dictionary_fields заменяются общими объектами значений.
+        """
+        if self._records_mode:
+            if self._dictionary_items:
+                row = list(row)
+
+                for position, dictionary in self._dictionary_items:
+                    row[position] = dictionary.intern(row[position])
+
+            row = self._record_class(row)
+        elif self._dictionary_items:
+            values = row.__dict__
+
+            for attname, dictionary in self._dictionary_items:
+                value = values.get(attname)
+
+                # Значения отложенных полей отсутствуют
+                if value is not None:
+                    values[attname] = dictionary.intern(value)
+
+        return row
+
+    def _prepare_dictionaries(self):
+        """
+        Создание пустых словарей значений полей dictionary_fields. В режиме
+        записей словари сопоставляются номерам колонок записи, иначе -
+        наименованиям атрибутов объектов модели
+        """
+        self._dictionaries = {
+            column: ValuesDictionary()
+            for column in self._dictionary_columns
+        }
+
+        if self._records_mode:
+            columns = self._record_class._columns
+            self._dictionary_items = tuple(
+                (columns.index(column), dictionary)
+                for column, dictionary in self._dictionaries.items()
+                if column in columns
+            )
+        else:
+            self._dictionary_items = tuple(
+                (column, dictionary)
+                for column, dictionary in self._dictionaries.items()
+                if LOOKUP_SEPARATOR not in column
+            )
+
+    def _prepare_actual_entities_queryset(self):
+        """
+        Подготовка менеджена с указанием идентификатора учреждения и состояния,
+        если такие имеются у модели
+        """
+        actual_entities_queryset = self._model._base_manager.all()
+
+        if self._select_related_fields:
+            actual_entities_queryset = actual_entities_queryset.select_related(
+                *self._select_related_fields,
+            )
+
+        return actual_entities_queryset
+
+    @cache_access
+    def filter(
+        self,
+        only_first: bool = False,
+        **kwargs,
+    ):
+        """
+        Метод фильтрации объектов кеша по заданным параметрам.
+
+        Пример использования:
+
+        some_objects_list = cache.filter(code='12345', only_first=True)
+
+        Можно получать первое попавшееся значение с указанием only_first=True
+
+        Кроме равенства и __in поддерживаются условия __gt, __gte, __lt,
+        __lte, __range, __isnull и __startswith. Пустое значение не
+        удовлетворяет условиям сравнения. Условия сравнения проверяются
+        двоичным поиском по упорядоченным индексам (SortedIndex), если они
+        указаны у кеша, иначе перебором объектов.
+        """
+        result = self._filter_entities(kwargs)
+
+        statistics = self._statistics
+        statistics.filter_count += 1
+
+        if result:
+            statistics.filter_hits += 1
+
+        if only_first:
+            if result:
+                result = result[0]
+            else:
+                result = None
+
+        return result
+
+    def _filter_entities(
+        self,
+        filter_params: Dict[str, Any],
+    ) -> List[Any]:
+        """
+        Получение списка объектов кеша, удовлетворяющих параметрам фильтрации
+        """
+        filter_ = self._prepare_filter(filter_params)
+
+        row_indexes, not_indexed_keys = self._lookup_indexes(filter_)
+
+        if row_indexes is None:
+            entities = self._get_filter_candidates(filter_)
+        else:
+            entities = self._get_entities_by_row_indexes(sorted(row_indexes))
+
+        if not_indexed_keys:
+            predicate = compile_filter_predicate(tuple(not_indexed_keys))(
+                tuple(filter_[key] for key in not_indexed_keys),
+            )
+
+            result = [
+                entity
+                for entity in entities
+                if predicate(entity)
+            ]
+        else:
+            result = list(entities)
+
+        return result
+
+    def _get_filter_candidates(
+        self,
+        filter_: Dict[str, Any],
+    ) -> Iterable[Any]:
+        """
+        Получение кандидатов для проверки условий фильтрации перебором, если
+        ни один вторичный индекс не применим
+        """
+        return self._entities
+
+    def _get_entities_by_row_indexes(
+        self,
+        row_indexes: Iterable[int],
+    ) -> List[Any]:
+        """
+        Получение объектов кеша по номерам строк
+        """
+        entities_list = self._entities_list
+
+        return [entities_list[row_index] for row_index in row_indexes]
+
+    def _prepare_filter(
+        self,
+        filter_params: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Приведение параметров фильтрации к словарю условий (см.
+        lookups.prepare_filter).
+
+        Условия по внешнему ключу заменяются условиями по его колонке
+        (account -> account_id), объекты моделей и записи в значениях
+        условий - их первичными ключами. Поэтому account=<Account>,
+        account=1 и account_id=1 отбирают одни и те же объекты в режиме
+        объектов модели и в режиме записей, а объекты модели не загружают
+        связанный объект при проверке условия.
+        """
+        filter_ = prepare_filter(filter_params)
+
+        relation_attnames = self._relation_attnames
+
+        if any(
+            split_lookup(key)[0] in relation_attnames
+            for key in filter_
+        ):
+            resolved_filter = {}
+
+            for key, value in filter_.items():
+                field_name, lookup = split_lookup(key)
+                attname = relation_attnames.get(field_name)
+
+                if attname is not None:
+                    key = prepare_filter_key(attname, lookup)
+                    value = self._prepare_relation_lookup_value(value)
+
+                if isinstance(value, set) and key in resolved_filter:
+                    value = resolved_filter[key] & value
+
+                resolved_filter[key] = value
+
+            filter_ = resolved_filter
+
+        return filter_
+
+    @staticmethod
+    def _prepare_relation_lookup_value(value: Any) -> Any:
+        """
+        Замена объектов моделей и записей в значении условия по внешнему ключу
+        их первичными ключами
+        """
+        def get_pk(item):
+            return (
+                item.pk if
+                isinstance(item, (Model, EntityRecord)) else
+                item
+            )
+
+        if isinstance(value, set):
+            value = {get_pk(item) for item in value}
+        elif isinstance(value, tuple):
+            value = tuple(get_pk(item) for item in value)
+        else:
+            value = get_pk(value)
+
+        return value
+
+    def _lookup_indexes(
+        self,
+        filter_: Dict[str, Any],
+    ) -> Tuple[Optional[Set[int]], List[str]]:
+        """
+        Поиск кандидатов по вторичным индексам кеша.
+
+        Индексы применяются начиная с наиболее селективного, множества
+        кандидатов пересекаются. Индекс, оценка которого больше текущего
+        количества кандидатов, не применяется - его поля дешевле проверить
+        перебором кандидатов.
+
+        Возвращает множество порядковых номеров объектов-кандидатов (None, если
+        ни один индекс не подошел) и список ключей условий, которые необходимо
+        проверить перебором.
+        """
+        applicable_indexes = sorted(
+            (
+                (index.estimate(filter_), index_number, index)
+                for index_number, index in enumerate(self._indexes)
+                if index.is_applicable(filter_)
+            ),
+            key=itemgetter(0, 1),
+        )
+
+        row_indexes = None
+        indexed_keys = set()
+
+        for estimate, _, index in applicable_indexes:
+            if row_indexes is not None:
+                if not row_indexes:
+                    break
+
+                if estimate > len(row_indexes):
+                    continue
+
+            index_row_indexes = index.lookup(filter_)
+
+            row_indexes = (
+                index_row_indexes if
+                row_indexes is None else
+                row_indexes & index_row_indexes
+            )
+            indexed_keys.update(index.get_applied_keys(filter_))
+
+        not_indexed_keys = [
+            key
+            for key in filter_.keys()
+            if key not in indexed_keys
+        ]
+
+        return row_indexes, not_indexed_keys
+
+    @cache_access
+    def flat_values_list(
+        self,
+        field_name: str,
+    ):
+        """
+        Получение плоского списка значений объектов указанного свойства без
+        пустых значений.
+
+        : param field_name: наименование поля
+        """
+        if self._records_mode and field_name in self._relation_attnames:
+            get_value = self._prepare_values_getter((field_name, ))
+        else:
+            def get_value(entity):
+                return getattr(entity, field_name, None)
+
+        return list(
+            filter(
+                None,
+                [
+                    get_value(entity)
+                    for entity in self._entities
+                ]
+            )
+        )
+
+    def _check_is_iterable(self, object_):
+        """
+        Проверяет, является ли передаваемый объект итерабельным
+        """
+        return (
+            isinstance(object_, (Iterable, Sequence)) and
+            not isinstance(object_, str)
+        )
+
+    def get_by_key(
+        self,
+        key: Union[Any, Tuple[Any]],
+        strict_mode=True,
+    ):
+        """
+        Метод получения значения из кеша по ключу поиска.
+
+        В общем случае передаваемый ключ должен совпадать с _searching_key.
+        Если отключить строгий режим поиска - strict_mode=False, то можно
+        получить промежуточный результат по части ключа следующего с начала.
+        """
+        # Проверка cache_access без вызова декоратора: метод вызывается в
+        # циклах, и обращение к подготовленному кешу не должно стоить
+        # лишнего вызова функции
+        if not (self._is_prepared and self._is_touched):
+            self._touch()
+
+        key = (
+            key if
+            self._check_is_iterable(key) else
+            (key, )
+        )
+        self._check_key_items_count(len(key), strict_mode)
+
+        item = self._find_in_hash_table(key, strict_mode)
+
+        statistics = self._statistics
+        statistics.get_by_key_count += 1
+
+        if item is not None:
+            statistics.get_by_key_hits += 1
+
+        return self._prepare_hash_table_item(item)
+
+    def get_many(
+        self,
+        keys: Iterable,
+        strict_mode=True,
+        default: Any = None,
+        as_dict: bool = False,
+        with_missing: bool = False,
+    ):
+        """
+        Пакетное получение значений из кеша по списку ключей поиска.
+
+        Форма ключей проверяется однократно по первому ключу, поэтому все
+        ключи должны состоять из одинакового количества частей. Для
+        ненайденных ключей возвращается default.
+
+        По умолчанию возвращается список значений в порядке ключей, при
+        as_dict=True - словарь, где ключом выступает ключ поиска. При
+        with_missing=True дополнительно возвращается список ненайденных
+        ключей, например, для их дальнейшей загрузки одним запросом.
+
+        Пример использования:
+
+        accounts, missing_keys = cache.get_many(
+            keys=[(1, '101'), (2, '102')],
+            with_missing=True,
+        )
+        """
+        if not (self._is_prepared and self._is_touched):
+            self._touch()
+
+        keys = list(keys)
+        items = []
+        missing_keys = []
+
+        if keys:
+            is_composite_key = self._check_is_iterable(keys[0])
+            key_items_count = len(keys[0]) if is_composite_key else 1
+
+            self._check_key_items_count(key_items_count, strict_mode)
+
+            if is_composite_key:
+                keys = [tuple(key) for key in keys]
+
+            hash_table = self._entities_hash_table
+            searching_key_items_count = len(self._searching_key)
+            is_strict_full_key = (
+                strict_mode and
+                key_items_count == searching_key_items_count
+            )
+
+            for key in keys:
+                if searching_key_items_count == 1:
+                    item = hash_table.get(key[0] if is_composite_key else key)
+                elif is_strict_full_key and self._is_flat_hash_table:
+                    item = hash_table.get(key)
+                elif is_strict_full_key:
+                    item = hash_table
+                    for key_item in key:
+                        item = item.get(key_item)
+
+                        if item is None:
+                            break
+                elif not is_composite_key and not self._is_flat_hash_table:
+                    item = hash_table.get(key)
+                else:
+                    item = self._find_in_hash_table(
+                        key if is_composite_key else (key, ),
+                        strict_mode,
+                    )
+
+                if item is None:
+                    missing_keys.append(key)
+
+                items.append(item)
+
+        values = self._prepare_hash_table_items(items, default)
+
+        statistics = self._statistics
+        statistics.get_many_count += 1
+        statistics.get_many_hits += len(keys) - len(missing_keys)
+        statistics.get_many_misses += len(missing_keys)
+
+        result = dict(zip(keys, values)) if as_dict else values
+
+        return (result, missing_keys) if with_missing else result
+
+    def _check_key_items_count(
+        self,
+        key_items_count: int,
+        strict_mode: bool,
+    ):
+        """
+        Проверка количества частей ключа поиска
+        """
+        searching_key_items_count = len(self._searching_key)
+
+        if key_items_count > searching_key_items_count:
+            raise ValueError(
+                SEARCHING_KEY_SIZE_MORE_THAN_DEFAULT_SEARCHING_KEY_ERROR
+            )
+        elif key_items_count < searching_key_items_count and strict_mode:
+            raise ValueError(
+                SEARCHING_KEY_SIZE_LESS_THAN_DEFAULT_SEARCHING_KEY_ERROR
+            )
+        elif (
+            not strict_mode and
+            searching_key_items_count > 1 and
+            self._is_flat_hash_table and
+            not self._is_prefix_index_enabled
+        ):
+            raise ValueError(
+                PREFIX_INDEX_IS_REQUIRED_FOR_NOT_STRICT_MODE_ERROR if
+                (
+                    self.supports_prefix_index and
+                    self._spilled_snapshot is None
+                ) else
+                NOT_STRICT_MODE_IS_NOT_SUPPORTED_ERROR
+            )
+
+    def _find_in_hash_table(
+        self,
+        key: Tuple[Any, ...],
+        strict_mode: bool,
+    ):
+        """
+        Поиск значения в хеш-таблице по ключу поиска
+        """
+        if self._is_flat_hash_table:
+            return self._find_in_flat_hash_table(tuple(key), strict_mode)
+
+        key_items_count = len(key)
+
+        result = None
+        temp_hash_item = self._entities_hash_table
+        for index, key_item in enumerate(key, start=1):
+            if key_item not in temp_hash_item:
+                if not strict_mode and index != 1:
+                    result = temp_hash_item
+
+                break
+
+            temp_hash_item = temp_hash_item[key_item]
+
+            if index == key_items_count:
+                result = temp_hash_item
+
+        return result
+
+    def _find_in_flat_hash_table(
+        self,
+        key: Tuple[Any, ...],
+        strict_mode: bool,
+    ):
+        """
+        Поиск значения в плоской хеш-таблице по ключу поиска.
+
+        При поиске по части ключа результат собирается в виде вложенных
+        словарей по индексу префиксов, поэтому он совпадает с результатом
+        поиска во вложенной хеш-таблице
+        """
+        hash_table = self._entities_hash_table
+        searching_key_items_count = len(self._searching_key)
+
+        if searching_key_items_count == 1:
+            return hash_table.get(key[0])
+
+        if strict_mode:
+            return hash_table.get(key)
+
+        prefix_index = self._entities_prefix_index
+        key_items_count = len(key)
+
+        result = None
+        for prefix_length in range(1, key_items_count + 1):
+            prefix = key[:prefix_length]
+            is_full_key = prefix_length == searching_key_items_count
+
+            if prefix not in (hash_table if is_full_key else prefix_index):
+                if prefix_length != 1:
+                    result = self._prepare_flat_hash_table_subtree(
+                        prefix=key[:prefix_length - 1],
+                    )
+
+                break
+
+            if prefix_length == key_items_count:
+                result = (
+                    hash_table[prefix] if
+                    is_full_key else
+                    self._prepare_flat_hash_table_subtree(prefix)
+                )
+
+        return result
+
+    def _prepare_flat_hash_table_subtree(
+        self,
+        prefix: Tuple[Any, ...],
+    ) -> Dict[Any, Any]:
+        """
+        Формирование вложенных словарей по префиксу ключа из плоской
+        хеш-таблицы, аналогичных части вложенной хеш-таблицы
+        """
+        hash_table = self._entities_hash_table
+        prefix_length = len(prefix)
+        searching_key_items_count = len(self._searching_key)
+
+        subtree = {}
+        for extension in self._entities_prefix_index[prefix]:
+            temp_hash_item = subtree
+            extension_items = extension[prefix_length:]
+
+            if len(extension) == searching_key_items_count:
+                for key_item in extension_items[:-1]:
+                    temp_hash_item = temp_hash_item.setdefault(key_item, {})
+
+                temp_hash_item[extension_items[-1]] = hash_table[extension]
+            else:
+                for key_item in extension_items:
+                    temp_hash_item = temp_hash_item.setdefault(key_item, {})
+
+        return subtree
+
+    @cache_access
+    def find_longest_prefix(
+        self,
+        field_name: str,
+        value: str,
+    ):
+        """
+        Получение объекта с наибольшим значением поля field_name, являющимся
+        префиксом значения value, например, ближайшего существующего
+        вышестоящего счета по коду субсчета. Требует индекса TrieIndex по
+        полю.
+
+        Если таких объектов несколько, то возвращается множество, если таких
+        объектов нет - None.
+        """
+        trie_index = next(
+            (
+                index
+                for index in self._indexes
+                if isinstance(index, TrieIndex) and index.fields == (field_name, )  # noqa
+            ),
+            None,
+        )
+
+        if trie_index is None:
+            raise ValueError(
+                TRIE_INDEX_IS_REQUIRED_ERROR.format(field_name=field_name)
+            )
+
+        entities = self._get_entities_by_row_indexes(
+            sorted(trie_index.find_longest_prefix(value)),
+        )
+
+        if not entities:
+            result = None
+        elif len(entities) == 1:
+            result = entities[0]
+        else:
+            result = set(entities)
+
+        return result
+
+    def _prepare_hash_table_item(self, item: Any) -> Any:
+        """
+        Подготовка найденного в хеш-таблице значения перед возвратом.
+        Точка расширения для кешей, хранящих в хеш-таблице не сами объекты
+        """
+        return item
+
+    def _prepare_hash_table_items(
+        self,
+        items: List[Any],
+        default: Any = None,
+    ) -> List[Any]:
+        """
+        Подготовка найденных в хеш-таблице значений перед возвратом с заменой
+        ненайденных значений на default. Точка расширения для пакетной
+        подготовки значений
+        """
+        prepare_hash_table_item = self._prepare_hash_table_item
+
+        return [
+            default if item is None else prepare_hash_table_item(item)
+            for item in items
+        ]
+
+    @cache_access
+    def values_list(
+        self,
+        fields: Tuple[str, ...],
+    ) -> Optional[List[Tuple]]:
+        """
+        Получение списка кортежей состоящих из значений полей объектов согласно
+        заданным параметрам
+
+        :param fields: кортеж наименований полей
+        """
+        fields_getter = self._prepare_values_getter(fields)
+
+        return [
+            fields_getter(entity)
+            for entity in self._entities
+        ]
+
+    def _prepare_values_getter(
+        self,
+        fields: Tuple[str, ...],
+    ) -> Callable[[Any], Any]:
+        """
+        Получение функции получения значений полей объекта кеша, аналогичной
+        attrgetter.
+
+        В режиме записей значениями внешних ключей, как и у объектов модели,
+        являются объекты связанной модели. Они берутся из связанного кеша,
+        а отсутствующие в нем загружаются одним запросом на вызов.
+        """
+        if not (
+            self._records_mode and
+            any(field_name in self._relation_attnames for field_name in fields)
+        ):
+            return attrgetter(*fields)
+
+        getters = []
+
+        for field_name in fields:
+            if field_name in self._relation_attnames:
+                getters.append(self._prepare_related_model_getter(field_name))
+            else:
+                getters.append(attrgetter(field_name))
+
+        if len(getters) == 1:
+            return getters[0]
+
+        return lambda entity: tuple(getter(entity) for getter in getters)
+
+    def _prepare_related_model_getter(
+        self,
+        field_name: str,
+    ) -> Callable[[Any], Optional[Model]]:
+        """
+        Получение функции получения объекта связанной модели записи по
+        внешнему ключу field_name
+        """
+        field = self._model._meta.get_field(field_name)
+        column_getter = attrgetter(field.attname)
+
+        pks = {column_getter(entity) for entity in self._entities}
+        pks.discard(None)
+
+        related_cache = self._related_caches.get(field_name)
+
+        if isinstance(related_cache, EntityCache):
+            related_entities = {
+                pk: related_cache.as_model(related_entity)
+                for pk, related_entity in related_cache.get_by_pks(
+                    pks,
+                ).items()
+            }
+        else:
+            related_entities = {}
+
+        missing_pks = pks.difference(related_entities)
+
+        if missing_pks:
+            related_entities.update(
+                field.related_model._base_manager.using(
+                    self._actual_entities_queryset.db,
+                ).in_bulk(
+                    missing_pks,
+                    field_name=field.target_field.attname,
+                )
+            )
+
+        return lambda entity: related_entities.get(column_getter(entity))
+
+    @cache_access
+    def first(self):
+        """
+        Получение первого элемента из кеша
+        """
+        result = None
+
+        if self._entities:
+            result = self._entities[0]
+
+        return result
+
+    def _prepare_aggregation_key(
+        self,
+        keys: Tuple[str, ...],
+        aggregates: Dict[str, Tuple[str, str]],
+        filter_params: Dict[str, Any],
+    ) -> Optional[Tuple]:
+        """
+        Получение ключа результата агрегации по параметрам вызова. Если
+        значения параметров фильтрации не хешируются, то возвращается None и
+        результат не запоминается
+        """
+        filter_ = self._prepare_filter(filter_params)
+        key = (
+            keys,
+            tuple(sorted(aggregates.items())),
+            tuple(sorted(
+                (
+                    filter_key,
+                    frozenset(value) if isinstance(value, set) else value,
+                )
+                for filter_key, value in filter_.items()
+            )),
+        )
+
+        try:
+            hash(key)
+        except TypeError:
+            key = None
+
+        return key
+
+    def _get_aggregation(
+        self,
+        keys: Optional[Tuple[str, ...]],
+        aggregates: Dict[str, Tuple[str, str]],
+        filter_params: Dict[str, Any],
+    ) -> Any:
+        """
+        Получение запомненного или вычисление результата агрегации. При
+        keys=None вычисляются агрегаты по всем строкам без группировки
+        """
+        key = self._prepare_aggregation_key(keys, aggregates, filter_params)
+        result = self._aggregations.get(key) if key is not None else None
+
+        if result is None:
+            if keys is None:
+                result = self._aggregate(aggregates, filter_params)
+            else:
+                result = self._group_by(keys, aggregates, filter_params)
+
+            if key is not None:
+                # При одновременном вычислении в нескольких потоках всем
+                # возвращается первый запомненный результат
+                with self._lock:
+                    result = self._aggregations.setdefault(key, result)
+
+        return result
+
+    @cache_access
+    def aggregate(
+        self,
+        aggregates: Dict[str, Tuple[str, str]],
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """
+        Вычисление агрегатов по объектам, удовлетворяющим параметрам
+        фильтрации.
+
+        Агрегаты задаются словарем, где ключ - наименование результата, а
+        значение - кортеж из функции агрегации AggregateFunctionEnum и
+        наименования поля (допускается цепочка через точку). Пустые значения
+        полей не учитываются. Результатом суммы, минимума и максимума при
+        отсутствии значений является None, результатом DISTINCT - множество
+        различных значений.
+
+        Все агрегаты вычисляются за один проход по объектам. Результат
+        запоминается до обновления кеша, поэтому изменять его не следует.
+
+        Пример использования:
+
+        cache.aggregate(
+            aggregates={
+                'total': (AggregateFunctionEnum.SUM, 'amount'),
+                'accounts': (AggregateFunctionEnum.DISTINCT, 'account_id'),
+            },
+            status='active',
+        )
+        """
+        return self._get_aggregation(None, aggregates, kwargs)
 
-    def filter(
+    @cache_access
+    def group_by(
         self,
-        only_first: bool = False,
+        keys: Union[str, Tuple[str, ...]],
+        aggregates: Dict[str, Tuple[str, str]],
         **kwargs,
-    ):
+    ) -> Dict[Any, Dict[str, Any]]:
         """
-        Метод фильтрации объектов кеша по заданным параметрам.
+        Группировка объектов, удовлетворяющих параметрам фильтрации, по
+        значениям полей keys с вычислением агрегатов (см. aggregate).
 
         Пример использования:
 
-        some_objects_list = cache.filter(code='12345', only_first=True)
-
-        Можно получать первое попавшееся значение с указанием only_first=True
-        """
-        filter_ = OrderedDict()
-        for field_name, field_value in kwargs.items():
-            prepared_field_name = field_name.split('__in')[0]
-            prepared_field_value = (
-                set(field_value) if
-                self._check_is_iterable(field_value) else
-                {field_value}
-            )
-            filter_[prepared_field_name] = prepared_field_value
-
-        result = list(
-            filter(
-                lambda entity: all(
-                    [
-                        getattr(entity, field_name) in filter_[field_name]
-                        for field_name in filter_.keys()
-                    ]
-                ),
-                self._entities
-            )
+        cache.group_by(
+            keys='account_id',
+            aggregates={
+                'total': (AggregateFunctionEnum.SUM, 'amount'),
+                'rows_count': (AggregateFunctionEnum.COUNT, 'pk'),
+            },
+            status='active',
         )
 
-        if only_first:
-            if result:
-                result = result[0]
-            else:
-                result = None
-
-        return result
-
-    def flat_values_list(
-        self,
-        field_name: str,
-    ):
+        Возвращает словарь, где ключ - значение поля группировки (кортеж
+        значений при нескольких полях), а значение - словарь агрегатов.
+        Результат запоминается до обновления кеша, поэтому изменять его не
+        следует.
         """
-        Получение плоского списка значений объектов указанного свойства без
-        пустых значений.
+        keys = (keys, ) if isinstance(keys, str) else tuple(keys)
 
-        : param field_name: наименование поля
-        """
-        return list(
-            filter(
-                None,
-                [
-                    getattr(entity, field_name, None)
-                    for entity in self._entities
-                ]
-            )
-        )
+        return self._get_aggregation(keys, aggregates, kwargs)
 
-    def _check_is_iterable(self, object_):
+    def _aggregate(
+        self,
+        aggregates: Dict[str, Tuple[str, str]],
+        filter_params: Dict[str, Any],
+    ) -> Dict[str, Any]:
         """
-        Проверяет, является ли передаваемый объект итерабельным
+        Вычисление агрегатов без группировки
         """
-        return (
-            isinstance(object_, (Iterable, Sequence)) and
-            not isinstance(object_, str)
+        return self._group_by((), aggregates, filter_params).get(
+            (),
+            self._prepare_aggregation_result(aggregates, None),
         )
 
-    def get_by_key(
+    def _group_by(
         self,
-        key: Union[Any, Tuple[Any]],
-        strict_mode=True,
-    ):
+        keys: Tuple[str, ...],
+        aggregates: Dict[str, Tuple[str, str]],
+        filter_params: Dict[str, Any],
+    ) -> Dict[Any, Dict[str, Any]]:
         """
-        Метод получения значения из кеша по ключу поиска.
-
-        В общем случае передаваемый ключ должен совпадать с _searching_key.
-        Если отключить строгий режим поиска - strict_mode=False, то можно
-        получить промежуточный результат по части ключа следующего с начала.
+        Группировка объектов с вычислением агрегатов за один проход. При
+        пустом keys все объекты попадают в группу с ключом ()
         """
-        key = (
-            key if
-            self._check_is_iterable(key) else
-            (key, )
+        entities = (
+            self._filter_entities(filter_params) if
+            filter_params else
+            self._entities
         )
-        key_items_count = len(key)
-        searching_key_items_count = len(self._searching_key)
-
-        if key_items_count > searching_key_items_count:
-            raise ValueError(
-                SEARCHING_KEY_SIZE_MORE_THAN_DEFAULT_SEARCHING_KEY_ERROR
-            )
-        elif key_items_count < searching_key_items_count and strict_mode:
-            raise ValueError(
-                SEARCHING_KEY_SIZE_LESS_THAN_DEFAULT_SEARCHING_KEY_ERROR
-            )
-
-        result = None
-        temp_hash_item = self._entities_hash_table
-        for index, key_item in enumerate(key, start=1):
-            if key_item not in temp_hash_item:
-                if not strict_mode and index != 1:
-                    result = temp_hash_item
 
-                break
+        functions = tuple(function for function, _ in aggregates.values())
+        values_getter = compile_attrs_getter(
+            tuple(field_name for _, field_name in aggregates.values()),
+        )
+        keys_getter = compile_attrs_getter(keys) if keys else None
+        is_composite_key = len(keys) > 1
+
+        groups = OrderedDict()
+        for entity in entities:
+            if keys_getter is None:
+                group_key = ()
+            elif is_composite_key:
+                group_key = keys_getter(entity)
+            else:
+                group_key = keys_getter(entity)[0]
 
-            temp_hash_item = temp_hash_item[key_item]
+            state = groups.get(group_key)
 
-            if index == key_items_count:
-                result = temp_hash_item
+            if state is None:
+                state = groups[group_key] = [
+                    self._get_empty_aggregate_value(function)
+                    for function in functions
+                ]
 
-        return result
+            for position, value in enumerate(values_getter(entity)):
+                if value is None:
+                    continue
+
+                function = functions[position]
+                current = state[position]
+
+                if function == AggregateFunctionEnum.COUNT:
+                    state[position] = current + 1
+                elif function == AggregateFunctionEnum.DISTINCT:
+                    current.add(value)
+                elif current is None:
+                    state[position] = value
+                elif function == AggregateFunctionEnum.SUM:
+                    state[position] = current + value
+                elif function == AggregateFunctionEnum.MIN:
+                    if value < current:
+                        state[position] = value
+                elif value > current:
+                    state[position] = value
+
+        return OrderedDict(
+            (group_key, self._prepare_aggregation_result(aggregates, state))
+            for group_key, state in groups.items()
+        )
 
-    def values_list(
-        self,
-        fields: Tuple[str, ...],
-    ) -> Optional[List[Tuple]]:
+    @staticmethod
+    def _prepare_aggregation_result(
+        aggregates: Dict[str, Tuple[str, str]],
+        values: Optional[List[Any]],
+    ) -> Dict[str, Any]:
         """
-        Получение списка кортежей состоящих из значений полей объектов согласно
-        заданным параметрам
-
-        :param fields: кортеж наименований полей
+        Формирование словаря агрегатов по вычисленным значениям. При
+        отсутствии значений формируется результат для пустой выборки
         """
-        fields_getter = attrgetter(*fields)
+        if values is None:
+            values = [
+                EntityCache._get_empty_aggregate_value(function)
+                for function, _ in aggregates.values()
+            ]
 
-        return [
-            fields_getter(entity)
-            for entity in self._entities
-        ]
+        return dict(zip(aggregates, values))
 
-    def first(self):
+    @staticmethod
+    def _get_empty_aggregate_value(function: str) -> Any:
         """
-        Получение первого элемента из кеша
+        Значение агрегата для выборки без непустых значений
         """
-        result = None
-
-        if self._entities:
-            result = self._entities[0]
+        if function == AggregateFunctionEnum.COUNT:
+            value = 0
+        elif function == AggregateFunctionEnum.DISTINCT:
+            value = set()
+        else:
+            value = None
 
-        return result
+        return value
 
 
 class ActualEntityCache(EntityCache):
@@ -381,6 +2705,9 @@ class PeriodicalEntityCache(BaseCache):
 
     Для примера, может использоваться при переносах остатков на очередной год
     с 31 декабря на 1 января нового года.
+
+    Дополнительные именованные параметры передаются в создаваемые кеши на
+    даты.
     """
 
     entity_cache_class = EntityCache
@@ -411,6 +2738,9 @@ class PeriodicalEntityCache(BaseCache):
         self._additional_filter_params = additional_filter_params or {}
         self._searching_key = searching_key
 
+        # Параметры кешей на даты (indexes, records_mode, lazy и т.д.)
+        self._entity_cache_kwargs = kwargs
+
         self._date_from = date_from
         self._date_to = date_to
 
@@ -432,6 +2762,53 @@ class PeriodicalEntityCache(BaseCache):
     def __str__(self):
         return self.__repr__()
 
+    @property
+    def is_touched(self) -> bool:
+        """
+        Было ли обращение к данным хотя бы одного из кешей на даты
+        """
+        return any(
+            entities_cache.is_touched
+            for entities_cache in (
+                self._old_entities_cache,
+                self._new_entities_cache,
+            )
+            if entities_cache is not None
+        )
+
+    def _get_rows_count(self) -> int:
+        return sum(
+            entities_cache._get_rows_count()
+            for entities_cache in (
+                self._old_entities_cache,
+                self._new_entities_cache,
+            )
+            if entities_cache is not None
+        )
+
+    def _get_child_caches(self) -> Dict[str, BaseCache]:
+        return OrderedDict(
+            (name, entities_cache)
+            for name, entities_cache in (
+                ('old', self._old_entities_cache),
+                ('new', self._new_entities_cache),
+            )
+            if entities_cache is not None
+        )
+
+    def mark_as_shared(self):
+        super().mark_as_shared()
+
+        self._old_entities_cache.mark_as_shared()
+        self._new_entities_cache.mark_as_shared()
+
+    def prepare(self):
+        """
+        Принудительная подготовка кешей на даты
+        """
+        self._old_entities_cache.prepare()
+        self._new_entities_cache.prepare()
+
     @property
     def old(self):
         """
@@ -488,6 +2865,7 @@ class PeriodicalEntityCache(BaseCache):
             only_fields=self._only_fields,
             additional_filter_params=additional_filter_params,
             searching_key=self._searching_key,
+            **self._entity_cache_kwargs,
         )
 
         return entities_cache
@@ -561,6 +2939,165 @@ class PeriodicalEntityCache(BaseCache):
         """
 
 
+class CoalescedEntitiesLoader:
+    """
+    Загрузчик объектов для нескольких кешей одной модели одним запросом.
+
+    Запрос получает объединение выборок кешей, отличающихся только
+    дополнительными параметрами фильтрации, ключом поиска и индексами.
+    Принадлежность строки выборке каждого кеша вычисляется в запросе
+    условными выражениями, после чего объекты распределяются по кешам.
+    Объект, попавший в выборки нескольких кешей, является общим для них,
+    хеш-таблицы и индексы кеши строят самостоятельно.
+
+    Объекты загружаются при подготовке первого из кешей.
+    """
+
+    def __init__(
+        self,
+        caches: List[EntityCache],
+    ):
+        self._caches = caches
+        self._lock = threading.Lock()
+        self._entities: Optional[List[List[Model]]] = None
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} '
+            f'@model="{self._caches[0]._model.__name__}" '
+            f'@caches_count="{len(self._caches)}">'
+        )
+
+    def __str__(self):
+        return self.__repr__()
+
+    @staticmethod
+    def get_group_key(cache: EntityCache) -> Tuple:
+        """
+        Получение ключа группы кешей, запросы которых могут быть объединены
+        """
+        queryset = cache._actual_entities_queryset
+
+        return (
+            cache._model,
+            queryset.db,
+            str(queryset.query),
+        )
+
+    def _prepare_queryset(self) -> QueryType[Model]:
+        """
+        Подготовка объединенного запроса с признаками принадлежности строк
+        выборкам кешей
+        """
+        caches = self._caches
+        queryset = caches[0]._actual_entities_queryset
+
+        filters = [
+            Q(**cache._additional_filter_params)
+            for cache in caches
+        ]
+
+        # Кеш без дополнительных параметров фильтрации получает все строки
+        if all(filters):
+            queryset = queryset.filter(reduce(or_, filters))
+
+        queryset = queryset.annotate(**{
+            self._get_flag_name(cache_number): Case(
+                When(cache_filter, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+            for cache_number, cache_filter in enumerate(filters)
+            if cache_filter
+        })
+
+        if all(cache._only_fields for cache in caches):
+            queryset = queryset.only(*OrderedDict.fromkeys(
+                field_name
+                for cache in caches
+                for field_name in cache._prepare_only_fields()
+            ))
+
+        return queryset.distinct()
+
+    @staticmethod
+    def _get_flag_name(cache_number: int) -> str:
+        """
+        Наименование признака принадлежности строки выборке кеша
+        """
+        return f'_coalesced_cache_{cache_number}'
+
+    def _load(self):
+        """
+        Получение объектов и их распределение по кешам
+        """
+        flag_names = [
+            self._get_flag_name(cache_number) if
+            cache._additional_filter_params else
+            None
+            for cache_number, cache in enumerate(self._caches)
+        ]
+        entities = [[] for _ in self._caches]
+
+        for entity in self._prepare_queryset():
+            entity_dict = entity.__dict__
+
+            for cache_entities, flag_name in zip(entities, flag_names):
+                # Признаки удаляются, чтобы не оставлять их у общих объектов
+                if flag_name is None or entity_dict.pop(flag_name):
+                    cache_entities.append(entity)
+
+        self._entities = entities
+
+    def get_entities(
+        self,
+        cache_number: int,
+    ) -> List[Model]:
+        """
+        Получение объектов кеша по его порядковому номеру в группе
+        """
+        with self._lock:
+            if self._entities is None:
+                self._load()
+
+        return self._entities[cache_number]
+
+    def bind(self):
+        """
+        Установка загрузчика источником объектов кешей группы
+        """
+        for cache_number, cache in enumerate(self._caches):
+            cache.set_entities_source(partial(self.get_entities, cache_number))
+
+
+class CachesPreparationError(Exception):
+    """
+    Ошибка подготовки кешей хранилища.
+
+    Содержит исключения, возникшие при подготовке кешей, по наименованиям
+    кешей и наименования кешей, подготовка которых не выполнялась из-за
+    ошибок подготовки кешей, от которых они зависят.
+    """
+
+    def __init__(
+        self,
+        errors: Dict[str, Exception],
+        skipped_caches: List[str],
+    ):
+        self.errors = errors
+        self.skipped_caches = skipped_caches
+
+        super().__init__(
+            CACHES_PREPARATION_ERROR.format(
+                errors='; '.join(
+                    f'{name}: {error!r}'
+                    for name, error in errors.items()
+                ),
+                skipped_caches=', '.join(skipped_caches) or '-',
+            )
+        )
+
+
 class CacheStorage(BaseCache):
     """
     Хранилище кешей.
@@ -568,8 +3105,313 @@ class CacheStorage(BaseCache):
     Для выполнения функций, в большинстве случаев, необходимы кеши для
     множества сущностей созданные по особым правилам, но подчиняющиеся общим.
     Для их объединения и применения в функции создаются хранилища, содержащие кеши в виде публичных свойств, с
-    которыми в дальнейшем удобно работать
+    которыми в дальнейшем удобно работать.
+
+    Кеши, присвоенные атрибутам хранилища, регистрируются в нем. Если у класса
+    хранилища указано lazy = True, то все кеши, создаваемые при инициализации
+    хранилища без явного указания режима, становятся ленивыми и выполняют
+    запросы только при первом обращении. Кеши, к которым не было обращений,
+    можно получить через untouched_caches.
+
+    Если у класса хранилища указано coalesce_queries = True, то кеши
+    создаются ленивыми, а запросы кешей одной модели, отличающихся только
+    дополнительными параметрами фильтрации, ключом поиска и индексами,
+    объединяются в один запрос (см. CoalescedEntitiesLoader). Если не указано
+    lazy = True, то после инициализации хранилища кеши подготавливаются.
+
+    Если у класса хранилища указано concurrent = True, то кеши создаются
+    ленивыми и после инициализации хранилища подготавливаются параллельно в
+    пуле из max_workers потоков, каждый со своими соединениями с БД, которые
+    закрываются после подготовки кеша. Кеш, указанный в cache_dependencies,
+    подготавливается только после кешей, от которых он зависит. Ошибки
+    подготовки кешей собираются и выбрасываются хранилищем в виде
+    CachesPreparationError. Если одновременно указано lazy = True, то
+    параллельная подготовка выполняется только при явном вызове prepare.
+
+    Если у класса хранилища указан memory_budget, то кеши хранилища,
+    созданные без явного указания бюджета, резервируют память в общем
+    бюджете хранилища. Кеши, не уместившиеся в бюджете, хранят строки на
+    диске (см. EntityCache).
+
+    Кеш объектов сущности может разрешать внешние ключи по другим кешам
+    хранилища вместо select_related, указав в related_caches наименования
+    атрибутов хранилища со связанными кешами. После инициализации хранилища
+    наименования заменяются кешами, а при параллельной подготовке связанные
+    кеши подготавливаются до ссылающихся на них кешей.
     """
 
+    # Создавать кеши хранилища ленивыми
+    lazy = False
+    # Объединять запросы кешей одной модели
+    coalesce_queries = False
+    # Подготавливать кеши хранилища параллельно
+    concurrent = False
+    # Наибольшее количество потоков при параллельной подготовке кешей
+    max_workers: Optional[int] = None
+    # Зависимости кешей: наименование кеша - наименования кешей, которые
+    # должны быть подготовлены до него
+    cache_dependencies: Dict[str, Tuple[str, ...]] = {}
+    # Общий бюджет памяти кешей хранилища в байтах
+    memory_budget: Optional[int] = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        if '__init__' in cls.__dict__:
+            cls.__init__ = cls._wrap_init(cls.__dict__['__init__'])
+
+    @staticmethod
+    def _wrap_init(init):
+        """
+        Оборачивание инициализации наследника для создания кешей в режиме,
+        указанном у хранилища, и параллельной подготовки кешей после
+        инициализации
+        """
+        @wraps(init)
+        def wrapper(self, *args, **kwargs):
+            # Инициализация родительского класса хранилища также обернута
+            if self.__dict__.get('_is_initializing'):
+                init(self, *args, **kwargs)
+
+                return
+
+            self.__dict__['_is_initializing'] = True
+            previous_lazy = is_lazy_caches_creation()
+            previous_memory_budget = get_caches_creation_memory_budget()
+            _caches_creation_settings.lazy = (
+                self.lazy or
+                self.concurrent or
+                self.coalesce_queries
+            )
+            # Хранилище без бюджета, создаваемое в другом хранилище,
+            # использует бюджет внешнего хранилища
+            _caches_creation_settings.memory_budget = (
+                prepare_memory_budget(self.memory_budget) or
+                previous_memory_budget
+            )
+
+            try:
+                init(self, *args, **kwargs)
+            finally:
+                _caches_creation_settings.lazy = previous_lazy
+                _caches_creation_settings.memory_budget = previous_memory_budget  # noqa
+                del self.__dict__['_is_initializing']
+
+            self._bind_related_caches()
+
+            if self.coalesce_queries:
+                self._coalesce_queries()
+
+            if (self.concurrent or self.coalesce_queries) and not self.lazy:
+                self.prepare()
+
+        return wrapper
+
+    def __setattr__(self, name: str, value: Any):
+        if isinstance(value, BaseCache) and not name.startswith('_'):
+            self.__dict__.setdefault('_caches', OrderedDict())[name] = value
+
+        super().__setattr__(name, value)
+
+    @property
+    def caches(self) -> Dict[str, BaseCache]:
+        """
+        Зарегистрированные в хранилище кеши по наименованиям атрибутов
+        """
+        return self.__dict__.get('_caches', OrderedDict())
+
+    @property
+    def is_touched(self) -> bool:
+        """
+        Было ли обращение к данным хотя бы одного из кешей хранилища
+        """
+        return any(cache.is_touched for cache in self.caches.values())
+
+    def _get_child_caches(self) -> Dict[str, BaseCache]:
+        return self.caches
+
+    def _get_rows_count(self) -> int:
+        return sum(cache._get_rows_count() for cache in self.caches.values())
+
+    def mark_as_shared(self):
+        super().mark_as_shared()
+
+        for cache in self.caches.values():
+            cache.mark_as_shared()
+
+    @property
+    def untouched_caches(self) -> List[str]:
+        """
+        Наименования кешей хранилища, к данным которых не было обращений.
+        Такие кеши являются кандидатами на удаление из хранилища
+        """
+        return [
+            name
+            for name, cache in self.caches.items()
+            if not cache.is_touched
+        ]
+
+    def prepare(self):
+        """
+        Принудительная подготовка всех кешей хранилища
+        """
+        if self.concurrent:
+            self._prepare_concurrently()
+        else:
+            for cache in self.caches.values():
+                cache.prepare()
+
+    def _bind_related_caches(self):
+        """
+        Замена наименований связанных кешей в кешах объектов сущности
+        кешами хранилища
+        """
+        caches = self.caches
+
+        for cache in caches.values():
+            if isinstance(cache, EntityCache):
+                cache.bind_related_caches(caches)
+
+    def _coalesce_queries(self):
+        """
+        Объединение запросов неподготовленных кешей одной модели с
+        одинаковым базовым запросом
+        """
+        groups = OrderedDict()
+
+        for cache in self.caches.values():
+            if isinstance(cache, EntityCache) and cache.is_coalescable:
+                group_key = CoalescedEntitiesLoader.get_group_key(cache)
+                groups.setdefault(group_key, []).append(cache)
+
+        for group_caches in groups.values():
+            if len(group_caches) > 1:
+                CoalescedEntitiesLoader(group_caches).bind()
+
+    def _prepare_cache_dependencies(self) -> Dict[str, Set[str]]:
+        """
+        Получение зависимостей кешей хранилища с проверкой наименований кешей
+        и отсутствия циклических зависимостей
+        """
+        caches = self.caches
+        dependencies = OrderedDict(
+            (name, set(self.cache_dependencies.get(name, ())))
+            for name in caches
+        )
+
+        # Связанные кеши должны быть подготовлены до ссылающихся на них кешей
+        names = {id(cache): name for name, cache in caches.items()}
+
+        for name, cache in caches.items():
+            if isinstance(cache, EntityCache):
+                for related_cache in cache.related_caches.values():
+                    related_cache_name = names.get(id(related_cache))
+
+                    if related_cache_name is not None:
+                        dependencies[name].add(related_cache_name)
+
+        for name, cache_dependencies in dependencies.items():
+            unknown_caches = cache_dependencies.difference(caches)
+
+            if unknown_caches:
+                raise ValueError(
+                    UNKNOWN_CACHE_DEPENDENCY_ERROR.format(
+                        name=name,
+                        dependencies=', '.join(sorted(unknown_caches)),
+                    )
+                )
+
+        # Поиск в глубину с отметкой кешей, находящихся на пути обхода
+        visited = set()
+        path = set()
+
+        def visit(name: str):
+            if name in path:
+                raise ValueError(
+                    CACHE_DEPENDENCIES_CYCLE_ERROR.format(name=name)
+                )
+
+            if name not in visited:
+                path.add(name)
+
+                for dependency in dependencies[name]:
+                    visit(dependency)
+
+                path.discard(name)
+                visited.add(name)
+
+        for name in dependencies:
+            visit(name)
+
+        return dependencies
+
+    @staticmethod
+    def _prepare_cache_in_thread(cache: BaseCache):
+        """
+        Подготовка кеша в потоке пула с закрытием соединений с БД потока
+        """
+        try:
+            cache.prepare()
+        finally:
+            connections.close_all()
+
+    def _prepare_concurrently(self):
+        """
+        Параллельная подготовка кешей хранилища с учетом зависимостей
+        """
+        caches = self.caches
+        pending = self._prepare_cache_dependencies()
+        errors = OrderedDict()
+        skipped_caches = []
+        futures = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit_ready_caches():
+                has_skipped_caches = True
+
+                # Пропуск кешей, зависящих от кешей с ошибками подготовки,
+                # выполняется до тех пор, пока находятся такие кеши
+                while has_skipped_caches:
+                    has_skipped_caches = False
+                    failed_caches = set(errors).union(skipped_caches)
+
+                    for name, dependencies in list(pending.items()):
+                        if dependencies & failed_caches:
+                            del pending[name]
+                            skipped_caches.append(name)
+                            has_skipped_caches = True
+
+                for name, dependencies in list(pending.items()):
+                    if not dependencies:
+                        del pending[name]
+                        future = executor.submit(
+                            self._prepare_cache_in_thread,
+                            caches[name],
+                        )
+                        futures[future] = name
+
+            submit_ready_caches()
+
+            while futures:
+                done_futures, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+                for future in done_futures:
+                    name = futures.pop(future)
+                    error = future.exception()
+
+                    if error is None:
+                        for dependencies in pending.values():
+                            dependencies.discard(name)
+                    else:
+                        errors[name] = error
+
+                submit_ready_caches()
+
+        if errors:
+            raise CachesPreparationError(
+                errors=errors,
+                skipped_caches=skipped_caches,
+            ) from next(iter(errors.values()))
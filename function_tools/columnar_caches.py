@@ -0,0 +1,908 @@
+from collections.abc import (
+    Iterable,
+    Sequence,
+)
+from time import (
+    perf_counter,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+from django.conf import (
+    settings,
+)
+from django.db.models import (
+    AutoField,
+    BooleanField,
+    DateField,
+    DateTimeField,
+    FloatField,
+    IntegerField,
+    Model,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.decorators import (
+    cache_access,
+)
+from function_tools.enums import (
+    AggregateFunctionEnum,
+    LookupEnum,
+)
+from function_tools.lookups import (
+    LOOKUP_CHECKS,
+    split_lookup,
+)
+from function_tools.records import (
+    EntityRecord,
+    get_record_column_field,
+    prepare_record_column,
+)
+from function_tools.statistics import (
+    estimate_container_size,
+    estimate_objects_size,
+)
+from function_tools.strings import (
+    CHANGE_MARKER_FIELD_IS_REQUIRED_ERROR,
+    NUMPY_IS_REQUIRED_ERROR,
+    SHARED_CACHE_IS_READ_ONLY_ERROR,
+)
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ColumnarEntityCache(EntityCache):
+    """
+    Колоночный кеш объектов сущности.
+
+    Предназначен для моделей с большим количеством числовых полей и дат,
+    например, остатков и оборотов. Значения каждого поля хранятся в отдельном
+    массиве NumPy, фильтрация и агрегация выполняются векторно через маски без
+    циклов Python. Объекты кеша в виде компактных записей создаются только для
+    строк, попавших в результат.
+
+    Поля, содержащие пустые значения, а также строковые и десятичные поля
+    хранятся в массивах с типом object. Для точности денежных сумм значения
+    DecimalField не приводятся к числам с плавающей точкой.
+
+    Поля dictionary_fields хранятся в массивах кодов наименьшего подходящего
+    беззнакового целого типа с общей для колонки таблицей значений. Условия
+    фильтрации и группировка по таким полям выполняются по кодам, условия
+    сравнения проверяются только по таблице значений.
+
+    Требует установленного пакета numpy.
+    """
+
+    supports_spilling = False
+
+    def __init__(
+        self,
+        model: Type[Model],
+        *args,
+        **kwargs,
+    ):
+        if numpy is None:
+            raise ImportError(NUMPY_IS_REQUIRED_ERROR)
+
+        # Массивы значений колонок
+        self._columns: Dict[str, 'numpy.ndarray'] = {}
+        self._rows_count = 0
+
+        # Отсортированные значения первичных ключей и соответствующие им
+        # номера строк для векторного поиска строк по первичным ключам
+        self._sorted_pks: Optional['numpy.ndarray'] = None
+        self._pk_row_indexes: Optional['numpy.ndarray'] = None
+
+        # Таблицы значений колонок, хранящихся кодами словаря. Значение
+        # строки получается из таблицы по коду строки
+        self._dictionary_tables: Dict[str, 'numpy.ndarray'] = {}
+
+        kwargs['records_mode'] = True
+
+        super().__init__(model, *args, **kwargs)
+
+    @property
+    @cache_access
+    def entities(self) -> List[EntityRecord]:
+        """
+        Возвращает записи всех строк кеша. Записи создаются при каждом
+        обращении
+        """
+        return self._get_entities(numpy.arange(self._rows_count))
+
+    @property
+    @cache_access
+    def rows_count(self) -> int:
+        """
+        Количество строк в кеше
+        """
+        return self._rows_count
+
+    def _get_rows_count(self) -> int:
+        return self._rows_count
+
+    def _clear_prepared_data(self):
+        super()._clear_prepared_data()
+
+        self._columns = {}
+        self._rows_count = 0
+        self._sorted_pks = None
+        self._pk_row_indexes = None
+        self._dictionary_tables = {}
+
+    def _estimate_memory_size(self) -> int:
+        size = (
+            estimate_container_size(self._entities_hash_table) +
+            estimate_container_size(self._entities_prefix_index)
+        )
+
+        for column in (
+            *self._columns.values(),
+            self._sorted_pks,
+            self._pk_row_indexes,
+        ):
+            if column is not None:
+                size += column.nbytes
+
+                if column.dtype == object:
+                    size += estimate_objects_size(column)
+
+        for table in self._dictionary_tables.values():
+            size += table.nbytes + estimate_objects_size(table)
+
+        for dictionary in self._dictionaries.values():
+            size += estimate_container_size(vars(dictionary))
+
+        return size
+
+    def _get_column_dtype(self, column: str):
+        """
+        Получение типа массива NumPy для колонки. Точка расширения для
+        переопределения типов хранения
+        """
+        field = get_record_column_field(self._model, column)
+
+        if field.is_relation:
+            field = field.target_field
+
+        if isinstance(field, BooleanField):
+            dtype = numpy.bool_
+        elif isinstance(field, (AutoField, IntegerField)):
+            dtype = numpy.int64
+        elif isinstance(field, FloatField):
+            dtype = numpy.float64
+        elif isinstance(field, DateTimeField):
+            dtype = object if settings.USE_TZ else 'datetime64[us]'
+        elif isinstance(field, DateField):
+            dtype = 'datetime64[D]'
+        else:
+            dtype = object
+
+        return numpy.dtype(dtype)
+
+    def _prepare_column(
+        self,
+        column: str,
+        values: Sequence,
+    ) -> 'numpy.ndarray':
+        """
+        Формирование массива значений колонки
+        """
+        if (
+            column in self._dictionaries and
+            column != self._record_class._pk_attname
+        ):
+            return self._prepare_encoded_column(column, values)
+
+        dtype = self._get_column_dtype(column)
+
+        # Пустые значения без потерь хранятся только в массивах дат (NaT)
+        if dtype.kind != 'M' and None in values:
+            dtype = numpy.dtype(object)
+
+        return numpy.fromiter(values, dtype=dtype, count=len(values))
+
+    def _prepare_encoded_column(
+        self,
+        column: str,
+        values: Sequence,
+    ) -> 'numpy.ndarray':
+        """
+        Формирование массива кодов значений колонки и таблицы значений по
+        словарю значений колонки
+        """
+        dictionary = self._dictionaries[column]
+        codes = [dictionary.encode(value) for value in values]
+
+        table = numpy.empty(len(dictionary), dtype=object)
+        table[:] = dictionary.values
+        self._dictionary_tables[column] = table
+
+        return numpy.array(
+            codes,
+            dtype=numpy.min_scalar_type(len(dictionary) - 1),
+        )
+
+    def _decode_column(
+        self,
+        column: str,
+        values: 'numpy.ndarray',
+    ) -> 'numpy.ndarray':
+        """
+        Замена кодов значений колонки значениями из таблицы значений
+        """
+        table = self._dictionary_tables.get(column)
+
+        return values if table is None else table[values]
+
+    def _prepare_entities_hash_table(self):
+        """
+        Построение массивов колонок, массива номеров строк по первичным ключам
+        и хеш-таблицы с номерами строк по ключу поиска.
+
+        Вторичные индексы в колоночном кеше не строятся, т.к. фильтрация
+        выполняется масками по колонкам.
+        """
+        rows = list(self._iterate_rows())
+        columns = self._record_class._columns
+
+        values_by_columns = list(zip(*rows)) if rows else [()] * len(columns)
+        self._rows_count = len(rows)
+        self._entities = None
+        del rows
+
+        self._dictionary_tables = {}
+        self._columns = {
+            column: self._prepare_column(column, values)
+            for column, values in zip(columns, values_by_columns)
+        }
+        del values_by_columns
+
+        pks = self._columns[self._record_class._pk_attname]
+        self._pk_row_indexes = numpy.argsort(pks, kind='stable')
+        self._sorted_pks = pks[self._pk_row_indexes]
+
+        hash_table = {}
+        self._prepare_entities_prefix_index()
+
+        key_columns = [
+            self._get_column(key_item).tolist()
+            for key_item in self._searching_key_paths
+        ]
+
+        for row_index, key_values in enumerate(zip(*key_columns)):
+            self._add_to_hash_table(
+                hash_table=hash_table,
+                key_values=key_values,
+                entity=row_index,
+            )
+
+        self._entities_hash_table = hash_table
+
+        if self._change_marker_path:
+            marker_values = self._get_column(
+                self._change_marker_path,
+            ).tolist()
+            self._change_marker_value = max(
+                (value for value in marker_values if value is not None),
+                default=None,
+            )
+
+    def refresh(self):
+        """
+        Обновление колоночного кеша.
+
+        Массивы колонок не допускают изменения на месте, поэтому при наличии
+        изменений по маркеру или при расхождении количества строк кеша и
+        выборки (строки удалены из БД) кеш перестраивается полностью.
+        """
+        if self._is_shared:
+            raise ValueError(SHARED_CACHE_IS_READ_ONLY_ERROR)
+
+        if not self._change_marker_field:
+            raise ValueError(CHANGE_MARKER_FIELD_IS_REQUIRED_ERROR)
+
+        started_at = perf_counter()
+        is_prepared = self._is_prepared
+        has_changes = True
+
+        if is_prepared and self._change_marker_value is not None:
+            has_changes = (
+                self._actual_entities_queryset.filter(
+                    **{f'{self._change_marker_field}__gt': self._change_marker_value},  # noqa
+                ).exists() or
+                self._prepare_entities_queryset().count() !=
+                self._get_rows_count()
+            )
+
+        if has_changes:
+            self._is_prepared = False
+            self.prepare()
+
+        if is_prepared:
+            self._statistics.increment(
+                refresh_count=1,
+                refresh_time=perf_counter() - started_at,
+            )
+
+    def _get_column_name(self, field_name: str) -> str:
+        """
+        Получение наименования колонки по наименованию поля
+        """
+        return prepare_record_column(self._model, field_name)
+
+    def _get_column(
+        self,
+        field_name: str,
+        mask: Union['numpy.ndarray', slice] = slice(None),
+    ) -> 'numpy.ndarray':
+        """
+        Получение массива значений колонки по наименованию поля для строк,
+        отобранных маской
+        """
+        column = self._get_column_name(field_name)
+
+        return self._decode_column(column, self._columns[column][mask])
+
+    def _get_entities(
+        self,
+        row_indexes: 'numpy.ndarray',
+    ) -> List[EntityRecord]:
+        """
+        Создание записей для строк с указанными номерами
+        """
+        record_class = self._record_class
+        values_by_columns = [
+            self._decode_column(
+                column,
+                self._columns[column][row_indexes],
+            ).tolist()
+            for column in record_class._columns
+        ]
+
+        return [
+            record_class(values)
+            for values in zip(*values_by_columns)
+        ]
+
+    def _get_entities_by_pks(self, pks: Iterable[Any]) -> Dict[Any, Any]:
+        return {
+            entity.pk: entity
+            for entity in self._get_entities(self.get_row_indexes(pks))
+        }
+
+    @cache_access
+    def get_row_indexes(
+        self,
+        pks: Iterable,
+    ) -> 'numpy.ndarray':
+        """
+        Векторный поиск номеров строк по значениям первичных ключей.
+        Отсутствующие в кеше первичные ключи пропускаются
+        """
+        pks = numpy.asarray(list(pks), dtype=self._sorted_pks.dtype)
+        positions = numpy.searchsorted(self._sorted_pks, pks)
+        positions[positions == self._rows_count] = 0
+
+        found = self._sorted_pks[positions] == pks if self._rows_count else []
+
+        return self._pk_row_indexes[positions[found]]
+
+    def _prepare_field_mask(
+        self,
+        field_name: str,
+        values: Set[Any],
+    ) -> 'numpy.ndarray':
+        """
+        Формирование маски строк, значение поля которых входит в множество
+        значений
+        """
+        column_name = self._get_column_name(field_name)
+        values = {
+            value.pk if isinstance(value, Model) else value
+            for value in values
+        }
+
+        if column_name in self._dictionary_tables:
+            dictionary = self._dictionaries[column_name]
+
+            return self._prepare_codes_mask(
+                column_name,
+                (dictionary.get_code(value) for value in values),
+            )
+
+        column = self._columns[column_name]
+
+        if column.dtype.kind == 'O':
+            mask = numpy.zeros(self._rows_count, dtype=bool)
+
+            for value in values:
+                mask |= column == value
+        else:
+            has_null = None in values
+            values.discard(None)
+
+            mask = numpy.isin(
+                column,
+                numpy.array(list(values), dtype=column.dtype),
+            )
+
+            if has_null and column.dtype.kind == 'M':
+                mask |= numpy.isnat(column)
+
+        return mask
+
+    def _prepare_mask(
+        self,
+        filter_params: Dict[str, Any],
+    ) -> 'numpy.ndarray':
+        """
+        Формирование маски строк по параметрам фильтрации
+        """
+        mask = numpy.ones(self._rows_count, dtype=bool)
+
+        for key, value in self._prepare_filter(filter_params).items():
+            field_name, lookup = split_lookup(key)
+
+            if lookup in LookupEnum.equality_lookups:
+                mask &= self._prepare_field_mask(field_name, value)
+            else:
+                mask &= self._prepare_lookup_mask(field_name, lookup, value)
+
+        return mask
+
+    def _prepare_lookup_mask(
+        self,
+        field_name: str,
+        lookup: str,
+        value: Any,
+    ) -> 'numpy.ndarray':
+        """
+        Формирование маски строк по условию сравнения, диапазона, начала
+        строки или пустого значения. Колонки с типом object проверяются
+        поэлементно, колонки кодов словаря - по таблице значений
+        """
+        column_name = self._get_column_name(field_name)
+        table = self._dictionary_tables.get(column_name)
+
+        if table is not None:
+            # Условие проверяется по таблице значений, включая пустое
+            # значение с кодом 0
+            check = LOOKUP_CHECKS[lookup]
+
+            return self._prepare_codes_mask(
+                column_name,
+                (
+                    code
+                    for code, item in enumerate(table.tolist())
+                    if check(item, value)
+                ),
+            )
+
+        column = self._columns[column_name]
+
+        if lookup == LookupEnum.ISNULL:
+            mask = self._prepare_null_mask(column)
+
+            if not value:
+                mask = ~mask
+        elif column.dtype.kind == 'O' or lookup == LookupEnum.STARTSWITH:
+            check = LOOKUP_CHECKS[lookup]
+            mask = numpy.fromiter(
+                (check(item, value) for item in column.tolist()),
+                dtype=bool,
+                count=self._rows_count,
+            )
+        else:
+            bounds = numpy.array(
+                [
+                    bound.pk if isinstance(bound, Model) else bound
+                    for bound in (
+                        value if
+                        lookup == LookupEnum.RANGE else
+                        (value, )
+                    )
+                ],
+                dtype=column.dtype,
+            )
+
+            # Сравнение с NaT и NaN ложно, поэтому пустые значения не
+            # удовлетворяют условию
+            if lookup == LookupEnum.GT:
+                mask = column > bounds[0]
+            elif lookup == LookupEnum.GTE:
+                mask = column >= bounds[0]
+            elif lookup == LookupEnum.LT:
+                mask = column < bounds[0]
+            elif lookup == LookupEnum.LTE:
+                mask = column <= bounds[0]
+            else:
+                mask = (column >= bounds[0]) & (column <= bounds[1])
+
+        return mask
+
+    def _prepare_codes_mask(
+        self,
+        column: str,
+        codes: Iterable[Optional[int]],
+    ) -> 'numpy.ndarray':
+        """
+        Формирование маски строк, код значения колонки которых входит в
+        перечень кодов. Отсутствующие в словаре значения (None) пропускаются
+        """
+        column_codes = self._columns[column]
+
+        return numpy.isin(
+            column_codes,
+            numpy.array(
+                [code for code in codes if code is not None],
+                dtype=column_codes.dtype,
+            ),
+        )
+
+    def _prepare_filtered_column(
+        self,
+        field_name: str,
+        filter_params: Dict[str, Any],
+    ) -> 'numpy.ndarray':
+        """
+        Получение значений колонки для строк, удовлетворяющих параметрам
+        фильтрации
+        """
+        return self._get_column(
+            field_name,
+            self._prepare_mask(filter_params) if filter_params else slice(None),  # noqa
+        )
+
+    @cache_access
+    def filter(
+        self,
+        only_first: bool = False,
+        **kwargs,
+    ):
+        """
+        Фильтрация строк кеша по заданным параметрам с помощью масок.
+        Возвращает записи строк.
+        """
+        row_indexes = numpy.flatnonzero(self._prepare_mask(kwargs))
+
+        statistics = self._statistics
+        statistics.filter_count += 1
+
+        if row_indexes.size:
+            statistics.filter_hits += 1
+
+        if only_first:
+            row_indexes = row_indexes[:1]
+
+        result = self._get_entities(row_indexes)
+
+        if only_first:
+            result = result[0] if result else None
+
+        return result
+
+    def _prepare_hash_table_item(self, item: Any) -> Any:
+        """
+        Замена номеров строк в элементе хеш-таблицы на записи
+        """
+        if isinstance(item, int):
+            item = self._get_entities(numpy.array([item]))[0]
+        elif isinstance(item, set):
+            item = set(self._get_entities(numpy.array(sorted(item))))
+        elif isinstance(item, dict):
+            item = {
+                key: self._prepare_hash_table_item(value)
+                for key, value in item.items()
+            }
+
+        return item
+
+    @cache_access
+    def values_list(
+        self,
+        fields: Tuple[str, ...],
+        **kwargs,
+    ) -> Optional[List[Tuple]]:
+        """
+        Получение списка кортежей значений полей. Для одного поля
+        возвращается список значений.
+
+        :param fields: кортеж наименований полей
+        :param kwargs: параметры фильтрации строк
+        """
+        mask = self._prepare_mask(kwargs) if kwargs else slice(None)
+
+        values_by_columns = [
+            self._get_column(field_name, mask).tolist()
+            for field_name in fields
+        ]
+
+        return (
+            values_by_columns[0] if
+            len(values_by_columns) == 1 else
+            list(zip(*values_by_columns))
+        )
+
+    @cache_access
+    def flat_values_list(
+        self,
+        field_name: str,
+    ):
+        """
+        Получение плоского списка значений поля без пустых значений.
+
+        : param field_name: наименование поля
+        """
+        return list(
+            filter(
+                None,
+                self._get_column(field_name).tolist(),
+            )
+        )
+
+    @cache_access
+    def first(self):
+        """
+        Получение записи первой строки кеша
+        """
+        result = None
+
+        if self._rows_count:
+            result = self._get_entities(numpy.array([0]))[0]
+
+        return result
+
+    @cache_access
+    def count(self, **kwargs) -> int:
+        """
+        Количество строк, удовлетворяющих параметрам фильтрации
+        """
+        return (
+            int(numpy.count_nonzero(self._prepare_mask(kwargs))) if
+            kwargs else
+            self._rows_count
+        )
+
+    @cache_access
+    def sum(
+        self,
+        field_name: str,
+        **kwargs,
+    ):
+        """
+        Сумма значений поля по строкам, удовлетворяющим параметрам фильтрации.
+        Пустые значения не учитываются.
+        """
+        column = self._prepare_filtered_column(field_name, kwargs)
+        column = column[~self._prepare_null_mask(column)]
+
+        result = None
+
+        if len(column):
+            result = column.sum()
+
+            if isinstance(result, numpy.generic):
+                result = result.item()
+
+        return result
+
+    def _prepare_null_mask(
+        self,
+        column: 'numpy.ndarray',
+    ) -> 'numpy.ndarray':
+        """
+        Формирование маски пустых значений колонки
+        """
+        if column.dtype.kind == 'O':
+            mask = numpy.equal(column, None)
+        elif column.dtype.kind == 'M':
+            mask = numpy.isnat(column)
+        elif column.dtype.kind == 'f':
+            mask = numpy.isnan(column)
+        else:
+            mask = numpy.zeros(len(column), dtype=bool)
+
+        return mask
+
+    def _factorize(
+        self,
+        column: 'numpy.ndarray',
+    ) -> Tuple[List[Any], 'numpy.ndarray']:
+        """
+        Кодирование значений колонки целыми числами. Возвращает список
+        уникальных значений и массив кодов значений строк
+        """
+        if column.dtype.kind == 'O':
+            codes_by_values = {}
+            codes = numpy.fromiter(
+                (
+                    codes_by_values.setdefault(value, len(codes_by_values))
+                    for value in column.tolist()
+                ),
+                dtype=numpy.int64,
+                count=len(column),
+            )
+            uniques = list(codes_by_values)
+        else:
+            uniques, codes = numpy.unique(column, return_inverse=True)
+            uniques = uniques.tolist()
+
+        return uniques, codes.reshape(-1)
+
+    def _factorize_field(
+        self,
+        field_name: str,
+        mask: Union['numpy.ndarray', slice],
+    ) -> Tuple[List[Any], 'numpy.ndarray']:
+        """
+        Кодирование значений поля для строк, отобранных маской. Колонки кодов
+        словаря кодируются по кодам без получения значений
+        """
+        column_name = self._get_column_name(field_name)
+        table = self._dictionary_tables.get(column_name)
+
+        if table is None:
+            return self._factorize(self._get_column(field_name, mask))
+
+        uniques, codes = numpy.unique(
+            self._columns[column_name][mask],
+            return_inverse=True,
+        )
+
+        return table[uniques].tolist(), codes.reshape(-1)
+
+    def _aggregate(
+        self,
+        aggregates: Dict[str, Tuple[str, str]],
+        filter_params: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Вычисление агрегатов по колонкам без группировки
+        """
+        mask = self._prepare_mask(filter_params) if filter_params else slice(None)  # noqa
+
+        result = {}
+        for result_name, (function, field_name) in aggregates.items():
+            column = self._get_column(field_name, mask)
+            result[result_name] = self._aggregate_by_groups(
+                function=function,
+                column=column,
+                group_indexes=numpy.zeros(len(column), dtype=numpy.intp),
+                groups_count=1,
+            )[0]
+
+        return result
+
+    def _group_by(
+        self,
+        keys: Tuple[str, ...],
+        aggregates: Dict[str, Tuple[str, str]],
+        filter_params: Dict[str, Any],
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        Группировка строк по значениям колонок с векторным вычислением
+        агрегатов
+        """
+        mask = self._prepare_mask(filter_params) if filter_params else slice(None)  # noqa
+
+        group_codes = None
+        keys_uniques = []
+        keys_codes = []
+        for key in keys:
+            uniques, codes = self._factorize_field(key, mask)
+            keys_uniques.append(uniques)
+            keys_codes.append(codes)
+
+            group_codes = (
+                codes if
+                group_codes is None else
+                group_codes * len(uniques) + codes
+            )
+
+        groups, first_row_indexes, group_indexes = numpy.unique(
+            group_codes,
+            return_index=True,
+            return_inverse=True,
+        )
+        group_indexes = group_indexes.reshape(-1)
+
+        groups_keys_values = [
+            [uniques[code] for code in codes[first_row_indexes].tolist()]
+            for uniques, codes in zip(keys_uniques, keys_codes)
+        ]
+        groups_keys = (
+            list(zip(*groups_keys_values)) if
+            len(keys) > 1 else
+            groups_keys_values[0]
+        )
+
+        result = {
+            group_key: {}
+            for group_key in groups_keys
+        }
+
+        for result_name, (function, field_name) in aggregates.items():
+            column = self._get_column(field_name, mask)
+            values = self._aggregate_by_groups(
+                function=function,
+                column=column,
+                group_indexes=group_indexes,
+                groups_count=len(groups),
+            )
+
+            for group_key, value in zip(groups_keys, values):
+                result[group_key][result_name] = value
+
+        return result
+
+    def _aggregate_by_groups(
+        self,
+        function: str,
+        column: 'numpy.ndarray',
+        group_indexes: 'numpy.ndarray',
+        groups_count: int,
+    ) -> List[Any]:
+        """
+        Вычисление агрегата по группам. Для групп без непустых значений
+        результатом суммы, минимума и максимума является None
+        """
+        not_null_mask = ~self._prepare_null_mask(column)
+        column = column[not_null_mask]
+        group_indexes = group_indexes[not_null_mask]
+
+        if function == AggregateFunctionEnum.COUNT:
+            return numpy.bincount(
+                group_indexes,
+                minlength=groups_count,
+            ).tolist()
+
+        if function == AggregateFunctionEnum.DISTINCT:
+            result = [set() for _ in range(groups_count)]
+
+            for group_index, value in zip(
+                group_indexes.tolist(),
+                column.tolist(),
+            ):
+                result[group_index].add(value)
+
+            return result
+
+        ufunc = {
+            AggregateFunctionEnum.SUM: numpy.add,
+            AggregateFunctionEnum.MIN: numpy.minimum,
+            AggregateFunctionEnum.MAX: numpy.maximum,
+        }[function]
+
+        order = numpy.argsort(group_indexes, kind='stable')
+        sorted_group_indexes = group_indexes[order]
+        starts = numpy.flatnonzero(
+            numpy.diff(sorted_group_indexes, prepend=-1)
+        )
+
+        result = [None] * groups_count
+
+        if len(starts):
+            values = ufunc.reduceat(column[order], starts).tolist()
+
+            for group_index, value in zip(
+                sorted_group_indexes[starts].tolist(),
+                values,
+            ):
+                result[group_index] = value
+
+        return result
@@ -14,3 +14,23 @@ def run_without_errors(func):
             return func(self, *args, **kwargs)
 
     return wrapper
+
+
+def cache_access(func):
+    """
+    Декоратор методов доступа к данным кеша. Отмечает факт обращения к кешу и
+    подготавливает ленивый кеш при первом обращении. Обращения к
+    подготовленному кешу, к которому уже обращались, передаются методу
+    без дополнительных действий
+    """
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self._is_prepared and self._is_touched:
+            return func(self, *args, **kwargs)
+
+        self._touch()
+
+        return func(self, *args, **kwargs)
+
+    return wrapper
@@ -9,3 +9,69 @@ class TransferPeriodEnum:
         OLD: 'Старый период',
         NEW: 'Новый период',
     }
+
+
+class AggregateFunctionEnum:
+    """
+    Перечисление функций агрегации значений объектов кеша
+    """
+    SUM = 'sum'
+    COUNT = 'count'
+    MIN = 'min'
+    MAX = 'max'
+    DISTINCT = 'distinct'
+
+    values = {
+        SUM: 'Сумма',
+        COUNT: 'Количество',
+        MIN: 'Минимум',
+        MAX: 'Максимум',
+        DISTINCT: 'Различные значения',
+    }
+
+
+class HashTableLayoutEnum:
+    """
+    Перечисление структур хеш-таблицы кеша объектов сущности.
+
+    Плоская хеш-таблица экономит память, когда префиксам составного ключа
+    соответствует мало объектов, и не имеет смысла для ключей из одной части
+    """
+    NESTED = 'nested'
+    FLAT = 'flat'
+
+    values = {
+        NESTED: 'Вложенные словари по частям ключа',
+        FLAT: 'Плоский словарь с кортежем значений ключа',
+    }
+
+
+class LookupEnum:
+    """
+    Перечисление условий фильтрации объектов кеша, указываемых через двойное
+    подчеркивание после наименования поля, например, amount__gte
+    """
+    EXACT = 'exact'
+    IN = 'in'
+    GT = 'gt'
+    GTE = 'gte'
+    LT = 'lt'
+    LTE = 'lte'
+    RANGE = 'range'
+    ISNULL = 'isnull'
+    STARTSWITH = 'startswith'
+
+    values = {
+        EXACT: 'Равно',
+        IN: 'Входит в перечень',
+        GT: 'Больше',
+        GTE: 'Больше или равно',
+        LT: 'Меньше',
+        LTE: 'Меньше или равно',
+        RANGE: 'Входит в диапазон',
+        ISNULL: 'Пустое значение',
+        STARTSWITH: 'Начинается с',
+    }
+
+    # Условия равенства, значение которых приводится к множеству
+    equality_lookups = frozenset((EXACT, IN))
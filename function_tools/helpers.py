@@ -1,4 +1,6 @@
 from typing import (
+    Any,
+    Dict,
     Optional,
     Type,
     Union,
@@ -8,6 +10,9 @@ from function_tools.caches import (
     BaseCache,
     CacheStorage,
 )
+from function_tools.registries import (
+    shared_cache_registry,
+)
 
 
 class BaseHelper:
@@ -17,6 +22,12 @@ class BaseHelper:
     требуется для исполнения действий
     """
 
+    # Получать кеш помощника из реестра разделяемых кешей процесса (см.
+    # SharedCacheRegistry). Помощники с одинаковыми классом кеша и
+    # параметрами создания кеша получают один и тот же кеш, доступный только
+    # для чтения. Параметры создания кеша должны быть хешируемыми
+    shared_cache = False
+
     def __init__(self, *args, **kwargs):
         super().__init__()
 
@@ -44,13 +55,36 @@ class BaseHelper:
         Метод создания кеша.
 
         Кеш хранится в публичном свойстве cache. По умолчанию добавлена
-        заглушка.
+        заглушка. При shared_cache = True кеш получается из реестра
+        разделяемых кешей.
         """
         if issubclass(self._cache_class, (BaseCache, CacheStorage)):
-            self._cache = self._cache_class(*args, **kwargs)
+            if self.shared_cache:
+                self._cache = shared_cache_registry.get(
+                    self._cache_class,
+                    *args,
+                    **kwargs,
+                )
+            else:
+                self._cache = self._cache_class(*args, **kwargs)
         else:
             self._cache = BaseCache(*args, **kwargs)
 
+    def get_statistics_report(
+        self,
+        estimate_memory: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Формирование отчета о статистике кеша помощника. Для хранилища кешей
+        отчет содержит итоговую статистику и статистику каждого кеша
+        """
+        return {
+            'helper': self.__class__.__name__,
+            **self._cache.get_statistics_report(
+                estimate_memory=estimate_memory,
+            ),
+        }
+
 
 class BaseRunnerHelper(BaseHelper):
     """
@@ -0,0 +1,1212 @@
+from bisect import (
+    bisect_left,
+    bisect_right,
+)
+from itertools import (
+    product,
+)
+from operator import (
+    itemgetter,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from function_tools.enums import (
+    LookupEnum,
+)
+from function_tools.lookups import (
+    split_lookup,
+)
+from function_tools.strings import (
+    UNIQUE_INDEX_DUPLICATE_VALUE_ERROR,
+)
+from function_tools.utils import (
+    compile_attrs_getter,
+)
+
+
+class _MaxBound:
+    """
+    Значение, большее любого другого. Используется при двоичном поиске
+    версий, начавшихся не позднее даты
+    """
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_MAX_BOUND = _MaxBound()
+
+
+class BaseIndex:
+    """
+    Базовый класс вторичного индекса кеша объектов сущности.
+
+    Индекс строится в одном проходе с хеш-таблицей кеша и хранит не сами
+    объекты, а их порядковые номера в кеше. Это позволяет пересекать множества
+    кандидатов от нескольких индексов и сохранять порядок объектов в
+    результате фильтрации.
+    """
+
+    def __init__(
+        self,
+        fields: Union[str, Tuple[str, ...]],
+        *args,
+        **kwargs,
+    ):
+        self._fields = (
+            (fields, ) if
+            isinstance(fields, str) else
+            tuple(fields)
+        )
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} @fields="{self._fields}">'
+
+    def __str__(self):
+        return self.__repr__()
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """
+        Поля, по которым построен индекс
+        """
+        return self._fields
+
+    def clear(self):
+        """
+        Очистка индекса перед повторным построением
+        """
+
+    def add(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        """
+        Добавление объекта с порядковым номером row_index в индекс
+        """
+        raise NotImplementedError
+
+    def remove(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        """
+        Удаление объекта с порядковым номером row_index из индекса
+        """
+        raise NotImplementedError
+
+    def is_applicable(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> bool:
+        """
+        Может ли индекс быть использован для указанного фильтра
+        """
+        return all(field in filter_ for field in self._fields)
+
+    def get_applied_keys(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Tuple[str, ...]:
+        """
+        Ключи условий фильтра, проверяемые индексом. Остальные условия
+        проверяются перебором кандидатов
+        """
+        return self._fields
+
+    def estimate(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> int:
+        """
+        Оценка количества кандидатов, которое вернет индекс по фильтру. Служит
+        для выбора наиболее селективного индекса.
+        """
+        raise NotImplementedError
+
+    def lookup(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Set[int]:
+        """
+        Получение множества порядковых номеров объектов, удовлетворяющих
+        фильтру по полям индекса
+        """
+        raise NotImplementedError
+
+
+class HashIndex(BaseIndex):
+    """
+    Хеш-индекс по одному или нескольким полям объектов.
+
+    Для составного индекса ключом является кортеж значений полей. По
+    аналогии с хеш-таблицей кеша, для значения с единственным объектом
+    хранится номер объекта, а список номеров создается только при появлении
+    второго объекта.
+
+    Уникальный индекс (unique=True) не допускает повторения значений, за
+    исключением значений, содержащих None, по аналогии с ограничением
+    уникальности в БД.
+    """
+
+    def __init__(
+        self,
+        fields: Union[str, Tuple[str, ...]],
+        *args,
+        unique: bool = False,
+        **kwargs,
+    ):
+        super().__init__(fields, *args, **kwargs)
+
+        self._unique = unique
+        self._is_composite = len(self._fields) > 1
+        self._fields_getter = compile_attrs_getter(self._fields)
+
+        self._hash_table: Dict[Any, Union[int, List[int]]] = {}
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @fields="{self._fields}" '
+            f'@unique="{self._unique}">'
+        )
+
+    @property
+    def unique(self) -> bool:
+        """
+        Является ли индекс уникальным
+        """
+        return self._unique
+
+    def clear(self):
+        self._hash_table = {}
+
+    def _get_entity_value(self, entity: Any):
+        """
+        Получение значения ключа индекса для объекта
+        """
+        value = self._fields_getter(entity)
+
+        return value if self._is_composite else value[0]
+
+    def add(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        value = self._get_entity_value(entity)
+        bucket = self._hash_table.get(value)
+
+        if bucket is None:
+            self._hash_table[value] = row_index
+        else:
+            if self._unique and not self._has_null(value):
+                raise ValueError(
+                    UNIQUE_INDEX_DUPLICATE_VALUE_ERROR.format(
+                        fields=self._fields,
+                        value=value,
+                    )
+                )
+
+            if isinstance(bucket, list):
+                bucket.append(row_index)
+            else:
+                self._hash_table[value] = [bucket, row_index]
+
+    def remove(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        value = self._get_entity_value(entity)
+        bucket = self._hash_table.get(value)
+
+        if isinstance(bucket, list):
+            if row_index in bucket:
+                bucket.remove(row_index)
+
+                if len(bucket) == 1:
+                    self._hash_table[value] = bucket[0]
+        elif bucket == row_index:
+            del self._hash_table[value]
+
+    def _has_null(self, value: Any) -> bool:
+        """
+        Содержит ли значение ключа индекса None
+        """
+        return (
+            None in value if
+            self._is_composite else
+            value is None
+        )
+
+    def _iterate_values(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Iterable[Any]:
+        """
+        Перебор всех значений ключа индекса, подходящих под фильтр
+        """
+        if self._is_composite:
+            values = product(*(filter_[field] for field in self._fields))
+        else:
+            values = filter_[self._fields[0]]
+
+        return values
+
+    def _iterate_buckets(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Iterable[Union[int, List[int]]]:
+        """
+        Перебор найденных в индексе значений по фильтру
+        """
+        hash_table = self._hash_table
+
+        for value in self._iterate_values(filter_):
+            bucket = hash_table.get(value)
+
+            if bucket is not None:
+                yield bucket
+
+    def estimate(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> int:
+        return sum(
+            len(bucket) if isinstance(bucket, list) else 1
+            for bucket in self._iterate_buckets(filter_)
+        )
+
+    def lookup(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Set[int]:
+        row_indexes = set()
+
+        for bucket in self._iterate_buckets(filter_):
+            if isinstance(bucket, list):
+                row_indexes.update(bucket)
+            else:
+                row_indexes.add(bucket)
+
+        return row_indexes
+
+    def get(
+        self,
+        value: Any,
+    ) -> List[int]:
+        """
+        Получение порядковых номеров объектов по значению ключа индекса
+        """
+        bucket = self._hash_table.get(value)
+
+        if bucket is None:
+            row_indexes = []
+        elif isinstance(bucket, list):
+            row_indexes = bucket
+        else:
+            row_indexes = [bucket]
+
+        return row_indexes
+
+
+class SortedIndex(BaseIndex):
+    """
+    Упорядоченный индекс по одному полю объектов.
+
+    Хранит значения поля и номера объектов в массивах, отсортированных по
+    значению. Условия сравнения (gt, gte, lt, lte, range), начала строки
+    (startswith) и равенства проверяются двоичным поиском по массиву
+    значений, несколько условий по полю сужают диапазон позиций массива.
+    Номера объектов с пустым значением хранятся отдельно для условия
+    isnull.
+
+    Массивы сортируются при первом поиске после добавления объектов.
+    Непустые значения поля должны быть сравнимы между собой.
+    """
+
+    def __init__(
+        self,
+        field: str,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(field, *args, **kwargs)
+
+        self._field = self._fields[0]
+        self._field_getter = compile_attrs_getter(self._fields)
+
+        self._values: List[Any] = []
+        self._row_indexes: List[int] = []
+        self._null_row_indexes: Set[int] = set()
+        self._is_sorted = True
+
+    def clear(self):
+        self._values = []
+        self._row_indexes = []
+        self._null_row_indexes = set()
+        self._is_sorted = True
+
+    def add(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        value = self._field_getter(entity)[0]
+
+        if value is None:
+            self._null_row_indexes.add(row_index)
+        else:
+            self._values.append(value)
+            self._row_indexes.append(row_index)
+            self._is_sorted = False
+
+    def remove(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        value = self._field_getter(entity)[0]
+
+        if value is None:
+            self._null_row_indexes.discard(row_index)
+
+            return
+
+        values = self._values
+        row_indexes = self._row_indexes
+
+        if self._is_sorted:
+            positions = range(
+                bisect_left(values, value),
+                bisect_right(values, value),
+            )
+        else:
+            positions = range(len(values))
+
+        for position in positions:
+            if row_indexes[position] == row_index:
+                del values[position]
+                del row_indexes[position]
+
+                break
+
+    def _sort(self):
+        """
+        Сортировка массивов значений и номеров объектов по значению
+        """
+        if not self._is_sorted:
+            values = self._values
+            order = sorted(range(len(values)), key=values.__getitem__)
+
+            self._values = [values[position] for position in order]
+            self._row_indexes = [
+                self._row_indexes[position]
+                for position in order
+            ]
+            self._is_sorted = True
+
+    def get_applied_keys(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Tuple[str, ...]:
+        return tuple(
+            key
+            for key in filter_
+            if split_lookup(key)[0] == self._field
+        )
+
+    def is_applicable(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> bool:
+        return bool(self.get_applied_keys(filter_))
+
+    def _get_prefix_bounds(self, prefix: str) -> Tuple[int, int]:
+        """
+        Получение диапазона позиций значений, начинающихся с префикса
+        """
+        values = self._values
+        begin = bisect_left(values, prefix)
+
+        if prefix:
+            end = bisect_left(
+                values,
+                prefix[:-1] + chr(ord(prefix[-1]) + 1),
+                begin,
+            )
+        else:
+            end = len(values)
+
+        return begin, end
+
+    def _prepare_positions(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Tuple[int, int, Optional[Set[Any]], Optional[bool]]:
+        """
+        Получение диапазона позиций массива значений по условиям сравнения,
+        значений условия равенства и значения условия isnull
+        """
+        self._sort()
+
+        values = self._values
+        begin, end = 0, len(values)
+        equal_values = None
+        is_null = None
+
+        for key in self.get_applied_keys(filter_):
+            lookup = split_lookup(key)[1]
+            value = filter_[key]
+
+            if lookup in LookupEnum.equality_lookups:
+                equal_values = value
+            elif lookup == LookupEnum.ISNULL:
+                is_null = value
+            else:
+                if lookup == LookupEnum.GT:
+                    bounds = (bisect_right(values, value), end)
+                elif lookup == LookupEnum.GTE:
+                    bounds = (bisect_left(values, value), end)
+                elif lookup == LookupEnum.LT:
+                    bounds = (begin, bisect_left(values, value))
+                elif lookup == LookupEnum.LTE:
+                    bounds = (begin, bisect_right(values, value))
+                elif lookup == LookupEnum.RANGE:
+                    bounds = (
+                        bisect_left(values, value[0]),
+                        bisect_right(values, value[1]),
+                    )
+                else:
+                    bounds = self._get_prefix_bounds(value)
+
+                begin, end = max(begin, bounds[0]), min(end, bounds[1])
+
+        return begin, end, equal_values, is_null
+
+    def _iterate_equal_bounds(
+        self,
+        begin: int,
+        end: int,
+        equal_values: Set[Any],
+    ) -> Iterable[Tuple[int, int]]:
+        """
+        Перебор диапазонов позиций значений условия равенства в пределах
+        диапазона позиций
+        """
+        values = self._values
+
+        for value in equal_values:
+            if value is None:
+                continue
+
+            try:
+                value_begin = bisect_left(values, value, begin, end)
+                value_end = bisect_right(values, value, value_begin, end)
+            except TypeError:
+                # Значение несравнимо со значениями поля и не может совпасть
+                continue
+
+            if value_begin < value_end:
+                yield value_begin, value_end
+
+    def _includes_nulls(
+        self,
+        filter_: Dict[str, Set[Any]],
+        equal_values: Optional[Set[Any]],
+        is_null: Optional[bool],
+    ) -> bool:
+        """
+        Удовлетворяет ли фильтру пустое значение поля
+        """
+        has_comparisons = any(
+            split_lookup(key)[1] not in (
+                LookupEnum.EXACT,
+                LookupEnum.IN,
+                LookupEnum.ISNULL,
+            )
+            for key in self.get_applied_keys(filter_)
+        )
+
+        return (
+            not has_comparisons and
+            is_null is not False and
+            (is_null or equal_values is not None) and
+            (equal_values is None or None in equal_values)
+        )
+
+    def _iterate_bounds(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Tuple[Iterable[Tuple[int, int]], bool]:
+        """
+        Получение диапазонов позиций непустых значений, удовлетворяющих
+        фильтру, и признака, удовлетворяют ли фильтру пустые значения
+        """
+        begin, end, equal_values, is_null = self._prepare_positions(filter_)
+
+        if is_null:
+            bounds = ()
+        elif equal_values is not None:
+            bounds = self._iterate_equal_bounds(begin, end, equal_values)
+        else:
+            bounds = ((begin, end), ) if begin < end else ()
+
+        return bounds, self._includes_nulls(filter_, equal_values, is_null)
+
+    def estimate(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> int:
+        bounds, includes_nulls = self._iterate_bounds(filter_)
+
+        estimate = sum(end - begin for begin, end in bounds)
+
+        if includes_nulls:
+            estimate += len(self._null_row_indexes)
+
+        return estimate
+
+    def lookup(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Set[int]:
+        bounds, includes_nulls = self._iterate_bounds(filter_)
+        row_indexes = self._row_indexes
+
+        result = set()
+        for begin, end in bounds:
+            result.update(row_indexes[begin:end])
+
+        if includes_nulls:
+            result.update(self._null_row_indexes)
+
+        return result
+
+
+class TrieNode:
+    """
+    Узел префиксного дерева значений поля.
+
+    Хранит дочерние узлы по частям значения, номера объектов, значение поля
+    которых заканчивается в узле, и количество объектов в поддереве узла.
+    Словарь дочерних узлов и множество номеров создаются при необходимости.
+    """
+
+    __slots__ = ('children', 'row_indexes', 'rows_count')
+
+    def __init__(self):
+        self.children: Optional[Dict[str, TrieNode]] = None
+        self.row_indexes: Optional[Set[int]] = None
+        self.rows_count = 0
+
+
+class TrieIndex(BaseIndex):
+    """
+    Префиксное дерево по строковому полю объектов.
+
+    Предназначено для иерархических кодов (например, кодов счетов вида
+    101.01.002). При указании разделителя частями дерева являются части
+    кода между разделителями, иначе - символы значения. Индекс используется
+    при фильтрации условиями равенства и начала строки (startswith) и
+    позволяет найти объекты с наибольшим кодом, являющимся префиксом
+    значения (см. EntityCache.find_longest_prefix). При указании
+    разделителя префиксами считаются только коды, составленные из целых
+    частей значения.
+
+    Поиск выполняется спуском по дереву без перебора объектов кеша,
+    количество объектов под префиксом хранится в узлах дерева.
+    """
+
+    def __init__(
+        self,
+        field: str,
+        *args,
+        separator: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(field, *args, **kwargs)
+
+        self._field = self._fields[0]
+        self._field_getter = compile_attrs_getter(self._fields)
+        self._separator = separator
+
+        self._root = TrieNode()
+        self._null_row_indexes: Set[int] = set()
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @fields="{self._fields}" '
+            f'@separator="{self._separator}">'
+        )
+
+    @property
+    def separator(self) -> Optional[str]:
+        """
+        Разделитель частей значения
+        """
+        return self._separator
+
+    def clear(self):
+        self._root = TrieNode()
+        self._null_row_indexes = set()
+
+    def _split(self, value: str) -> List[str]:
+        """
+        Разделение значения на части пути в дереве
+        """
+        return (
+            list(value) if
+            self._separator is None else
+            value.split(self._separator)
+        )
+
+    def add(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        value = self._field_getter(entity)[0]
+
+        if value is None:
+            self._null_row_indexes.add(row_index)
+
+            return
+
+        node = self._root
+        node.rows_count += 1
+
+        for part in self._split(value):
+            if node.children is None:
+                node.children = {}
+
+            child = node.children.get(part)
+
+            if child is None:
+                child = node.children[part] = TrieNode()
+
+            node = child
+            node.rows_count += 1
+
+        if node.row_indexes is None:
+            node.row_indexes = set()
+
+        node.row_indexes.add(row_index)
+
+    def remove(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        value = self._field_getter(entity)[0]
+
+        if value is None:
+            self._null_row_indexes.discard(row_index)
+
+            return
+
+        path = [self._root]
+
+        for part in self._split(value):
+            children = path[-1].children
+            child = children.get(part) if children else None
+
+            if child is None:
+                return
+
+            path.append(child)
+
+        node = path[-1]
+
+        if not node.row_indexes or row_index not in node.row_indexes:
+            return
+
+        node.row_indexes.discard(row_index)
+
+        for path_node in path:
+            path_node.rows_count -= 1
+
+        # Удаление опустевших узлов
+        for parent, part in zip(reversed(path[:-1]), reversed(self._split(value))):  # noqa
+            if parent.children[part].rows_count:
+                break
+
+            del parent.children[part]
+
+    def _find_node(self, parts: Iterable[str]) -> Optional[TrieNode]:
+        """
+        Спуск по дереву по частям значения
+        """
+        node = self._root
+
+        for part in parts:
+            child = node.children.get(part) if node.children else None
+
+            if child is None:
+                return None
+
+            node = child
+
+        return node
+
+    def _find_prefix_nodes(self, prefix: str) -> List[TrieNode]:
+        """
+        Получение узлов, поддеревья которых содержат все значения,
+        начинающиеся с префикса. Последняя часть префикса может быть неполной
+        частью значения
+        """
+        if not prefix:
+            return [self._root]
+
+        *parts, last_part = self._split(prefix)
+        node = self._find_node(parts)
+
+        if node is None or not node.children:
+            return []
+
+        if self._separator is None:
+            child = node.children.get(last_part)
+            nodes = [child] if child is not None else []
+        else:
+            nodes = [
+                child
+                for part, child in node.children.items()
+                if part.startswith(last_part)
+            ]
+
+        return nodes
+
+    @staticmethod
+    def _collect_row_indexes(
+        nodes: Iterable[TrieNode],
+        row_indexes: Set[int],
+    ):
+        """
+        Сбор номеров объектов поддеревьев узлов
+        """
+        nodes = list(nodes)
+
+        while nodes:
+            node = nodes.pop()
+
+            if node.row_indexes:
+                row_indexes.update(node.row_indexes)
+
+            if node.children:
+                nodes.extend(node.children.values())
+
+    def get_applied_keys(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Tuple[str, ...]:
+        return tuple(
+            key
+            for key in filter_
+            if split_lookup(key) in (
+                (self._field, LookupEnum.EXACT),
+                (self._field, LookupEnum.STARTSWITH),
+            )
+        )
+
+    def is_applicable(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> bool:
+        return bool(self.get_applied_keys(filter_))
+
+    def _iterate_conditions(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Iterable[Tuple[List[TrieNode], bool, bool]]:
+        """
+        Перебор условий фильтра по полю индекса в виде найденных узлов,
+        признака поиска по префиксу (для условия равенства учитываются только
+        объекты самих узлов) и признака, удовлетворяют ли условию пустые
+        значения
+        """
+        for key in self.get_applied_keys(filter_):
+            value = filter_[key]
+
+            if split_lookup(key)[1] == LookupEnum.STARTSWITH:
+                yield self._find_prefix_nodes(value), True, False
+            else:
+                nodes = (
+                    self._find_node(self._split(item))
+                    for item in value
+                    if isinstance(item, str)
+                )
+
+                yield (
+                    [node for node in nodes if node is not None],
+                    False,
+                    None in value,
+                )
+
+    def estimate(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> int:
+        estimates = [
+            sum(
+                node.rows_count if
+                is_prefix else
+                len(node.row_indexes or ())
+                for node in nodes
+            ) + (len(self._null_row_indexes) if includes_nulls else 0)
+            for nodes, is_prefix, includes_nulls in self._iterate_conditions(
+                filter_,
+            )
+        ]
+
+        return min(estimates)
+
+    def lookup(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> Set[int]:
+        result = None
+
+        for nodes, is_prefix, includes_nulls in self._iterate_conditions(
+            filter_,
+        ):
+            row_indexes = set()
+
+            if is_prefix:
+                self._collect_row_indexes(nodes, row_indexes)
+            else:
+                for node in nodes:
+                    row_indexes.update(node.row_indexes or ())
+
+            if includes_nulls:
+                row_indexes.update(self._null_row_indexes)
+
+            result = row_indexes if result is None else result & row_indexes
+
+        return result
+
+    def find_prefix(self, prefix: str) -> Set[int]:
+        """
+        Получение номеров объектов, значение поля которых начинается с
+        префикса
+        """
+        row_indexes = set()
+        self._collect_row_indexes(self._find_prefix_nodes(prefix), row_indexes)
+
+        return row_indexes
+
+    def find_longest_prefix(self, value: str) -> Set[int]:
+        """
+        Получение номеров объектов с наибольшим значением поля, являющимся
+        префиксом значения value (в том числе равным ему)
+        """
+        node = self._root
+        row_indexes = set()
+
+        for part in self._split(value):
+            node = node.children.get(part) if node.children else None
+
+            if node is None:
+                break
+
+            if node.row_indexes:
+                row_indexes = node.row_indexes
+
+        return set(row_indexes)
+
+
+class IntervalTreeNode:
+    """
+    Узел центрированного дерева интервалов.
+
+    Хранит интервалы, содержащие центр узла, отсортированными по возрастанию
+    начала и по убыванию окончания. Интервалы, лежащие левее и правее
+    центра, хранятся в дочерних узлах.
+    """
+
+    __slots__ = ('center', 'by_begin', 'by_end', 'left', 'right')
+
+    def __init__(
+        self,
+        intervals: List[Tuple[Any, Any, int]],
+    ):
+        bounds = sorted(
+            bound
+            for begin, end, _ in intervals
+            for bound in (begin, end)
+        )
+        self.center = bounds[len(bounds) // 2]
+
+        left_intervals = []
+        right_intervals = []
+        center_intervals = []
+
+        for interval in intervals:
+            if interval[1] < self.center:
+                left_intervals.append(interval)
+            elif interval[0] > self.center:
+                right_intervals.append(interval)
+            else:
+                center_intervals.append(interval)
+
+        self.by_begin = sorted(center_intervals, key=itemgetter(0))
+        self.by_end = sorted(center_intervals, key=itemgetter(1), reverse=True)
+        self.left = IntervalTreeNode(left_intervals) if left_intervals else None
+        self.right = IntervalTreeNode(right_intervals) if right_intervals else None  # noqa
+
+    def find(
+        self,
+        point: Any,
+    ) -> List[int]:
+        """
+        Получение номеров объектов, интервалы которых содержат точку
+        """
+        row_indexes = []
+        node = self
+
+        while node is not None:
+            if point < node.center:
+                for begin, _, row_index in node.by_begin:
+                    if begin > point:
+                        break
+
+                    row_indexes.append(row_index)
+
+                node = node.left
+            elif point > node.center:
+                for _, end, row_index in node.by_end:
+                    if end < point:
+                        break
+
+                    row_indexes.append(row_index)
+
+                node = node.right
+            else:
+                row_indexes.extend(
+                    row_index
+                    for _, _, row_index in node.by_begin
+                )
+
+                break
+
+        return row_indexes
+
+
+class IntervalIndex(BaseIndex):
+    """
+    Индекс периодов действия объектов.
+
+    Для каждого значения ключа хранит периоды действия его версий,
+    отсортированные по началу периода, и наибольшие окончания периодов
+    среди предшествующих версий. Это позволяет найти версии ключа,
+    актуальные на дату, двоичным поиском, не перебирая все версии.
+
+    Для поиска всех объектов, актуальных на дату, по всем периодам строится
+    центрированное дерево интервалов. Дерево строится при первом поиске и
+    перестраивается после изменения индекса.
+
+    Объекты с пустыми границами периода действия в индекс не попадают, как и
+    при отборе актуальных объектов условиями begin__lte и end__gte в БД.
+
+    Индекс не используется при фильтрации кеша методом filter.
+    """
+
+    def __init__(
+        self,
+        fields: Union[str, Tuple[str, ...]],
+        *args,
+        begin_field: str = 'begin',
+        end_field: str = 'end',
+        **kwargs,
+    ):
+        super().__init__(fields, *args, **kwargs)
+
+        self._key_fields = self._fields
+        self._is_composite = len(self._key_fields) > 1
+        self._key_getter = compile_attrs_getter(self._key_fields)
+        self._bounds_getter = compile_attrs_getter((begin_field, end_field))
+
+        self._begin_field = begin_field
+        self._end_field = end_field
+        # Поля периода действия также читаются индексом
+        self._fields = (*self._key_fields, begin_field, end_field)
+
+        # Версии по значениям ключа: кортежи из начала, окончания, номера
+        # объекта и наибольшего окончания среди версий до текущей включительно
+        self._intervals: Dict[Any, List[Tuple[Any, Any, int, Any]]] = {}
+        self._intervals_tree: Optional[IntervalTreeNode] = None
+        self._is_tree_actual = True
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @fields="{self._key_fields}" '
+            f'@begin_field="{self._begin_field}" '
+            f'@end_field="{self._end_field}">'
+        )
+
+    @property
+    def key_fields(self) -> Tuple[str, ...]:
+        """
+        Поля ключа индекса
+        """
+        return self._key_fields
+
+    def clear(self):
+        self._intervals = {}
+        self._intervals_tree = None
+        self._is_tree_actual = True
+
+    def _get_entity_key(self, entity: Any):
+        """
+        Получение значения ключа индекса для объекта
+        """
+        key = self._key_getter(entity)
+
+        return key if self._is_composite else key[0]
+
+    @staticmethod
+    def _update_max_ends(
+        intervals: List[Tuple[Any, Any, int, Any]],
+        start: int,
+    ):
+        """
+        Пересчет наибольших окончаний периодов начиная с версии start
+        """
+        max_end = intervals[start - 1][3] if start else None
+
+        for position in range(start, len(intervals)):
+            begin, end, row_index, _ = intervals[position]
+            max_end = end if max_end is None or end > max_end else max_end
+            intervals[position] = (begin, end, row_index, max_end)
+
+    def add(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        begin, end = self._bounds_getter(entity)
+
+        if begin is None or end is None:
+            return
+
+        intervals = self._intervals.setdefault(self._get_entity_key(entity), [])
+        position = bisect_right(intervals, (begin, end, row_index))
+        intervals.insert(position, (begin, end, row_index, end))
+
+        self._update_max_ends(intervals, position)
+        self._is_tree_actual = False
+
+    def remove(
+        self,
+        entity: Any,
+        row_index: int,
+    ):
+        key = self._get_entity_key(entity)
+        intervals = self._intervals.get(key)
+
+        if not intervals:
+            return
+
+        for position, interval in enumerate(intervals):
+            if interval[2] == row_index:
+                del intervals[position]
+
+                if intervals:
+                    self._update_max_ends(intervals, position)
+                else:
+                    del self._intervals[key]
+
+                self._is_tree_actual = False
+
+                break
+
+    def is_applicable(
+        self,
+        filter_: Dict[str, Set[Any]],
+    ) -> bool:
+        return False
+
+    def get_actual(
+        self,
+        key: Any,
+        on_date: Any,
+    ) -> List[int]:
+        """
+        Получение номеров объектов с указанным значением ключа, актуальных на
+        дату
+        """
+        intervals = self._intervals.get(key)
+        row_indexes = []
+
+        if intervals:
+            # Версии, начавшиеся не позднее даты, предшествуют позиции
+            position = bisect_right(intervals, (on_date, _MAX_BOUND))
+
+            for position in range(position - 1, -1, -1):
+                _, end, row_index, max_end = intervals[position]
+
+                if max_end < on_date:
+                    break
+
+                if end >= on_date:
+                    row_indexes.append(row_index)
+
+            row_indexes.reverse()
+
+        return row_indexes
+
+    def all_actual(
+        self,
+        on_date: Any,
+    ) -> List[int]:
+        """
+        Получение номеров всех объектов, актуальных на дату, в порядке
+        возрастания
+        """
+        if not self._is_tree_actual:
+            intervals = [
+                interval[:3]
+                for key_intervals in self._intervals.values()
+                for interval in key_intervals
+            ]
+            self._intervals_tree = (
+                IntervalTreeNode(intervals) if
+                intervals else
+                None
+            )
+            self._is_tree_actual = True
+
+        row_indexes = (
+            self._intervals_tree.find(on_date) if
+            self._intervals_tree is not None else
+            []
+        )
+        row_indexes.sort()
+
+        return row_indexes
+
+
+def prepare_index(
+    index: Union[str, Tuple[str, ...], BaseIndex],
+) -> BaseIndex:
+    """
+    Приведение описания индекса к объекту индекса. Строка или кортеж
+    наименований полей преобразуются в неуникальный хеш-индекс.
+    """
+    if not isinstance(index, BaseIndex):
+        index = HashIndex(fields=index)
+
+    return index
@@ -0,0 +1,147 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from django.db.models import (
+    Model,
+)
+
+from function_tools.statistics import (
+    estimate_object_size,
+)
+
+
+class RelatedEntitiesInterner:
+    """
+    Интернирование связанных объектов моделей.
+
+    При получении объектов с select_related Django создает отдельный
+    связанный объект для каждой строки результата запроса, даже если строки
+    ссылаются на одну и ту же запись. Интернирование заменяет связанные
+    объекты в кеше связанных объектов каждого объекта модели первым
+    встреченным объектом с той же моделью и первичным ключом, после чего
+    дубликаты освобождаются сборщиком мусора. Связанные объекты связанных
+    объектов (например, при select_related('account__parent'))
+    интернируются рекурсивно.
+
+    Интернированные объекты являются общими для всех ссылающихся на них
+    объектов, поэтому их изменение отражается во всех строках кеша.
+    """
+
+    def __init__(self):
+        self._entities: Dict[Tuple[Type[Model], Any], Model] = {}
+        self._sizes: Dict[Tuple[Type[Model], Any], int] = {}
+
+        # Количество замененных дубликатов связанных объектов и оценка
+        # освобожденной памяти в байтах
+        self.interned_count = 0
+        self.saved_memory_size = 0
+
+    def intern(self, entity: Model):
+        """
+        Замена связанных объектов объекта модели ранее встреченными
+        """
+        fields_cache = entity._state.fields_cache
+
+        for field_name, related_entity in fields_cache.items():
+            if not isinstance(related_entity, Model):
+                continue
+
+            key = (type(related_entity), related_entity.pk)
+            shared_entity = self._entities.get(key)
+
+            if shared_entity is None:
+                self._entities[key] = related_entity
+                self.intern(related_entity)
+            elif shared_entity is not related_entity:
+                fields_cache[field_name] = shared_entity
+                self._merge_fields_cache(shared_entity, related_entity)
+
+                size = self._sizes.get(key)
+
+                if size is None:
+                    size = self._sizes[key] = estimate_object_size(
+                        related_entity,
+                    )
+
+                self.interned_count += 1
+                self.saved_memory_size += size
+
+    def _merge_fields_cache(
+        self,
+        shared_entity: Model,
+        duplicate_entity: Model,
+    ):
+        """
+        Перенос связанных объектов дубликата, отсутствующих у общего объекта.
+        Иначе обращение к ним через общий объект приведет к запросу
+        """
+        shared_fields_cache = shared_entity._state.fields_cache
+        missing_fields_cache = {
+            field_name: related_entity
+            for field_name, related_entity in duplicate_entity._state.fields_cache.items()  # noqa
+            if field_name not in shared_fields_cache
+        }
+
+        if missing_fields_cache:
+            shared_fields_cache.update(missing_fields_cache)
+            self.intern(shared_entity)
+
+
+class ValuesDictionary:
+    """
+    Словарь значений поля.
+
+    Сопоставляет каждому значению общий объект значения и целочисленный код.
+    Используется для хранения часто повторяющихся значений (кодов, статусов,
+    наименований): одинаковые значения разных строк хранятся одним объектом
+    либо, в колоночном кеше, кодами словаря. Код 0 зарезервирован за пустым
+    значением.
+    """
+
+    def __init__(self):
+        self._codes: Dict[Any, int] = {}
+        self._values: List[Any] = [None]
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def values(self) -> List[Any]:
+        """
+        Значения словаря в порядке кодов
+        """
+        return self._values
+
+    def encode(self, value: Any) -> int:
+        """
+        Получение кода значения с добавлением нового значения в словарь
+        """
+        if value is None:
+            return 0
+
+        code = self._codes.get(value)
+
+        if code is None:
+            code = self._codes[value] = len(self._values)
+            self._values.append(value)
+
+        return code
+
+    def get_code(self, value: Any) -> Optional[int]:
+        """
+        Получение кода значения без добавления в словарь. Для отсутствующих
+        значений возвращается None
+        """
+        return 0 if value is None else self._codes.get(value)
+
+    def intern(self, value: Any) -> Any:
+        """
+        Получение общего объекта значения
+        """
+        return self._values[self.encode(value)]
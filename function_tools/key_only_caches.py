@@ -0,0 +1,522 @@
+from collections.abc import (
+    Iterable,
+    Sequence,
+)
+from time import (
+    perf_counter,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Type,
+    Union,
+)
+
+from django.db.models import (
+    Model,
+    Q,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.decorators import (
+    cache_access,
+)
+from function_tools.enums import (
+    LookupEnum,
+)
+from function_tools.lookups import (
+    LOOKUP_SEPARATOR,
+    split_lookup,
+)
+from function_tools.records import (
+    EntityRecord,
+    prepare_record_class,
+    prepare_record_columns,
+)
+from function_tools.statistics import (
+    estimate_objects_size,
+)
+from function_tools.strings import (
+    SHARED_CACHE_IS_READ_ONLY_ERROR,
+)
+
+
+class HydratedRows(Sequence):
+    """
+    Последовательность объектов строк кеша ключей (см. KeyOnlyEntityCache).
+
+    Объект строки загружается при первом обращении к строке, при переборе
+    строки загружаются пачками по порядку. Для строк, удаленных из БД после
+    загрузки ключей, возвращается None, при переборе такие строки
+    пропускаются.
+    """
+
+    def __init__(self, cache: 'KeyOnlyEntityCache'):
+        self._cache = cache
+
+    def __len__(self):
+        return len(self._cache._key_records)
+
+    def __getitem__(self, row_index: Union[int, slice]):
+        if isinstance(row_index, slice):
+            row_indexes = range(*row_index.indices(len(self)))
+            self._cache._hydrate(row_indexes)
+
+            return [self[index] for index in row_indexes]
+
+        if row_index < 0:
+            row_index += len(self)
+
+        if not 0 <= row_index < len(self):
+            raise IndexError(row_index)
+
+        self._cache._hydrate((row_index, ))
+
+        return self._cache._hydrated_entities[row_index]
+
+    def __iter__(self):
+        cache = self._cache
+        rows_count = len(self)
+        batch_size = cache._hydration_batch_size
+
+        for begin in range(0, rows_count, batch_size):
+            row_indexes = range(begin, min(begin + batch_size, rows_count))
+            cache._hydrate(row_indexes)
+
+            for row_index in row_indexes:
+                entity = cache._hydrated_entities[row_index]
+
+                if entity is not None:
+                    yield entity
+
+
+class KeyOnlyEntityCache(EntityCache):
+    """
+    Кеш ключей объектов сущности с загрузкой объектов по требованию.
+
+    Предназначен для больших таблиц, по которым заранее нужно знать только
+    наличие ключей, а полные строки требуются лишь для небольшой их части.
+    При подготовке загружаются только первичные ключи, поля ключа поиска и
+    поля вторичных индексов в компактные записи, по которым строятся
+    хеш-таблица и индексы. Объекты строк (объекты модели либо, в режиме
+    записей, записи со всеми полями) загружаются запросами pk__in пачками
+    не более hydration_batch_size строк при первом обращении и запоминаются.
+
+    get_by_key загружает найденные строки вместе со следующими по порядку
+    первичных ключей незагруженными строками до размера пачки, get_many -
+    найденные строки всех ключей, filter - кандидатов, отобранных индексами,
+    либо, если индексы не применимы, строки, полученные запросом к БД с
+    условиями фильтра. Строки, удаленные из БД после загрузки ключей, в
+    результаты не попадают. Перебор entities, aggregate и group_by без
+    параметров фильтрации загружают все строки.
+
+    Обновление кеша загружает ключи заново и сбрасывает загруженные объекты.
+    """
+
+    # Кеш хранит в памяти только ключи
+    supports_spilling = False
+
+    def __init__(
+        self,
+        model: Type[Model],
+        *args,
+        hydration_batch_size: int = 100,
+        **kwargs,
+    ):
+        self._hydration_batch_size = hydration_batch_size
+        self._key_records: List[EntityRecord] = []
+        self._hydrated_entities: Dict[int, Any] = {}
+
+        super().__init__(model, *args, **kwargs)
+
+    @property
+    def is_coalescable(self) -> bool:
+        return False
+
+    @property
+    def hydrated_rows_count(self) -> int:
+        """
+        Количество строк, объекты которых загружены
+        """
+        return len(self._hydrated_entities)
+
+    def _prepare_key_record_class(self) -> Type[EntityRecord]:
+        """
+        Получение класса записи ключей с первичным ключом, полями ключа поиска
+        и полями вторичных индексов
+        """
+        fields = list(self._searching_key_paths)
+
+        for secondary_index in self._indexes:
+            fields.extend(secondary_index.fields)
+
+        return prepare_record_class(
+            model=self._model,
+            columns=prepare_record_columns(self._model, fields),
+        )
+
+    def _prepare(self):
+        """
+        Загрузка ключей строк и построение хеш-таблицы с номерами строк и
+        вторичных индексов по записям ключей
+        """
+        key_record_class = self._prepare_key_record_class()
+        queryset = self._actual_entities_queryset.filter(
+            **self._additional_filter_params,
+        ).values_list(*key_record_class._columns).order_by('pk').distinct()
+
+        if self._chunk_size:
+            rows = queryset.iterator(chunk_size=self._chunk_size)
+        else:
+            started_at = perf_counter()
+            rows = iter(queryset)
+            self._statistics.increment(query_time=perf_counter() - started_at)
+
+        hash_table = {}
+        key_records = []
+        searching_key_getter = self._searching_key_getter
+
+        self._prepare_entities_prefix_index()
+
+        for secondary_index in self._indexes:
+            secondary_index.clear()
+
+        for row_index, row in enumerate(rows):
+            key_record = key_record_class(row)
+            key_records.append(key_record)
+
+            for secondary_index in self._indexes:
+                secondary_index.add(key_record, row_index)
+
+            self._add_to_hash_table(
+                hash_table=hash_table,
+                key_values=searching_key_getter(key_record),
+                entity=row_index,
+            )
+
+        self._key_records = key_records
+        self._hydrated_entities = {}
+        self._entities = self._entities_list = HydratedRows(self)
+        self._entities_hash_table = hash_table
+        self._row_indexes_by_pk = None
+
+    def _hydrate(
+        self,
+        row_indexes: Iterable[int],
+        read_ahead: bool = False,
+    ):
+        """
+        Загрузка объектов строк, не загруженных ранее, пачками. При
+        read_ahead=True неполная пачка дополняется следующими незагруженными
+        строками
+        """
+        hydrated_entities = self._hydrated_entities
+        missing_row_indexes = list(
+            dict.fromkeys(
+                row_index
+                for row_index in row_indexes
+                if row_index not in hydrated_entities
+            )
+        )
+
+        if not missing_row_indexes:
+            return
+
+        # Загрузка выполняется под блокировкой кеша, чтобы потоки, которым
+        # нужны одни и те же строки, не загружали их повторно
+        with self._lock:
+            missing_row_indexes = [
+                row_index
+                for row_index in missing_row_indexes
+                if row_index not in hydrated_entities
+            ]
+
+            if not missing_row_indexes:
+                return
+
+            batch_size = self._hydration_batch_size
+
+            if read_ahead and len(missing_row_indexes) < batch_size:
+                rows_count = len(self._key_records)
+                row_index = max(missing_row_indexes) + 1
+
+                while (
+                    len(missing_row_indexes) < batch_size and
+                    row_index < rows_count
+                ):
+                    if row_index not in hydrated_entities:
+                        missing_row_indexes.append(row_index)
+
+                    row_index += 1
+
+            for begin in range(0, len(missing_row_indexes), batch_size):
+                self._hydrate_batch(
+                    missing_row_indexes[begin:begin + batch_size],
+                )
+
+    def _hydrate_batch(self, row_indexes: List[int]):
+        """
+        Загрузка объектов строк одним запросом по первичным ключам
+        """
+        key_records = self._key_records
+        row_indexes_by_pk = {
+            key_records[row_index].pk: row_index
+            for row_index in row_indexes
+        }
+
+        started_at = perf_counter()
+        rows = list(
+            self._prepare_entities_queryset().filter(
+                pk__in=list(row_indexes_by_pk),
+            )
+        )
+        self._statistics.increment(query_time=perf_counter() - started_at)
+
+        entities = [self._prepare_entity(row) for row in rows]
+        self._join_related_caches(entities)
+
+        # Строки, удаленные из БД после загрузки ключей, не загружаются
+        # повторно. Объекты пачки становятся доступны другим потокам
+        # одновременно и уже со связанными объектами
+        batch_entities = dict.fromkeys(row_indexes)
+
+        for entity in entities:
+            batch_entities[row_indexes_by_pk[entity.pk]] = entity
+
+        self._hydrated_entities.update(batch_entities)
+
+    def _clear_prepared_data(self):
+        super()._clear_prepared_data()
+
+        self._key_records = []
+        self._hydrated_entities = {}
+
+    def _join_related_caches(self, entities: Optional[Iterable[Any]] = None):
+        # При подготовке кеша объекты строк еще не загружены, связанные
+        # объекты заполняются при загрузке пачек
+        if entities is not None:
+            super()._join_related_caches(entities)
+
+    @staticmethod
+    def _iterate_item_row_indexes(item: Any) -> Iterator[int]:
+        """
+        Перебор номеров строк в найденном в хеш-таблице значении
+        """
+        items = [item]
+
+        while items:
+            item = items.pop()
+
+            if isinstance(item, int):
+                yield item
+            elif isinstance(item, set):
+                yield from item
+            elif isinstance(item, dict):
+                items.extend(item.values())
+
+    def _replace_row_indexes(self, item: Any) -> Any:
+        """
+        Замена номеров строк в найденном в хеш-таблице значении на
+        загруженные объекты
+        """
+        hydrated_entities = self._hydrated_entities
+
+        if isinstance(item, int):
+            item = hydrated_entities[item]
+        elif isinstance(item, set):
+            item = {
+                hydrated_entities[row_index]
+                for row_index in item
+                if hydrated_entities[row_index] is not None
+            }
+        elif isinstance(item, dict):
+            replaced_item = {}
+
+            # Строки, удаленные из БД после загрузки ключей, пропускаются
+            for key, value in item.items():
+                value = self._replace_row_indexes(value)
+
+                if value is not None:
+                    replaced_item[key] = value
+
+            item = replaced_item
+
+        return item
+
+    def _prepare_hash_table_item(self, item: Any) -> Any:
+        if item is not None:
+            self._hydrate(self._iterate_item_row_indexes(item), read_ahead=True)
+            item = self._replace_row_indexes(item)
+
+        return item
+
+    def _prepare_hash_table_items(
+        self,
+        items: List[Any],
+        default: Any = None,
+    ) -> List[Any]:
+        self._hydrate(
+            row_index
+            for item in items
+            if item is not None
+            for row_index in self._iterate_item_row_indexes(item)
+        )
+
+        return [
+            default if item is None else self._replace_row_indexes(item)
+            for item in items
+        ]
+
+    def _get_entities_by_row_indexes(
+        self,
+        row_indexes: Iterable[int],
+    ) -> List[Any]:
+        """
+        Получение объектов кеша по номерам строк с загрузкой незагруженных
+        строк пачками. Строки, удаленные из БД после загрузки ключей,
+        пропускаются
+        """
+        row_indexes = list(row_indexes)
+        self._hydrate(row_indexes)
+
+        hydrated_entities = self._hydrated_entities
+
+        return [
+            hydrated_entities[row_index]
+            for row_index in row_indexes
+            if hydrated_entities[row_index] is not None
+        ]
+
+    def _get_filter_candidates(
+        self,
+        filter_: Dict[str, Any],
+    ) -> List[Any]:
+        """
+        Получение кандидатов фильтрации запросом к БД с условиями фильтра,
+        если ни один вторичный индекс не применим. Загружаются только строки,
+        удовлетворяющие условиям, а не вся таблица. Строки, добавленные в БД
+        после загрузки ключей, не учитываются. Полученные объекты
+        запоминаются как загруженные объекты строк, а условия фильтра
+        дополнительно проверяются перебором кандидатов
+        """
+        started_at = perf_counter()
+        rows = list(
+            self._prepare_entities_queryset().filter(
+                self._prepare_filter_q(filter_),
+            )
+        )
+        self._statistics.increment(query_time=perf_counter() - started_at)
+
+        row_indexes_by_pk = self._get_row_indexes_by_pk()
+        hydrated_entities = self._hydrated_entities
+        hydrated_row_indexes = []
+
+        with self._lock:
+            new_entities = {}
+
+            for row in rows:
+                entity = self._prepare_entity(row)
+                row_index = row_indexes_by_pk.get(entity.pk)
+
+                if row_index is None:
+                    continue
+
+                if row_index not in hydrated_entities:
+                    new_entities[row_index] = entity
+
+                hydrated_row_indexes.append(row_index)
+
+            self._join_related_caches(new_entities.values())
+            hydrated_entities.update(new_entities)
+
+        return self._get_entities_by_row_indexes(sorted(hydrated_row_indexes))
+
+    @staticmethod
+    def _prepare_filter_q(filter_: Dict[str, Any]) -> Q:
+        """
+        Получение условия запроса по подготовленному фильтру (см.
+        lookups.prepare_filter). Пустое значение в условии равенства
+        заменяется условием isnull
+        """
+        q = Q()
+
+        for key, value in filter_.items():
+            field_name, lookup = split_lookup(key)
+            field_name = field_name.replace('.', LOOKUP_SEPARATOR)
+
+            if lookup in LookupEnum.equality_lookups:
+                values = [item for item in value if item is not None]
+                condition = Q(**{f'{field_name}__in': values})
+
+                if None in value:
+                    condition |= Q(**{f'{field_name}__isnull': True})
+            else:
+                condition = Q(**{f'{field_name}__{lookup}': value})
+
+            q &= condition
+
+        return q
+
+    @cache_access
+    def first(self):
+        """
+        Получение первого объекта кеша без учета строк, удаленных из БД
+        после загрузки ключей
+        """
+        return next(iter(self._entities), None)
+
+    def _prepare_row_indexes_by_pk(self) -> Dict[Any, int]:
+        return {
+            key_record.pk: row_index
+            for row_index, key_record in enumerate(self._key_records)
+        }
+
+    def _get_entities_by_pks(self, pks: Iterable[Any]) -> Dict[Any, Any]:
+        row_indexes_by_pk = self._get_row_indexes_by_pk()
+        row_indexes = {
+            pk: row_indexes_by_pk[pk]
+            for pk in pks
+            if pk in row_indexes_by_pk
+        }
+        self._hydrate(row_indexes.values())
+
+        entities = {}
+
+        for pk, row_index in row_indexes.items():
+            entity = self._hydrated_entities[row_index]
+
+            if entity is not None:
+                entities[pk] = entity
+
+        return entities
+
+    def _estimate_entities_size(self) -> int:
+        return (
+            estimate_objects_size(self._key_records) +
+            estimate_objects_size(list(self._hydrated_entities.values()))
+        )
+
+    def refresh(self):
+        """
+        Обновление кеша: ключи загружаются заново, загруженные объекты
+        сбрасываются
+        """
+        if self._is_shared:
+            raise ValueError(SHARED_CACHE_IS_READ_ONLY_ERROR)
+
+        started_at = perf_counter()
+        is_prepared = self._is_prepared
+
+        self._is_prepared = False
+        self.prepare()
+
+        if is_prepared:
+            self._statistics.increment(
+                refresh_count=1,
+                refresh_time=perf_counter() - started_at,
+            )
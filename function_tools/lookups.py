@@ -0,0 +1,210 @@
+from collections.abc import (
+    Iterable,
+)
+from functools import (
+    lru_cache,
+)
+from operator import (
+    attrgetter,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Tuple,
+)
+
+from function_tools.enums import (
+    LookupEnum,
+)
+from function_tools.strings import (
+    RANGE_LOOKUP_VALUE_ERROR,
+)
+
+
+# Разделитель наименования поля и условия фильтрации
+LOOKUP_SEPARATOR = '__'
+
+
+def split_lookup(param_name: str) -> Tuple[str, str]:
+    """
+    Разделение параметра фильтрации на наименование поля и условие. Если
+    суффикс параметра не является условием фильтрации, то параметр считается
+    наименованием поля с условием равенства
+    """
+    field_name, separator, lookup = param_name.rpartition(LOOKUP_SEPARATOR)
+
+    if not (separator and field_name and lookup in LookupEnum.values):
+        field_name, lookup = param_name, LookupEnum.EXACT
+
+    return field_name, lookup
+
+
+def prepare_filter_key(
+    field_name: str,
+    lookup: str,
+) -> str:
+    """
+    Получение ключа условия в подготовленном фильтре. Условия равенства и
+    вхождения в перечень объединяются под наименованием поля
+    """
+    return (
+        field_name if
+        lookup in LookupEnum.equality_lookups else
+        f'{field_name}{LOOKUP_SEPARATOR}{lookup}'
+    )
+
+
+def is_iterable_value(value: Any) -> bool:
+    """
+    Является ли значение условия фильтрации перечнем значений
+    """
+    return isinstance(value, Iterable) and not isinstance(value, str)
+
+
+def prepare_lookup_value(
+    key: str,
+    lookup: str,
+    value: Any,
+) -> Any:
+    """
+    Приведение значения условия фильтрации. Значения условий равенства
+    приводятся к множеству, значение условия диапазона - к паре границ
+    """
+    if lookup in LookupEnum.equality_lookups:
+        value = set(value) if is_iterable_value(value) else {value}
+    elif lookup == LookupEnum.RANGE:
+        if not is_iterable_value(value):
+            raise ValueError(RANGE_LOOKUP_VALUE_ERROR.format(key=key))
+
+        value = tuple(value)
+
+        if len(value) != 2:
+            raise ValueError(RANGE_LOOKUP_VALUE_ERROR.format(key=key))
+    elif lookup == LookupEnum.ISNULL:
+        value = bool(value)
+
+    return value
+
+
+def prepare_filter(filter_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Приведение параметров фильтрации к словарю условий. Ключом условий
+    равенства является наименование поля, а значением - множество допустимых
+    значений. Ключом остальных условий является наименование поля с
+    условием, например, amount__gte
+    """
+    filter_ = {}
+
+    for param_name, value in filter_params.items():
+        field_name, lookup = split_lookup(param_name)
+        key = prepare_filter_key(field_name, lookup)
+        value = prepare_lookup_value(key, lookup, value)
+
+        if key in filter_ and lookup in LookupEnum.equality_lookups:
+            # Условия field=a и field__in=[b] должны выполняться одновременно
+            value = filter_[key] & value
+
+        filter_[key] = value
+
+    return filter_
+
+
+def _check_in(value, values) -> bool:
+    return value in values
+
+
+def _check_gt(value, bound) -> bool:
+    return value is not None and value > bound
+
+
+def _check_gte(value, bound) -> bool:
+    return value is not None and value >= bound
+
+
+def _check_lt(value, bound) -> bool:
+    return value is not None and value < bound
+
+
+def _check_lte(value, bound) -> bool:
+    return value is not None and value <= bound
+
+
+def _check_range(value, bounds) -> bool:
+    return value is not None and bounds[0] <= value <= bounds[1]
+
+
+def _check_isnull(value, is_null) -> bool:
+    return (value is None) is is_null
+
+
+def _check_startswith(value, prefix) -> bool:
+    return value is not None and value.startswith(prefix)
+
+
+# Проверки значения поля объекта по условиям фильтрации. Пустое значение
+# не удовлетворяет условиям сравнения, как и в БД
+LOOKUP_CHECKS = {
+    LookupEnum.EXACT: _check_in,
+    LookupEnum.IN: _check_in,
+    LookupEnum.GT: _check_gt,
+    LookupEnum.GTE: _check_gte,
+    LookupEnum.LT: _check_lt,
+    LookupEnum.LTE: _check_lte,
+    LookupEnum.RANGE: _check_range,
+    LookupEnum.ISNULL: _check_isnull,
+    LookupEnum.STARTSWITH: _check_startswith,
+}
+
+
+@lru_cache(maxsize=None)
+def compile_filter_predicate(
+    keys: Tuple[str, ...],
+) -> Callable[[Tuple[Any, ...]], Callable[[Any], bool]]:
+    """
+    Получение фабрики предикатов для сигнатуры фильтра - кортежа ключей
+    подготовленного фильтра.
+
+    Разбор ключей, функция получения значений полей и проверки условий
+    создаются однократно на сигнатуру. Фабрика принимает кортеж значений
+    условий в порядке ключей и возвращает предикат объекта кеша.
+
+    Пример использования:
+
+    predicate = compile_filter_predicate(('status', 'amount__gte'))(
+        ({'active'}, 100),
+    )
+    """
+    field_names, lookups = zip(*(split_lookup(key) for key in keys))
+    checks = tuple(LOOKUP_CHECKS[lookup] for lookup in lookups)
+
+    if len(keys) == 1:
+        getter = attrgetter(field_names[0])
+        check = checks[0]
+
+        def prepare_predicate(values: Tuple[Any, ...]):
+            value = values[0]
+
+            def predicate(entity) -> bool:
+                return check(getter(entity), value)
+
+            return predicate
+    else:
+        getter = attrgetter(*field_names)
+
+        def prepare_predicate(values: Tuple[Any, ...]):
+            conditions = tuple(zip(checks, values))
+
+            def predicate(entity) -> bool:
+                for (check, value), entity_value in zip(
+                    conditions,
+                    getter(entity),
+                ):
+                    if not check(entity_value, value):
+                        return False
+
+                return True
+
+            return predicate
+
+    return prepare_predicate
@@ -0,0 +1,551 @@
+import sys
+import threading
+from collections import (
+    OrderedDict,
+)
+from collections.abc import (
+    Iterable,
+)
+from datetime import (
+    date,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from django.db.models import (
+    Model,
+    Q,
+)
+
+from function_tools.caches import (
+    BaseCache,
+    EntityCache,
+)
+from function_tools.decorators import (
+    cache_access,
+)
+from function_tools.indexes import (
+    IntervalIndex,
+    prepare_index,
+)
+from function_tools.records import (
+    EntityRecord,
+    prepare_record_class,
+    prepare_record_columns,
+)
+from function_tools.statistics import (
+    estimate_objects_size,
+)
+from function_tools.strings import (
+    DATE_FROM_MORE_THAN_DATE_TO_ERROR,
+    PERIOD_ENTITY_CACHE_REFRESH_ERROR,
+)
+from function_tools.types import (
+    QueryType,
+)
+from function_tools.utils import (
+    compile_attrs_getter,
+    date2str,
+    prepare_model_attr_path,
+)
+
+
+class TemporalEntityCache(EntityCache):
+    """
+    Кеш всех версий объектов сущности с поиском актуальных на любую дату.
+
+    В отличие от ActualEntityCache, ограниченного одной датой, загружает
+    объекты без отбора по дате и строит индекс периодов действия по ключу
+    поиска. Поиск актуальных на дату версий ключа выполняется двоичным
+    поиском, а всех актуальных на дату объектов - по дереву интервалов, без
+    повторных запросов к БД. Например, один кеш заменяет кеши актуальных
+    объектов на каждый день в циклах ежедневного пересчета.
+
+    Объект актуален на дату, если begin <= дата <= end, как и в
+    ActualEntityCache.
+    """
+
+    def __init__(
+        self,
+        model: Type[Model],
+        *args,
+        begin_field: str = 'begin',
+        end_field: str = 'end',
+        **kwargs,
+    ):
+        self._begin_field = begin_field
+        self._end_field = end_field
+
+        searching_key = kwargs.get('searching_key', ('pk', ))
+        searching_key = (
+            (searching_key, ) if
+            isinstance(searching_key, str) else
+            tuple(searching_key)
+        )
+
+        kwargs['indexes'] = (
+            *(kwargs.get('indexes') or ()),
+            IntervalIndex(
+                fields=tuple(
+                    prepare_model_attr_path(model, key_item)
+                    for key_item in searching_key
+                ),
+                begin_field=prepare_model_attr_path(model, begin_field),
+                end_field=prepare_model_attr_path(model, end_field),
+            ),
+        )
+
+        only_fields = kwargs.get('only_fields')
+        if only_fields:
+            kwargs['only_fields'] = (*only_fields, begin_field, end_field)
+
+        super().__init__(model, *args, **kwargs)
+
+        # Индексы копируются кешем, поэтому используется копия из кеша
+        self._interval_index: IntervalIndex = self._indexes[-1]
+
+    @cache_access
+    def get_actual(
+        self,
+        key: Union[Any, Tuple[Any]],
+        on_date: date,
+    ):
+        """
+        Получение актуальной на дату версии объекта по полному ключу поиска.
+
+        Если актуальных версий несколько, то возвращается множество, если
+        актуальных версий нет - None.
+        """
+        key = tuple(key) if self._check_is_iterable(key) else (key, )
+        self._check_key_items_count(len(key), strict_mode=True)
+
+        row_indexes = self._interval_index.get_actual(
+            key=key if len(key) > 1 else key[0],
+            on_date=on_date,
+        )
+
+        entities_list = self._entities_list
+
+        if not row_indexes:
+            result = None
+        elif len(row_indexes) == 1:
+            result = entities_list[row_indexes[0]]
+        else:
+            result = {entities_list[row_index] for row_index in row_indexes}
+
+        return result
+
+    @cache_access
+    def all_actual(
+        self,
+        on_date: date,
+    ) -> List[Any]:
+        """
+        Получение всех объектов кеша, актуальных на дату
+        """
+        entities_list = self._entities_list
+
+        return [
+            entities_list[row_index]
+            for row_index in self._interval_index.all_actual(on_date)
+        ]
+
+
+class PeriodEntityCache(EntityCache):
+    """
+    Кеш объектов сущности, актуальных в периоде, в составе кеша нескольких
+    периодов.
+
+    Запрос не выполняет, а отбирает объекты, загруженные кешем периодов
+    одним запросом. Объекты, актуальные в нескольких периодах, являются
+    общими для кешей этих периодов.
+    """
+
+    supports_spilling = False
+
+    def __init__(
+        self,
+        periods_cache: 'MultiPeriodEntityCache',
+        date_from: date,
+        date_to: date,
+        *args,
+        **kwargs,
+    ):
+        self._periods_cache = periods_cache
+        self._date_from = date_from
+        self._date_to = date_to
+
+        super().__init__(*args, **kwargs)
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @model="{self._model.__name__}" '
+            f'@date_from="{date2str(self._date_from)}" '
+            f'@date_to="{date2str(self._date_to)}" '
+            f'@searching_key="{self._searching_key}">'
+        )
+
+    @property
+    def date_from(self) -> date:
+        """
+        Дата начала периода
+        """
+        return self._date_from
+
+    @property
+    def date_to(self) -> date:
+        """
+        Дата окончания периода
+        """
+        return self._date_to
+
+    def _prepare_record_class(self) -> Type[EntityRecord]:
+        return self._periods_cache.record_class
+
+    def _prepare_entities(self):
+        self._entities = self._periods_cache.get_period_entities(
+            date_from=self._date_from,
+            date_to=self._date_to,
+        )
+
+    def _iterate_rows(self) -> Iterator[Any]:
+        return iter(self._entities)
+
+    def _prepare_entity(self, row: Any) -> Any:
+        # Объекты уже подготовлены кешем периодов
+        return row
+
+    def _estimate_entities_size(self) -> int:
+        # Объекты принадлежат кешу периодов и учитываются им
+        return 0
+
+    def refresh(self):
+        raise ValueError(PERIOD_ENTITY_CACHE_REFRESH_ERROR)
+
+
+class MultiPeriodEntityCache(BaseCache):
+    """
+    Кеш объектов сущности на несколько дат или периодов.
+
+    В отличие от PeriodicalEntityCache, выполняющего отдельный запрос на
+    каждую дату, объекты всех периодов получаются одним запросом с условием,
+    объединяющим периоды, и распределяются по кешам периодов в Python.
+    Объект, актуальный в нескольких периодах, создается однократно и является
+    общим для кешей этих периодов.
+
+    Период задается датой или кортежем из дат начала и окончания. Объект
+    актуален в периоде, если его период действия (поля begin_field и
+    end_field) пересекается с периодом, для даты - если дата входит в период
+    действия объекта.
+
+    Пример использования для ежемесячного закрытия:
+
+    accounts = MultiPeriodEntityCache(
+        periods=[date(2021, month, 1) for month in range(1, 13)],
+        model=Account,
+        searching_key='code',
+    )
+    march_account = accounts[date(2021, 3, 1)].get_by_key('101')
+
+    Дополнительные именованные параметры передаются в кеши периодов.
+    """
+
+    entity_cache_class = PeriodEntityCache
+
+    def __init__(
+        self,
+        periods: Iterable,
+        model: Type[Model],
+        *args,
+        select_related_fields: Optional[Tuple[str, ...]] = None,
+        only_fields: Optional[Tuple[str, ...]] = None,
+        additional_filter_params: Optional[Dict[str, Any]] = None,
+        searching_key: Union[str, Tuple[str, ...]] = ('pk', ),
+        begin_field: str = 'begin',
+        end_field: str = 'end',
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+
+        self._model = model
+        self._select_related_fields = select_related_fields
+        self._only_fields = only_fields
+        self._additional_filter_params = additional_filter_params or {}
+        self._searching_key = searching_key
+        self._begin_field = begin_field
+        self._end_field = end_field
+        self._period_bounds_getter = compile_attrs_getter((
+            prepare_model_attr_path(model, begin_field),
+            prepare_model_attr_path(model, end_field),
+        ))
+
+        self._periods = tuple(
+            OrderedDict.fromkeys(
+                self._prepare_period(period)
+                for period in periods
+            )
+        )
+
+        # Параметры кешей периодов (indexes, records_mode, lazy и т.д.)
+        self._entity_cache_kwargs = kwargs
+        self._records_mode = kwargs.get('records_mode', False)
+        self._record_class = (
+            self._prepare_record_class() if
+            self._records_mode else
+            None
+        )
+
+        # Объекты всех периодов с границами их периодов действия
+        self._entities: Optional[List[Tuple[Any, date, date]]] = None
+        # Блокировка загрузки объектов периодов при первом обращении к
+        # кешам периодов из нескольких потоков
+        self._lock = threading.Lock()
+        self._periods_caches: Dict[Tuple[date, date], PeriodEntityCache] = OrderedDict()  # noqa
+
+        self._before_prepare()
+        self._prepare()
+        self._after_prepare()
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @model="{self._model.__name__}" '
+            f'@periods_count="{len(self._periods)}" '
+            f'@searching_key="{self._searching_key}">'
+        )
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __getitem__(self, period: Union[date, Tuple[date, date]]):
+        return self._periods_caches[self._prepare_period(period)]
+
+    def __iter__(self):
+        return iter(self._periods_caches.values())
+
+    def __len__(self):
+        return len(self._periods_caches)
+
+    @property
+    def periods(self) -> Tuple[Tuple[date, date], ...]:
+        """
+        Периоды кеша в виде кортежей из дат начала и окончания
+        """
+        return self._periods
+
+    @property
+    def record_class(self) -> Optional[Type[EntityRecord]]:
+        """
+        Класс записей кешей периодов в режиме записей
+        """
+        return self._record_class
+
+    @property
+    def is_touched(self) -> bool:
+        """
+        Было ли обращение к данным хотя бы одного из кешей периодов
+        """
+        return any(
+            period_cache.is_touched
+            for period_cache in self._periods_caches.values()
+        )
+
+    def _get_rows_count(self) -> int:
+        return len(self._entities) if self._entities is not None else 0
+
+    def _get_child_caches(self) -> Dict[str, BaseCache]:
+        return OrderedDict(
+            (f'{date2str(date_from)} - {date2str(date_to)}', period_cache)
+            for (date_from, date_to), period_cache in self._periods_caches.items()  # noqa
+        )
+
+    def _estimate_memory_size(self) -> int:
+        entities = self._entities or []
+        size = sys.getsizeof(entities)
+
+        if entities:
+            size += (
+                sys.getsizeof(entities[0]) * len(entities) +
+                estimate_objects_size([entity for entity, _, _ in entities])
+            )
+
+        return size
+
+    def mark_as_shared(self):
+        super().mark_as_shared()
+
+        for period_cache in self._periods_caches.values():
+            period_cache.mark_as_shared()
+
+    def prepare(self):
+        """
+        Принудительная подготовка кешей периодов
+        """
+        for period_cache in self._periods_caches.values():
+            period_cache.prepare()
+
+    def _prepare_period(
+        self,
+        period: Union[date, Tuple[date, date]],
+    ) -> Tuple[date, date]:
+        """
+        Приведение даты или периода к кортежу из дат начала и окончания
+        """
+        if isinstance(period, date):
+            period = (period, period)
+        else:
+            period = tuple(period)
+
+            if period[0] > period[1]:
+                raise ValueError(DATE_FROM_MORE_THAN_DATE_TO_ERROR)
+
+        return period
+
+    def _prepare_record_class(self) -> Type[EntityRecord]:
+        """
+        Получение класса записей, общего для кешей периодов. Помимо полей кеша
+        в запись попадают поля периода действия
+        """
+        searching_key = (
+            (self._searching_key, ) if
+            isinstance(self._searching_key, str) else
+            self._searching_key
+        )
+        fields = list(
+            self._only_fields or
+            (field.attname for field in self._model._meta.concrete_fields)
+        )
+        fields.extend(
+            prepare_model_attr_path(self._model, key_item)
+            for key_item in searching_key
+        )
+
+        for index in self._entity_cache_kwargs.get('indexes') or ():
+            fields.extend(prepare_index(index).fields)
+
+        fields.extend((self._begin_field, self._end_field))
+
+        return prepare_record_class(
+            model=self._model,
+            columns=prepare_record_columns(self._model, fields),
+        )
+
+    def _prepare_periods_filter(self) -> Q:
+        """
+        Формирование условия отбора объектов, актуальных хотя бы в одном из
+        периодов
+        """
+        periods_filter = Q()
+
+        for date_from, date_to in self._periods:
+            periods_filter |= Q(**{
+                f'{self._begin_field}__lte': date_to,
+                f'{self._end_field}__gte': date_from,
+            })
+
+        return periods_filter
+
+    def _prepare_entities_queryset(self) -> QueryType[Model]:
+        """
+        Подготовка запроса объектов всех периодов
+        """
+        queryset = self._model._base_manager.all()
+
+        if self._select_related_fields:
+            queryset = queryset.select_related(*self._select_related_fields)
+
+        queryset = queryset.filter(
+            self._prepare_periods_filter(),
+            **self._additional_filter_params,
+        )
+
+        if self._records_mode:
+            queryset = queryset.values_list(*self._record_class._columns)
+        elif self._only_fields:
+            queryset = queryset.only(
+                *self._only_fields,
+                self._begin_field,
+                self._end_field,
+            )
+
+        return queryset.distinct()
+
+    def _prepare_entities(self):
+        """
+        Получение объектов всех периодов одним запросом
+        """
+        queryset = self._prepare_entities_queryset()
+        chunk_size = self._entity_cache_kwargs.get('chunk_size')
+
+        if chunk_size:
+            queryset = queryset.iterator(chunk_size=chunk_size)
+
+        record_class = self._record_class
+        period_bounds_getter = self._period_bounds_getter
+
+        entities = []
+        for row in queryset:
+            entity = record_class(row) if record_class is not None else row
+            entities.append((entity, *period_bounds_getter(entity)))
+
+        self._entities = entities
+
+    def get_period_entities(
+        self,
+        date_from: date,
+        date_to: date,
+    ) -> List[Any]:
+        """
+        Получение объектов, актуальных в периоде. Объекты всех периодов
+        загружаются однократно при первом обращении
+        """
+        if self._entities is None:
+            with self._lock:
+                if self._entities is None:
+                    self._prepare_entities()
+
+        return [
+            entity
+            for entity, begin, end in self._entities
+            if begin <= date_to and end >= date_from
+        ]
+
+    def _prepare_periods_caches(self):
+        """
+        Создание кешей периодов
+        """
+        for date_from, date_to in self._periods:
+            self._periods_caches[(date_from, date_to)] = self.entity_cache_class(  # noqa
+                self,
+                date_from,
+                date_to,
+                model=self._model,
+                select_related_fields=self._select_related_fields,
+                only_fields=self._only_fields,
+                additional_filter_params=self._additional_filter_params,
+                searching_key=self._searching_key,
+                **self._entity_cache_kwargs,
+            )
+
+    def _before_prepare(self):
+        """
+        Точка расширения перед формированием кеша
+        """
+
+    def _prepare(self):
+        """
+        Формирование кешей периодов
+        """
+        self._prepare_periods_caches()
+
+    def _after_prepare(self):
+        """
+        Точка расширения после формирования кеша
+        """
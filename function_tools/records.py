@@ -0,0 +1,244 @@
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Tuple,
+    Type,
+)
+
+from django.db import (
+    DEFAULT_DB_ALIAS,
+)
+from django.db.models import (
+    Field,
+    Model,
+)
+
+
+# Разделитель уровней вложенности в наименованиях колонок записей
+LOOKUP_SEP = '__'
+
+
+class RelatedRecordView:
+    """
+    Представление связанного объекта записи.
+
+    Колонки связанных моделей хранятся в записи плоско, например,
+    supplier__code. Представление позволяет обращаться к ним через точку -
+    record.supplier.code, как к атрибутам объекта модели, благодаря чему
+    deep_getattr и attrgetter одинаково работают с объектами моделей и
+    записями.
+    """
+
+    __slots__ = ('_record', '_prefix')
+
+    def __init__(
+        self,
+        record: 'EntityRecord',
+        prefix: str,
+    ):
+        self._record = record
+        self._prefix = prefix
+
+    def __getattr__(self, name: str):
+        record = self._record
+        column = f'{self._prefix}{LOOKUP_SEP}{name}'
+
+        if column in record._columns_set:
+            value = getattr(record, column)
+        elif column in record._relation_prefixes:
+            value = RelatedRecordView(record, column)
+        elif name in ('id', 'pk') and self._prefix in record._relation_attnames:
+            value = getattr(record, record._relation_attnames[self._prefix])
+        else:
+            raise AttributeError(name)
+
+        return value
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} @prefix="{self._prefix}">'
+
+
+class EntityRecord:
+    """
+    Базовый класс компактной записи кеша.
+
+    Используется вместо объекта модели, когда кеш работает в режиме записей.
+    Классы записей создаются под конкретный набор колонок функцией
+    prepare_record_class и не имеют __dict__, состояния _state и механизма
+    отложенных полей, поэтому занимают значительно меньше памяти.
+    """
+
+    __slots__ = ()
+
+    # Модель, строки которой хранятся в записях
+    _model: Type[Model] = None
+    # Наименования колонок записи в порядке получения из values_list
+    _columns: Tuple[str, ...] = ()
+    _columns_set = frozenset()
+    # Атрибуты объекта модели, соответствующие колонкам записи
+    _model_attnames: Tuple[str, ...] = ()
+    # Префиксы колонок связанных моделей
+    _relation_prefixes = frozenset()
+    # Соответствие наименований внешних ключей их колонкам
+    _relation_attnames: Dict[str, str] = {}
+    # Наименование колонки первичного ключа
+    _pk_attname = 'id'
+
+    def __init__(self, values: Iterable[Any]):
+        for column, value in zip(self._columns, values):
+            setattr(self, column, value)
+
+    def __getattr__(self, name: str):
+        if name in self._relation_prefixes:
+            return RelatedRecordView(self, name)
+
+        raise AttributeError(name)
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @model="{self._model.__name__}" '
+            f'@pk="{self.pk}">'
+        )
+
+    @property
+    def pk(self):
+        """
+        Значение первичного ключа записи
+        """
+        return getattr(self, self._pk_attname)
+
+    def to_model(
+        self,
+        using: str = DEFAULT_DB_ALIAS,
+    ) -> Model:
+        """
+        Преобразование записи в объект модели.
+
+        Заполняются только собственные поля модели, присутствующие в записи,
+        остальные поля становятся отложенными. Колонки связанных моделей не
+        переносятся.
+        """
+        values = [
+            getattr(self, attname)
+            for attname in self._model_attnames
+        ]
+
+        return self._model.from_db(using, self._model_attnames, values)
+
+
+def prepare_record_column(
+    model: Type[Model],
+    field_name: str,
+) -> str:
+    """
+    Получение наименования колонки записи по наименованию поля.
+
+    Наименования полей модели заменяются на наименования их колонок
+    (account -> account_id), путь через точку к полям связанных моделей
+    заменяется на путь через двойное подчеркивание (supplier.code ->
+    supplier__code).
+    """
+    column = field_name.replace('.', LOOKUP_SEP)
+
+    if column == 'pk':
+        column = model._meta.pk.attname
+    elif LOOKUP_SEP not in column:
+        field = model._meta.get_field(column)
+
+        if field.concrete:
+            column = field.attname
+
+    return column
+
+
+def prepare_record_columns(
+    model: Type[Model],
+    fields: Iterable[str],
+) -> Tuple[str, ...]:
+    """
+    Формирование кортежа колонок записи по наименованиям полей. Первичный ключ
+    добавляется всегда.
+    """
+    columns = [model._meta.pk.attname]
+
+    for field_name in fields:
+        column = prepare_record_column(model, field_name)
+
+        if column not in columns:
+            columns.append(column)
+
+    return tuple(columns)
+
+
+def get_record_column_field(
+    model: Type[Model],
+    column: str,
+) -> Field:
+    """
+    Получение поля модели, значения которого хранятся в колонке записи
+    """
+    *relation_names, field_name = column.split(LOOKUP_SEP)
+
+    for relation_name in relation_names:
+        model = model._meta.get_field(relation_name).related_model
+
+    return model._meta.get_field(field_name)
+
+
+_record_classes: Dict[Tuple[Type[Model], Tuple[str, ...]], Type[EntityRecord]] = {}
+
+
+def prepare_record_class(
+    model: Type[Model],
+    columns: Tuple[str, ...],
+) -> Type[EntityRecord]:
+    """
+    Получение класса записи со слотами под указанные колонки модели.
+
+    Классы создаются однократно на каждую пару модель - набор колонок.
+    """
+    key = (model, columns)
+
+    if key not in _record_classes:
+        model_fields = {
+            field.attname: field
+            for field in model._meta.concrete_fields
+        }
+
+        relation_prefixes = set()
+        for column in columns:
+            parts = column.split(LOOKUP_SEP)[:-1]
+            for index in range(1, len(parts) + 1):
+                relation_prefixes.add(LOOKUP_SEP.join(parts[:index]))
+
+        relation_attnames = {
+            field.name: field.attname
+            for field in model_fields.values()
+            if field.is_relation and field.attname in columns
+        }
+        relation_prefixes.update(relation_attnames)
+
+        _record_classes[key] = type(
+            f'{model.__name__}Record',
+            (EntityRecord, ),
+            {
+                '__slots__': columns,
+                '__module__': __name__,
+                '_model': model,
+                '_columns': columns,
+                '_columns_set': frozenset(columns),
+                # Порядок должен совпадать с порядком полей модели для
+                # Model.from_db
+                '_model_attnames': tuple(
+                    attname
+                    for attname in model_fields
+                    if attname in columns
+                ),
+                '_relation_prefixes': frozenset(relation_prefixes),
+                '_relation_attnames': relation_attnames,
+                '_pk_attname': model._meta.pk.attname,
+            },
+        )
+
+    return _record_classes[key]
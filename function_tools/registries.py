@@ -0,0 +1,366 @@
+import threading
+import time
+from collections import (
+    OrderedDict,
+)
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from django.db.models import (
+    Model,
+)
+
+from function_tools.caches import (
+    BaseCache,
+)
+from function_tools.indexes import (
+    BaseIndex,
+)
+from function_tools.strings import (
+    SHARED_CACHE_REGISTRY_BUDGET_ERROR,
+)
+
+
+def freeze_cache_param(value: Any) -> Hashable:
+    """
+    Приведение значения параметра кеша к неизменяемому виду для
+    использования в ключе реестра разделяемых кешей
+    """
+    if isinstance(value, dict):
+        value = tuple(
+            (key, freeze_cache_param(item))
+            for key, item in sorted(value.items(), key=lambda x: str(x[0]))
+        )
+    elif isinstance(value, (list, tuple)):
+        value = tuple(freeze_cache_param(item) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        value = frozenset(freeze_cache_param(item) for item in value)
+    elif isinstance(value, BaseIndex):
+        # Индексы копируются кешем, поэтому равными считаются индексы
+        # одного класса с одинаковыми параметрами
+        value = (value.__class__, repr(value))
+
+    return value
+
+
+class SharedCacheEntry:
+    """
+    Запись реестра разделяемых кешей
+    """
+
+    __slots__ = ('cache', 'model', 'created_at', 'rows_count')
+
+    def __init__(
+        self,
+        cache: BaseCache,
+        created_at: float,
+        rows_count: int,
+    ):
+        self.cache = cache
+        self.model = getattr(cache, '_model', None)
+        self.created_at = created_at
+        self.rows_count = rows_count
+
+
+class SharedCacheRegistry:
+    """
+    Реестр разделяемых кешей процесса.
+
+    Выдает один и тот же кеш всем потребителям, запросившим кеш одного класса
+    для одной модели с одинаковыми параметрами (дополнительными параметрами
+    фильтрации, only_fields, select_related_fields, ключом поиска и т.д.).
+    Например, менеджеры, последовательно выполняемые в одном процессе, не
+    загружают справочники повторно.
+
+    Кеши реестра строятся сразу (не лениво), отмечаются как разделяемые и
+    доступны только для чтения. Кеш перестраивается при следующем запросе,
+    если с момента построения прошло больше ttl секунд. При превышении
+    ограничения на количество кешей (max_entries) или суммарное количество
+    строк в них (max_rows) из реестра удаляются давно не запрашивавшиеся
+    кеши.
+
+    Ресурсы удаленного из реестра кеша (память, зарезервированная в бюджете
+    памяти, строки на диске, снимки) освобождаются закрытием кеша после
+    завершения построения кеша с тем же ключом, если оно выполняется.
+    Вложенные кеши, которые также находятся в реестре, не закрываются.
+    Потребители, уже получившие удаленный кеш, могут продолжать с ним
+    работать: закрытый кеш подготавливается заново при следующем обращении.
+
+    Построение кешей с разными ключами выполняется параллельно, повторный
+    запрос кеша, который строится в другом потоке, ожидает завершения
+    построения. Если построение завершилось ошибкой, то ожидающие и новые
+    запросы кеша строят его заново по очереди.
+
+    Разделяемые кеши допускают одновременное чтение из нескольких потоков.
+    Хранилище кешей также может быть разделяемым, например, хранилище
+    помощника с shared_cache = True (см. BaseHelper).
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_rows: Optional[int] = None,
+    ):
+        self._lock = threading.RLock()
+        self._building_locks: Dict[Tuple, threading.Lock] = {}
+        self._entries: 'OrderedDict[Tuple, SharedCacheEntry]' = OrderedDict()
+        # Удаленные из реестра кеши, ожидающие закрытия, по ключам
+        self._removed_caches: Dict[Tuple, List[BaseCache]] = {}
+        self._rows_count = 0
+
+        self.configure(
+            ttl=ttl,
+            max_entries=max_entries,
+            max_rows=max_rows,
+        )
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @entries="{len(self._entries)}" '
+            f'@rows_count="{self._rows_count}">'
+        )
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def rows_count(self) -> int:
+        """
+        Суммарное количество строк в кешах реестра
+        """
+        return self._rows_count
+
+    def configure(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_rows: Optional[int] = None,
+    ):
+        """
+        Установка времени жизни кешей в секундах и ограничений реестра.
+        Пустое значение снимает ограничение
+        """
+        if any(
+            value is not None and value <= 0
+            for value in (ttl, max_entries, max_rows)
+        ):
+            raise ValueError(SHARED_CACHE_REGISTRY_BUDGET_ERROR)
+
+        with self._lock:
+            self._ttl = ttl
+            self._max_entries = max_entries
+            self._max_rows = max_rows
+
+            self._evict()
+
+        self._close_removed_caches()
+
+    def _prepare_key(
+        self,
+        cache_class: Type[BaseCache],
+        args: Tuple,
+        kwargs: Dict[str, Any],
+    ) -> Tuple:
+        """
+        Формирование ключа кеша в реестре
+        """
+        return (
+            cache_class,
+            freeze_cache_param(args),
+            freeze_cache_param(kwargs),
+        )
+
+    def _is_expired(
+        self,
+        entry: SharedCacheEntry,
+    ) -> bool:
+        """
+        Истекло ли время жизни кеша
+        """
+        return (
+            self._ttl is not None and
+            time.monotonic() - entry.created_at > self._ttl
+        )
+
+    def _get_actual_entry(
+        self,
+        key: Tuple,
+    ) -> Optional[SharedCacheEntry]:
+        """
+        Получение записи реестра с неистекшим временем жизни кеша. Запись
+        становится последней в порядке вытеснения
+        """
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            if self._is_expired(entry):
+                self._remove(key)
+                entry = None
+            else:
+                self._entries.move_to_end(key)
+
+        return entry
+
+    def _remove(
+        self,
+        key: Tuple,
+    ):
+        """
+        Удаление записи из реестра. Кеш записи закрывается позже, вне
+        блокировки реестра (см. _close_removed_caches)
+        """
+        entry = self._entries.pop(key)
+        self._rows_count -= entry.rows_count
+
+        self._removed_caches.setdefault(key, []).append(entry.cache)
+
+    def _is_building(
+        self,
+        key: Tuple,
+    ) -> bool:
+        """
+        Выполняется ли построение кеша с указанным ключом
+        """
+        building_lock = self._building_locks.get(key)
+
+        return building_lock is not None and building_lock.locked()
+
+    def _close_removed_caches(self):
+        """
+        Закрытие удаленных из реестра кешей, построение кешей с ключами
+        которых не выполняется
+        """
+        with self._lock:
+            caches = [
+                cache
+                for key in list(self._removed_caches)
+                if not self._is_building(key)
+                for cache in self._removed_caches.pop(key)
+            ]
+
+            if not caches:
+                return
+
+            registered_caches = {
+                id(entry.cache)
+                for entry in self._entries.values()
+            }
+
+        for cache in caches:
+            cache._close_owned(
+                is_owned=lambda child: id(child) not in registered_caches,
+            )
+
+    def _is_over_budget(self) -> bool:
+        """
+        Превышены ли ограничения реестра
+        """
+        return (
+            (
+                self._max_entries is not None and
+                len(self._entries) > self._max_entries
+            ) or
+            (
+                self._max_rows is not None and
+                self._rows_count > self._max_rows
+            )
+        )
+
+    def _evict(
+        self,
+        protected_key: Optional[Tuple] = None,
+    ):
+        """
+        Вытеснение давно не запрашивавшихся кешей до соблюдения ограничений
+        реестра. Кеш с ключом protected_key не вытесняется
+        """
+        for key in list(self._entries):
+            if not self._is_over_budget():
+                break
+
+            if key != protected_key:
+                self._remove(key)
+
+    def get(
+        self,
+        cache_class: Type[BaseCache],
+        *args,
+        **kwargs,
+    ) -> BaseCache:
+        """
+        Получение разделяемого кеша указанного класса. Параметры передаются в
+        конструктор кеша при его построении, например,
+        shared_cache_registry.get(EntityCache, Account, searching_key='code')
+        """
+        key = self._prepare_key(cache_class, args, kwargs)
+
+        with self._lock:
+            entry = self._get_actual_entry(key)
+
+            if entry is not None:
+                return entry.cache
+
+            building_lock = self._building_locks.setdefault(
+                key,
+                threading.Lock(),
+            )
+
+        with building_lock:
+            with self._lock:
+                entry = self._get_actual_entry(key)
+
+            if entry is None:
+                # При ошибке построения блокировка построения остается в
+                # реестре, поэтому потоки, ожидающие ее, и новые запросы
+                # кеша строят его по очереди, а не параллельно
+                cache = cache_class(*args, **kwargs)
+                # Ленивый кеш строится сразу, чтобы потребители в разных
+                # потоках не строили его одновременно
+                cache.prepare()
+                cache.mark_as_shared()
+
+                entry = SharedCacheEntry(
+                    cache=cache,
+                    created_at=time.monotonic(),
+                    rows_count=cache._get_rows_count(),
+                )
+
+                with self._lock:
+                    self._entries[key] = entry
+                    self._rows_count += entry.rows_count
+                    self._building_locks.pop(key, None)
+
+                    self._evict(protected_key=key)
+
+        self._close_removed_caches()
+
+        return entry.cache
+
+    def invalidate(
+        self,
+        model: Optional[Type[Model]] = None,
+    ):
+        """
+        Удаление из реестра кешей указанной модели или всех кешей
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if model is None or self._entries[key].model is model:
+                    self._remove(key)
+
+        self._close_removed_caches()
+
+
+# Реестр разделяемых кешей процесса
+shared_cache_registry = SharedCacheRegistry()
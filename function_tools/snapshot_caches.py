@@ -0,0 +1,250 @@
+import logging
+from hashlib import (
+    sha256,
+)
+from operator import (
+    attrgetter,
+)
+from typing import (
+    Any,
+    Iterator,
+    Optional,
+    Type,
+)
+
+from django.db.models import (
+    Model,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.enums import (
+    HashTableLayoutEnum,
+)
+from function_tools.snapshots import (
+    SNAPSHOT_FORMAT_VERSION,
+    EntitySnapshot,
+    open_entity_snapshot,
+    write_entity_snapshot,
+)
+from function_tools.statistics import (
+    estimate_objects_size,
+)
+from function_tools.strings import (
+    SHARED_CACHE_IS_READ_ONLY_ERROR,
+    SNAPSHOT_CACHE_PARAM_ERROR,
+    SNAPSHOT_WRITE_ERROR,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotEntityCache(EntityCache):
+    """
+    Кеш объектов сущности со снимком строк на диске.
+
+    После построения из БД строки кеша и индекс ключей записываются в файл
+    снимка snapshot_path. При создании кеша в другом процессе (например, при
+    холодном старте воркера) снимок с совпадающей меткой версии открывается
+    через mmap вместо выполнения запроса: строки не загружаются в память, а
+    записи создаются только для строк, к которым было обращение.
+
+    Метка версии строится по SQL запроса кеша, колонкам и ключу поиска,
+    поэтому снимок отвергается и перестраивается при их изменении. За
+    актуальность данных снимка относительно БД отвечает вызывающий код,
+    например, удалением файла снимка или инкрементальным обновлением кеша.
+
+    Кеш работает в режиме записей с плоской хеш-таблицей. Поиск по части
+    ключа не поддерживается. Фильтрация и перебор объектов кеша, открытого
+    из снимка, обращаются ко всем строкам снимка, а вторичные индексы
+    строятся полным проходом по снимку при открытии.
+
+    Ошибка записи снимка (например, каталог недоступен для записи или
+    закончилось место на диске) не прерывает подготовку: она записывается в
+    журнал, а кеш, построенный из БД, используется без снимка.
+
+    Снимок должен находиться в каталоге, запись в который разрешена только
+    процессам приложения (см. EntitySnapshot).
+    """
+
+    supports_spilling = False
+    supports_prefix_index = False
+
+    # Параметры, значения которых определяются снимком
+    _snapshot_params = {
+        'records_mode': True,
+        'hash_table_layout': HashTableLayoutEnum.FLAT,
+        'prefix_index': False,
+    }
+
+    def __init__(
+        self,
+        model: Type[Model],
+        *args,
+        snapshot_path: str,
+        **kwargs,
+    ):
+        self._snapshot_path = snapshot_path
+        self._snapshot: Optional[EntitySnapshot] = None
+
+        for param, value in self._snapshot_params.items():
+            if kwargs.get(param, value) != value:
+                raise ValueError(
+                    SNAPSHOT_CACHE_PARAM_ERROR.format(
+                        param=param,
+                        value=value,
+                    )
+                )
+
+            kwargs[param] = value
+
+        super().__init__(model, *args, **kwargs)
+
+    @property
+    def snapshot_path(self) -> str:
+        """
+        Путь к файлу снимка
+        """
+        return self._snapshot_path
+
+    @property
+    def is_loaded_from_snapshot(self) -> bool:
+        """
+        Открыт ли кеш из снимка
+        """
+        return self._snapshot is not None
+
+    def _prepare_snapshot_version(self) -> str:
+        """
+        Получение метки версии снимка по запросу, колонкам и ключу поиска
+        кеша
+        """
+        queryset = self._prepare_entities_queryset()
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+
+        return sha256(
+            repr((
+                SNAPSHOT_FORMAT_VERSION,
+                f'{self.__class__.__module__}.{self.__class__.__qualname__}',
+                self._model._meta.label,
+                sql,
+                params,
+                self._record_class._columns,
+                self._searching_key_paths,
+                self._change_marker_path,
+            )).encode(),
+        ).hexdigest()
+
+    def _prepare(self):
+        version = self._prepare_snapshot_version()
+        snapshot = open_entity_snapshot(self._snapshot_path, version)
+
+        if snapshot is None:
+            super()._prepare()
+
+            try:
+                self._write_snapshot(version)
+            except Exception:
+                logger.exception(
+                    SNAPSHOT_WRITE_ERROR.format(path=self._snapshot_path)
+                )
+        else:
+            self._prepare_from_snapshot(snapshot)
+
+    def _prepare_from_snapshot(
+        self,
+        snapshot: EntitySnapshot,
+        is_caching_records: bool = True,
+    ):
+        """
+        Подготовка кеша по открытому снимку без выполнения запроса
+        """
+        self._snapshot = snapshot
+
+        super()._prepare_from_snapshot(snapshot, is_caching_records)
+
+        self._change_marker_value = snapshot.extra.get('change_marker_value')
+
+    def _write_snapshot(self, version: str):
+        """
+        Запись снимка строк построенного кеша. Снимок записывается во
+        временный файл, который затем заменяет прежний (см.
+        write_entity_snapshot), поэтому другие процессы не видят частично
+        записанный снимок
+        """
+        columns = self._record_class._columns
+        column_values_getter = attrgetter(*columns)
+
+        write_entity_snapshot(
+            path=self._snapshot_path,
+            version=version,
+            columns=columns,
+            key_positions=self._get_snapshot_key_positions(),
+            rows=(
+                (
+                    column_values_getter(entity) if
+                    len(columns) > 1 else
+                    (column_values_getter(entity), )
+                )
+                for entity in self._entities_list
+            ),
+            extra={
+                'change_marker_value': self._change_marker_value,
+            },
+        )
+
+    def _iterate_rows(self) -> Iterator[Any]:
+        if self._snapshot is not None:
+            return self._snapshot.iterate_rows()
+
+        return super()._iterate_rows()
+
+    def _clear_prepared_data(self):
+        """
+        Сброс данных кеша с закрытием открытого снимка
+        """
+        super()._clear_prepared_data()
+
+        snapshot = self._snapshot
+        self._snapshot = None
+
+        if snapshot is not None:
+            snapshot.close()
+
+    def _release_snapshot(self):
+        """
+        Перенос строк снимка в память с построением обычной хеш-таблицы и
+        закрытием снимка
+        """
+        snapshot = self._snapshot
+        self._prepare_entities_hash_table()
+        self._snapshot = None
+
+        snapshot.close()
+
+    def _estimate_entities_size(self) -> int:
+        if self._snapshot is not None:
+            # Отображение файла снимка не учитывается, в памяти находятся
+            # только записи строк, к которым были обращения
+            size = estimate_objects_size(self._entities_list.touched_records)
+        else:
+            size = super()._estimate_entities_size()
+
+        return size
+
+    def refresh(self):
+        """
+        Инкрементальное обновление кеша. Кеш, открытый из снимка, предварительно
+        переносится в память. Снимок при обновлении не перезаписывается.
+        Разделяемый кеш доступен только для чтения и не обновляется
+        """
+        if self._is_shared:
+            raise ValueError(SHARED_CACHE_IS_READ_ONLY_ERROR)
+
+        with self._lock:
+            if self._snapshot is not None:
+                self._release_snapshot()
+
+        super().refresh()
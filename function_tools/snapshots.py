@@ -0,0 +1,648 @@
+import io
+import mmap
+import numbers
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from array import (
+    array,
+)
+from bisect import (
+    bisect_left,
+)
+from collections.abc import (
+    Sequence,
+)
+from datetime import (
+    datetime,
+    timezone,
+)
+from fractions import (
+    Fraction,
+)
+from hashlib import (
+    blake2b,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from function_tools.records import (
+    EntityRecord,
+)
+from function_tools.strings import (
+    SNAPSHOT_IS_CORRUPTED_ERROR,
+    SNAPSHOT_UNSAFE_GLOBAL_ERROR,
+)
+
+
+# Сигнатура файла снимка и версия формата. При изменении формата версия
+# увеличивается, снимки предыдущих версий не открываются
+SNAPSHOT_SIGNATURE = b'FTSNAP'
+SNAPSHOT_FORMAT_VERSION = 2
+
+# Заголовок файла: сигнатура и версия формата
+_SNAPSHOT_HEADER = struct.Struct('<6sH')
+# Концевик файла: смещение и размер метаданных
+_SNAPSHOT_TRAILER = struct.Struct('<QQ')
+# Размер беззнакового 64-битного целого в массивах смещений и ключей
+_ITEM_SIZE = 8
+_ITEM_BITS = _ITEM_SIZE * 8
+_ITEM_MASK = (1 << _ITEM_BITS) - 1
+_PICKLE_PROTOCOL = 4
+# Размер представления части ключа поиска при вычислении хеша ключа
+_KEY_VALUE_SIZE = struct.Struct('<I')
+
+# Классы, объекты которых допускаются в строках и метаданных снимка, помимо
+# встроенных типов pickle (чисел, строк, байтов, кортежей, списков,
+# словарей): типы значений полей моделей и часовые пояса дат
+_SNAPSHOT_SAFE_GLOBALS = frozenset((
+    ('builtins', 'bytearray'),
+    ('builtins', 'complex'),
+    ('builtins', 'frozenset'),
+    ('builtins', 'set'),
+    ('datetime', 'date'),
+    ('datetime', 'datetime'),
+    ('datetime', 'time'),
+    ('datetime', 'timedelta'),
+    ('datetime', 'timezone'),
+    ('decimal', 'Decimal'),
+    ('uuid', 'SafeUUID'),
+    ('uuid', 'UUID'),
+    ('pytz', '_UTC'),
+    ('pytz', '_p'),
+    ('zoneinfo', 'ZoneInfo._unpickle'),
+))
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """
+    Восстановление значений снимка, допускающее только классы из
+    _SNAPSHOT_SAFE_GLOBALS. Обычный pickle.loads создает объекты любых
+    классов и вызывает любые функции, указанные в данных, поэтому изменение
+    файла снимка позволило бы выполнить произвольный код в процессе
+    """
+
+    def find_class(self, module: str, name: str) -> Any:
+        if (module, name) not in _SNAPSHOT_SAFE_GLOBALS:
+            raise pickle.UnpicklingError(
+                SNAPSHOT_UNSAFE_GLOBAL_ERROR.format(module=module, name=name)
+            )
+
+        return super().find_class(module, name)
+
+
+def _loads(data: bytes) -> Any:
+    """
+    Восстановление значения строки или метаданных снимка
+    """
+    return _SnapshotUnpickler(io.BytesIO(data)).load()
+
+
+def _dumps(value: Any) -> bytes:
+    """
+    Сериализация значения строки или метаданных снимка. Значение
+    проверяется восстановлением, поэтому значения недопустимых типов
+    обнаруживаются при записи снимка, а не при его чтении
+    """
+    data = pickle.dumps(value, protocol=_PICKLE_PROTOCOL)
+    _loads(data)
+
+    return data
+
+
+def _encode_key_value(value: Any) -> bytes:
+    """
+    Каноническое представление значения части ключа поиска.
+
+    Равные значения должны получать одинаковое представление, как и при
+    поиске в хеш-таблице в памяти, поэтому результат pickle не подходит: он
+    зависит от типа (1 и True, Decimal('1') и Decimal('1.0')) и от того,
+    является ли значение тем же объектом, что и другое значение ключа.
+    Числа приводятся к точной дроби, строки и байты представляются
+    содержимым, дата и время с часовым поясом - временем в UTC, кортежи -
+    представлениями элементов. Остальные значения представляются типом и
+    repr.
+    """
+    if value is None:
+        tag, payload = b'N', b''
+    elif isinstance(value, str):
+        tag, payload = b's', value.encode('utf-8', 'surrogatepass')
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        tag, payload = b'b', bytes(value)
+    elif isinstance(value, numbers.Number) and not isinstance(value, complex):
+        try:
+            fraction = Fraction(value)
+        except (ValueError, OverflowError, TypeError):
+            # Бесконечность и NaN
+            tag, payload = b'f', repr(float(value)).encode()
+        else:
+            tag = b'n'
+            payload = f'{fraction.numerator}/{fraction.denominator}'.encode()
+    elif isinstance(value, tuple):
+        tag, payload = b't', b''.join(_encode_key_value(item) for item in value)
+    else:
+        if isinstance(value, datetime) and value.utcoffset() is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            tag = b'z'
+        else:
+            tag = b'o'
+
+        value_type = type(value)
+        payload = (
+            f'{value_type.__module__}.{value_type.__qualname__}:{value!r}'
+        ).encode('utf-8', 'surrogatepass')
+
+    return tag + _KEY_VALUE_SIZE.pack(len(payload)) + payload
+
+
+def hash_snapshot_key(key_values: Tuple[Any, ...]) -> int:
+    """
+    Получение стабильного между процессами 64-битного хеша значений ключа
+    поиска. Встроенная функция hash для строк зависит от процесса, поэтому
+    не подходит для хранения в файле. Хеш вычисляется по каноническому
+    представлению значений (см. _encode_key_value), поэтому равные ключи
+    получают одинаковый хеш
+    """
+    return int.from_bytes(
+        blake2b(
+            b''.join(_encode_key_value(value) for value in key_values),
+            digest_size=_ITEM_SIZE,
+        ).digest(),
+        'little',
+    )
+
+
+def _write_array(snapshot_file, items: array) -> int:
+    """
+    Запись массива 64-битных целых в порядке байтов little-endian
+    """
+    if sys.byteorder != 'little':
+        items = array(items.typecode, items)
+        items.byteswap()
+
+    return snapshot_file.write(items.tobytes())
+
+
+def write_entity_snapshot(
+    path: str,
+    version: str,
+    columns: Tuple[str, ...],
+    key_positions: Tuple[int, ...],
+    rows: Iterable[Tuple[Any, ...]],
+    extra: Optional[Dict[str, Any]] = None,
+):
+    """
+    Запись снимка строк кеша в файл.
+
+    За заголовком последовательно записываются строки, массив смещений строк
+    и индекс ключей - отсортированный массив хешей значений ключа поиска и
+    соответствующий ему массив номеров строк. Строки с пустыми частями ключа
+    в индекс ключей не попадают. Метаданные записываются в конец файла, их
+    смещение хранится в концевике.
+
+    Снимок сначала записывается во временный файл, который затем атомарно
+    заменяет прежний, поэтому процессы, открывшие прежний снимок, продолжают
+    работать с ним.
+
+    :param path: путь к файлу снимка
+    :param version: метка версии источника данных снимка
+    :param columns: наименования колонок строк
+    :param key_positions: номера колонок, составляющих ключ поиска
+    :param rows: кортежи значений колонок
+    :param extra: дополнительные сведения, сохраняемые в метаданных снимка
+    """
+    # Временный файл создается с уникальным именем в каталоге снимка, чтобы
+    # снимок, записываемый одновременно несколькими потоками или
+    # процессами, не смешивался, а замена файла оставалась атомарной
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f'{os.path.basename(path)}.',
+        suffix='.tmp',
+    )
+
+    # Смещения хранятся в массиве, а хеш ключа и номер строки упаковываются в
+    # одно целое, чтобы при записи больших выборок не держать в памяти
+    # кортежи на каждую строку
+    offsets = array('Q')
+    keys = []
+
+    try:
+        with os.fdopen(file_descriptor, 'wb') as snapshot_file:
+            position = snapshot_file.write(
+                _SNAPSHOT_HEADER.pack(
+                    SNAPSHOT_SIGNATURE,
+                    SNAPSHOT_FORMAT_VERSION,
+                )
+            )
+
+            for row_index, row in enumerate(rows):
+                offsets.append(position)
+                position += snapshot_file.write(_dumps(tuple(row)))
+
+                key_values = tuple(row[key_position] for key_position in key_positions)  # noqa
+
+                if None not in key_values:
+                    keys.append(
+                        hash_snapshot_key(key_values) << _ITEM_BITS | row_index
+                    )
+
+            offsets.append(position)
+            keys.sort()
+
+            # Массивы располагаются с границы 64-битного целого
+            padding = -position % _ITEM_SIZE
+            position += snapshot_file.write(b'\0' * padding)
+
+            offsets_position = position
+            position += _write_array(snapshot_file, offsets)
+
+            key_hashes_position = position
+            position += _write_array(
+                snapshot_file,
+                array('Q', (key >> _ITEM_BITS for key in keys)),
+            )
+
+            key_rows_position = position
+            position += _write_array(
+                snapshot_file,
+                array('Q', (key & _ITEM_MASK for key in keys)),
+            )
+
+            meta_position = position
+            meta_size = snapshot_file.write(
+                _dumps(
+                    {
+                        'version': version,
+                        'columns': tuple(columns),
+                        'key_positions': tuple(key_positions),
+                        'rows_count': len(offsets) - 1,
+                        'keys_count': len(keys),
+                        'offsets_position': offsets_position,
+                        'key_hashes_position': key_hashes_position,
+                        'key_rows_position': key_rows_position,
+                        'extra': extra or {},
+                    },
+                ),
+            )
+            snapshot_file.write(
+                _SNAPSHOT_TRAILER.pack(meta_position, meta_size),
+            )
+
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class EntitySnapshot:
+    """
+    Снимок строк кеша, открытый через mmap.
+
+    Строки не загружаются в память при открытии: значения строки считываются
+    из отображения и восстанавливаются только при обращении к ней. Поиск по
+    ключу выполняется двоичным поиском по массиву хешей ключей в отображении
+    с проверкой значений ключа найденных строк.
+
+    Значения строк и метаданные хранятся в формате pickle. Файл снимка
+    считается доверенным: снимки должны располагаться в каталоге, запись в
+    который разрешена только процессам приложения. При чтении допускаются
+    только встроенные типы и типы значений полей моделей (даты, Decimal,
+    UUID), поэтому измененный файл не может создать объекты других классов
+    или вызвать функции, но может подменить данные кеша. Снимок со
+    значениями других типов не записывается (pickle.UnpicklingError).
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+
+        with open(path, 'rb') as snapshot_file:
+            self._mmap = mmap.mmap(
+                snapshot_file.fileno(),
+                0,
+                access=mmap.ACCESS_READ,
+            )
+
+        try:
+            self._meta = self._read_meta()
+        except Exception:
+            self.close()
+
+            raise
+
+        self._key_positions = self._meta['key_positions']
+
+        rows_count = self._meta['rows_count']
+        keys_count = self._meta['keys_count']
+
+        self._offsets = self._prepare_array(
+            self._meta['offsets_position'],
+            rows_count + 1,
+        )
+        self._key_hashes = self._prepare_array(
+            self._meta['key_hashes_position'],
+            keys_count,
+        )
+        self._key_rows = self._prepare_array(
+            self._meta['key_rows_position'],
+            keys_count,
+        )
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @path="{self._path}" '
+            f'@rows_count="{self.rows_count}">'
+        )
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __len__(self):
+        return self.rows_count
+
+    def _read_meta(self) -> Dict[str, Any]:
+        """
+        Проверка заголовка и чтение метаданных снимка
+        """
+        snapshot_mmap = self._mmap
+
+        if (
+            len(snapshot_mmap) < _SNAPSHOT_HEADER.size + _SNAPSHOT_TRAILER.size or  # noqa
+            _SNAPSHOT_HEADER.unpack_from(snapshot_mmap, 0) != (
+                SNAPSHOT_SIGNATURE,
+                SNAPSHOT_FORMAT_VERSION,
+            )
+        ):
+            raise ValueError(
+                SNAPSHOT_IS_CORRUPTED_ERROR.format(path=self._path)
+            )
+
+        meta_position, meta_size = _SNAPSHOT_TRAILER.unpack_from(
+            snapshot_mmap,
+            len(snapshot_mmap) - _SNAPSHOT_TRAILER.size,
+        )
+
+        return _loads(
+            snapshot_mmap[meta_position:meta_position + meta_size],
+        )
+
+    def _prepare_array(
+        self,
+        position: int,
+        items_count: int,
+    ) -> memoryview:
+        """
+        Получение массива 64-битных целых из отображения без копирования
+        """
+        return memoryview(self._mmap)[
+            position:position + items_count * _ITEM_SIZE
+        ].cast('Q')
+
+    @property
+    def path(self) -> str:
+        """
+        Путь к файлу снимка
+        """
+        return self._path
+
+    @property
+    def version(self) -> str:
+        """
+        Метка версии источника данных снимка
+        """
+        return self._meta['version']
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        """
+        Наименования колонок строк
+        """
+        return self._meta['columns']
+
+    @property
+    def rows_count(self) -> int:
+        """
+        Количество строк в снимке
+        """
+        return self._meta['rows_count']
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        """
+        Дополнительные сведения, сохраненные в метаданных снимка
+        """
+        return self._meta['extra']
+
+    def get_row(self, row_index: int) -> Tuple[Any, ...]:
+        """
+        Получение значений строки по ее номеру
+        """
+        return _loads(
+            self._mmap[self._offsets[row_index]:self._offsets[row_index + 1]],
+        )
+
+    def iterate_rows(self) -> Iterator[Tuple[Any, ...]]:
+        """
+        Перебор значений всех строк снимка
+        """
+        for row_index in range(self.rows_count):
+            yield self.get_row(row_index)
+
+    def find_row_indexes(
+        self,
+        key_values: Tuple[Any, ...],
+    ) -> List[int]:
+        """
+        Получение номеров строк по значениям ключа поиска
+        """
+        key_hashes = self._key_hashes
+        key_hash = hash_snapshot_key(key_values)
+        position = bisect_left(key_hashes, key_hash)
+
+        row_indexes = []
+        while position < len(key_hashes) and key_hashes[position] == key_hash:
+            row_index = self._key_rows[position]
+            row = self.get_row(row_index)
+
+            # Совпадение хешей не гарантирует совпадения значений ключа
+            if tuple(row[index] for index in self._key_positions) == key_values:
+                row_indexes.append(row_index)
+
+            position += 1
+
+        return row_indexes
+
+    def close(self):
+        """
+        Закрытие отображения файла снимка
+        """
+        for view_name in ('_offsets', '_key_hashes', '_key_rows'):
+            view = self.__dict__.pop(view_name, None)
+
+            if view is not None:
+                view.release()
+
+        self._mmap.close()
+
+
+def open_entity_snapshot(
+    path: str,
+    version: str,
+) -> Optional[EntitySnapshot]:
+    """
+    Открытие снимка с проверкой метки версии. Если файл отсутствует,
+    поврежден, имеет другую версию формата или метка версии не совпадает, то
+    возвращается None
+    """
+    snapshot = None
+
+    if os.path.exists(path):
+        try:
+            snapshot = EntitySnapshot(path)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            snapshot = None
+
+    if snapshot is not None and snapshot.version != version:
+        snapshot.close()
+        snapshot = None
+
+    return snapshot
+
+
+class SnapshotRows(Sequence):
+    """
+    Последовательность записей строк снимка.
+
+    Запись создается при первом обращении к строке и запоминается, поэтому
+    повторные обращения возвращают тот же объект. При is_caching_records=False
+    записи не запоминаются и создаются при каждом обращении, поэтому перебор
+    строк не увеличивает занимаемую память
+    """
+
+    def __init__(
+        self,
+        snapshot: EntitySnapshot,
+        record_class: Type[EntityRecord],
+        is_caching_records: bool = True,
+    ):
+        self._snapshot = snapshot
+        self._record_class = record_class
+        self._is_caching_records = is_caching_records
+        self._records: Dict[int, EntityRecord] = {}
+
+    def __len__(self):
+        return self._snapshot.rows_count
+
+    def __getitem__(self, row_index: Union[int, slice]):
+        if isinstance(row_index, slice):
+            return [
+                self[index]
+                for index in range(*row_index.indices(len(self)))
+            ]
+
+        if row_index < 0:
+            row_index += len(self)
+
+        if not 0 <= row_index < len(self):
+            raise IndexError(row_index)
+
+        record = self._records.get(row_index)
+
+        if record is None:
+            record = self._record_class(self._snapshot.get_row(row_index))
+
+            if self._is_caching_records:
+                self._records[row_index] = record
+
+        return record
+
+    def __iter__(self):
+        if self._is_caching_records:
+            for row_index in range(len(self)):
+                yield self[row_index]
+        else:
+            record_class = self._record_class
+
+            for row in self._snapshot.iterate_rows():
+                yield record_class(row)
+
+    @property
+    def touched_rows_count(self) -> int:
+        """
+        Количество строк, для которых были созданы записи
+        """
+        return len(self._records)
+
+    @property
+    def touched_records(self) -> List[EntityRecord]:
+        """
+        Записи строк, к которым были обращения
+        """
+        return list(self._records.values())
+
+
+class SnapshotHashTable:
+    """
+    Хеш-таблица кеша поверх индекса ключей снимка.
+
+    Повторяет интерфейс плоской хеш-таблицы, необходимый для поиска по
+    полному ключу. Значением является номер строки или кортеж номеров строк,
+    если ключ совпадает у нескольких строк. Если переданы записи строк rows,
+    то значением является запись или множество записей.
+    """
+
+    def __init__(
+        self,
+        snapshot: EntitySnapshot,
+        key_items_count: int,
+        rows: Optional[SnapshotRows] = None,
+    ):
+        self._snapshot = snapshot
+        self._is_composite = key_items_count > 1
+        self._rows = rows
+
+    def get(
+        self,
+        key: Any,
+        default: Any = None,
+    ) -> Union[int, Tuple[int, ...], Any]:
+        key_values = key if self._is_composite else (key, )
+        row_indexes = self._snapshot.find_row_indexes(key_values)
+
+        rows = self._rows
+
+        if not row_indexes:
+            item = default
+        elif rows is not None:
+            item = (
+                rows[row_indexes[0]] if
+                len(row_indexes) == 1 else
+                {rows[row_index] for row_index in row_indexes}
+            )
+        elif len(row_indexes) == 1:
+            item = row_indexes[0]
+        else:
+            item = tuple(row_indexes)
+
+        return item
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: Any):
+        item = self.get(key)
+
+        if item is None:
+            raise KeyError(key)
+
+        return item
@@ -0,0 +1,271 @@
+import sys
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Optional,
+)
+
+
+# Наибольшее количество объектов, по которым оценивается средний размер
+# объекта кеша
+MEMORY_SAMPLE_SIZE = 100
+
+# Типы контейнеров, размер которых учитывается при оценке размера
+# хеш-таблиц и индексов
+CONTAINER_TYPES = (dict, set, frozenset, list, tuple)
+
+
+class CacheStatistics:
+    """
+    Статистика кеша.
+
+    Время подготовки кеша делится на время запроса (выполнение запроса и
+    получение строк) и время построения хеш-таблицы и индексов. В потоковом
+    режиме строки получаются пачками в процессе построения, поэтому время
+    запроса учитывается во времени построения.
+
+    Размер занимаемой памяти оценивается приблизительно по выборке объектов
+    кеша при формировании отчета. Если при подготовке кеша велась
+    трассировка выделения памяти (tracemalloc), то дополнительно сохраняется
+    прирост отслеживаемой памяти за время подготовки.
+
+    При интернировании связанных объектов сохраняется количество замененных
+    дубликатов и оценка освобожденной памяти.
+
+    Счетчики увеличиваются без блокировок, чтобы учет обращений не замедлял
+    поиск и не упорядочивал обращения к разным кешам. При одновременных
+    обращениях нескольких потоков к разделяемому кешу счетчики обращений
+    приблизительны.
+    """
+
+    __slots__ = (
+        'query_time',
+        'build_time',
+        'refresh_time',
+        'refresh_count',
+        'rows_count',
+        'memory_size',
+        'traced_memory_size',
+        'get_by_key_count',
+        'get_by_key_hits',
+        'get_many_count',
+        'get_many_hits',
+        'get_many_misses',
+        'filter_count',
+        'filter_hits',
+        'interned_entities_count',
+        'interned_memory_size',
+    )
+
+    def __init__(self):
+        self.query_time = 0.0
+        self.build_time = 0.0
+        self.refresh_time = 0.0
+        self.refresh_count = 0
+        self.rows_count = 0
+        self.memory_size: Optional[int] = None
+        self.traced_memory_size: Optional[int] = None
+        self.get_by_key_count = 0
+        self.get_by_key_hits = 0
+        self.get_many_count = 0
+        self.get_many_hits = 0
+        self.get_many_misses = 0
+        self.filter_count = 0
+        self.filter_hits = 0
+        self.interned_entities_count = 0
+        self.interned_memory_size = 0
+
+    def __repr__(self):
+        return (
+            f'<{self.__class__.__name__} @rows_count="{self.rows_count}" '
+            f'@query_time="{self.query_time:.3f}" '
+            f'@build_time="{self.build_time:.3f}" '
+            f'@hits="{self.hits}" @misses="{self.misses}">'
+        )
+
+    def __str__(self):
+        return self.__repr__()
+
+    def increment(self, **values):
+        """
+        Увеличение счетчиков и времени статистики на указанные значения,
+        например, statistics.increment(filter_count=1)
+        """
+        for attr_name, value in values.items():
+            setattr(self, attr_name, getattr(self, attr_name) + value)
+
+    @property
+    def get_by_key_misses(self) -> int:
+        """
+        Количество обращений get_by_key, не нашедших значения
+        """
+        return self.get_by_key_count - self.get_by_key_hits
+
+    @property
+    def filter_misses(self) -> int:
+        """
+        Количество вызовов filter с пустым результатом
+        """
+        return self.filter_count - self.filter_hits
+
+    @property
+    def hits(self) -> int:
+        """
+        Общее количество успешных поисков в кеше
+        """
+        return self.get_by_key_hits + self.get_many_hits + self.filter_hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Общее количество безуспешных поисков в кеше
+        """
+        return (
+            self.get_by_key_misses +
+            self.get_many_misses +
+            self.filter_misses
+        )
+
+    @property
+    def prepare_time(self) -> float:
+        """
+        Общее время подготовки кеша
+        """
+        return self.query_time + self.build_time
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Представление статистики в виде словаря
+        """
+        return {
+            'rows_count': self.rows_count,
+            'query_time': self.query_time,
+            'build_time': self.build_time,
+            'prepare_time': self.prepare_time,
+            'refresh_count': self.refresh_count,
+            'refresh_time': self.refresh_time,
+            'memory_size': self.memory_size,
+            'traced_memory_size': self.traced_memory_size,
+            'get_by_key_count': self.get_by_key_count,
+            'get_by_key_hits': self.get_by_key_hits,
+            'get_by_key_misses': self.get_by_key_misses,
+            'get_many_count': self.get_many_count,
+            'get_many_hits': self.get_many_hits,
+            'get_many_misses': self.get_many_misses,
+            'filter_count': self.filter_count,
+            'filter_hits': self.filter_hits,
+            'filter_misses': self.filter_misses,
+            'hits': self.hits,
+            'misses': self.misses,
+            'interned_entities_count': self.interned_entities_count,
+            'interned_memory_size': self.interned_memory_size,
+        }
+
+    @classmethod
+    def sum(
+        cls,
+        statistics: Iterable['CacheStatistics'],
+    ) -> 'CacheStatistics':
+        """
+        Суммирование статистики нескольких кешей
+        """
+        result = cls()
+
+        for cache_statistics in statistics:
+            for attr_name in cls.__slots__:
+                value = getattr(cache_statistics, attr_name)
+
+                if value is not None:
+                    total = getattr(result, attr_name)
+                    setattr(
+                        result,
+                        attr_name,
+                        value if total is None else total + value,
+                    )
+
+        return result
+
+
+def estimate_object_size(object_: Any) -> int:
+    """
+    Приблизительная оценка размера объекта в байтах с учетом значений его
+    атрибутов первого уровня. Для объектов моделей учитываются также
+    состояние объекта и закешированные связанные объекты
+    """
+    size = sys.getsizeof(object_)
+    object_dict = getattr(object_, '__dict__', None)
+
+    if object_dict is not None:
+        size += sys.getsizeof(object_dict)
+
+        for name, value in object_dict.items():
+            size += sys.getsizeof(value)
+
+            if name == '_state':
+                size += sys.getsizeof(value.__dict__)
+
+                for related_object in value.__dict__.get('fields_cache', {}).values():  # noqa
+                    if related_object is not None:
+                        size += estimate_object_size(related_object)
+
+    for slot in getattr(type(object_), '__slots__', ()):
+        value = getattr(object_, slot, None)
+
+        if value is not None:
+            size += sys.getsizeof(value)
+
+    return size
+
+
+def estimate_objects_size(objects: Any) -> int:
+    """
+    Приблизительная оценка суммарного размера объектов последовательности
+    по равномерной выборке объектов
+    """
+    objects_count = len(objects)
+    size = 0
+
+    if objects_count:
+        step = max(objects_count // MEMORY_SAMPLE_SIZE, 1)
+        sample = [
+            objects[index]
+            for index in range(0, objects_count, step)
+        ]
+
+        size = (
+            sum(estimate_object_size(object_) for object_ in sample) *
+            objects_count // len(sample)
+        )
+
+    return size
+
+
+def estimate_container_size(container: Any) -> int:
+    """
+    Оценка размера вложенных словарей, множеств, списков и кортежей без
+    учета размера хранящихся в них объектов других типов
+    """
+    size = 0
+    containers = [container]
+
+    while containers:
+        container = containers.pop()
+
+        if container is None:
+            continue
+
+        size += sys.getsizeof(container)
+
+        if isinstance(container, dict):
+            items = container.values()
+        elif isinstance(container, CONTAINER_TYPES):
+            items = container
+        else:
+            items = ()
+
+        for item in items:
+            if isinstance(item, CONTAINER_TYPES):
+                containers.append(item)
+
+    return size
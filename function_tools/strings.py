@@ -12,3 +12,100 @@ DATE_FROM_MORE_OR_EQUAL_DATE_TO_ERROR = (
     'Начальная дата должна быть строго меньше конечной даты'
 )
 
+
+UNIQUE_INDEX_DUPLICATE_VALUE_ERROR = (
+    'Значение {value} повторяется в уникальном индексе кеша по полям {fields}!'
+)
+
+NUMPY_IS_REQUIRED_ERROR = (
+    'Для работы колоночного кеша необходимо установить пакет numpy!'
+)
+
+PREFIX_INDEX_IS_REQUIRED_FOR_NOT_STRICT_MODE_ERROR = (
+    'Для поиска в нестрогом режиме по плоской хеш-таблице необходимо '
+    'построение индекса префиксов ключей (prefix_index=True)!'
+)
+
+CHANGE_MARKER_FIELD_IS_REQUIRED_ERROR = (
+    'Для инкрементального обновления кеша необходимо указать поле-маркер '
+    'изменения строк (change_marker_field)!'
+)
+
+SHARED_CACHE_IS_READ_ONLY_ERROR = (
+    'Разделяемый кеш доступен только для чтения!'
+)
+
+SHARED_CACHE_REGISTRY_BUDGET_ERROR = (
+    'Ограничения реестра разделяемых кешей должны быть положительными!'
+)
+
+SNAPSHOT_IS_CORRUPTED_ERROR = (
+    'Файл снимка кеша {path} поврежден или имеет неподдерживаемый формат!'
+)
+
+SNAPSHOT_UNSAFE_GLOBAL_ERROR = (
+    'Снимок кеша содержит значение недопустимого типа {module}.{name}!'
+)
+
+SNAPSHOT_WRITE_ERROR = (
+    'Не удалось записать снимок кеша {path}, кеш используется без снимка'
+)
+
+SNAPSHOT_CACHE_PARAM_ERROR = (
+    'Кеш со снимком строк поддерживает только {param}={value!r}!'
+)
+
+NOT_STRICT_MODE_IS_NOT_SUPPORTED_ERROR = (
+    'Кеш со строками на диске не поддерживает поиск по части ключа '
+    '(strict_mode=False)!'
+)
+
+DATE_FROM_MORE_THAN_DATE_TO_ERROR = (
+    'Дата начала периода не может быть больше даты окончания периода!'
+)
+
+PERIOD_ENTITY_CACHE_REFRESH_ERROR = (
+    'Кеш периода не обновляется отдельно от кеша периодов!'
+)
+
+CACHES_PREPARATION_ERROR = (
+    'Ошибка подготовки кешей хранилища: {errors}. Не подготовлены из-за '
+    'ошибок в зависимостях: {skipped_caches}'
+)
+
+UNKNOWN_CACHE_DEPENDENCY_ERROR = (
+    'Кеш {name} зависит от отсутствующих в хранилище кешей: {dependencies}!'
+)
+
+CACHE_DEPENDENCIES_CYCLE_ERROR = (
+    'Обнаружена циклическая зависимость кешей хранилища с участием кеша '
+    '{name}!'
+)
+
+MEMORY_BUDGET_LIMIT_ERROR = (
+    'Ограничение бюджета памяти кешей должно быть положительным!'
+)
+
+RANGE_LOOKUP_VALUE_ERROR = (
+    'Значением условия фильтрации {key} должна быть пара границ диапазона!'
+)
+
+RELATED_CACHE_FIELD_ERROR = (
+    'Поле {field_name} модели {model} не является внешним ключом на первичный '
+    'ключ связанной модели и не может разрешаться по кешу!'
+)
+
+UNKNOWN_RELATED_CACHE_ERROR = (
+    'Внешний ключ {field_name} кеша {name} ссылается на отсутствующий в '
+    'хранилище кеш объектов сущности {related_cache}!'
+)
+
+RELATED_CACHE_IS_NOT_BOUND_ERROR = (
+    'Кеш {related_cache} для внешнего ключа {field_name} не найден. Кеш, '
+    'указанный наименованием, должен быть создан в хранилище кешей!'
+)
+
+TRIE_INDEX_IS_REQUIRED_ERROR = (
+    'Для поиска по наибольшему префиксу значения поля {field_name} необходим '
+    'индекс TrieIndex по этому полю!'
+)
@@ -0,0 +1,291 @@
+from array import (
+    array,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Type,
+)
+
+from django.db.models import (
+    Model,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.decorators import (
+    cache_access,
+)
+from function_tools.records import (
+    EntityRecord,
+    prepare_record_column,
+)
+from function_tools.utils import (
+    compile_attrs_getter,
+)
+
+
+class TreeEntityCache(EntityCache):
+    """
+    Кеш объектов сущности с иерархией по ссылке на родителя (например,
+    parent у плана счетов).
+
+    После загрузки объектов по ссылкам на родителей однократно строятся
+    списки дочерних объектов и обход дерева в глубину: для каждого объекта
+    запоминаются родитель, глубина и отрезок позиций его поддерева в порядке
+    обхода. Поддерево и потомки объекта получаются срезом порядка обхода,
+    проверка подчиненности выполняется сравнением отрезков, предки - по
+    ссылкам на родителей, без повторных обращений к кешу и запросов к БД.
+
+    Корнями дерева считаются объекты без родителя и объекты, родитель
+    которых отсутствует в кеше. Циклические ссылки разрываются на первом
+    встреченном объекте цикла, который становится корнем.
+
+    Методы поиска принимают объект кеша или значение первичного ключа.
+    """
+
+    # Структура дерева строится по объектам в памяти
+    supports_spilling = False
+
+    def __init__(
+        self,
+        model: Type[Model],
+        *args,
+        parent_field: str = 'parent',
+        **kwargs,
+    ):
+        self._parent_field = parent_field
+        self._parent_getter = compile_attrs_getter(
+            (prepare_record_column(model, parent_field), ),
+        )
+
+        only_fields = kwargs.get('only_fields')
+        if only_fields and parent_field not in only_fields:
+            kwargs['only_fields'] = (*only_fields, parent_field)
+
+        # Номера строк родителей, глубины, позиции начала и окончания
+        # поддеревьев в порядке обхода и номера строк в порядке обхода
+        self._parents = array('q')
+        self._depths = array('q')
+        self._tree_begins = array('q')
+        self._tree_ends = array('q')
+        self._tree_order = array('q')
+        self._roots: List[int] = []
+        self._children: Dict[int, List[int]] = {}
+
+        super().__init__(model, *args, **kwargs)
+
+    def _prepare_entities_hash_table(self):
+        super()._prepare_entities_hash_table()
+
+        self._prepare_tree()
+
+    def _prepare_tree(self):
+        """
+        Построение списков дочерних объектов и обход дерева в глубину
+        """
+        entities_list = self._entities_list
+        rows_count = len(entities_list)
+        row_indexes_by_pk = self._get_row_indexes_by_pk()
+        parent_getter = self._parent_getter
+
+        roots = []
+        children = {}
+
+        for row_index, entity in enumerate(entities_list):
+            parent_row_index = row_indexes_by_pk.get(parent_getter(entity)[0])
+
+            if parent_row_index is None or parent_row_index == row_index:
+                roots.append(row_index)
+            else:
+                children.setdefault(parent_row_index, []).append(row_index)
+
+        parents = array('q', [-1]) * rows_count
+        depths = array('q', [0]) * rows_count
+        begins = array('q', [-1]) * rows_count
+        ends = array('q', [0]) * rows_count
+        order = array('q')
+
+        def visit(root: int):
+            # Обход без рекурсии: после объекта в стек помещается отметка
+            # окончания его поддерева (номер строки с инверсией битов)
+            stack = [root]
+
+            while stack:
+                row_index = stack.pop()
+
+                if row_index < 0:
+                    ends[~row_index] = len(order)
+
+                    continue
+
+                begins[row_index] = len(order)
+                order.append(row_index)
+                stack.append(~row_index)
+
+                for child in reversed(children.get(row_index, ())):
+                    # Объект цикла, с которого начат обход, уже посещен
+                    if begins[child] < 0:
+                        parents[child] = row_index
+                        depths[child] = depths[row_index] + 1
+                        stack.append(child)
+
+        for root in roots:
+            visit(root)
+
+        if len(order) < rows_count:
+            for row_index in range(rows_count):
+                if begins[row_index] < 0:
+                    roots.append(row_index)
+                    visit(row_index)
+
+        self._parents = parents
+        self._depths = depths
+        self._tree_begins = begins
+        self._tree_ends = ends
+        self._tree_order = order
+        self._roots = roots
+        self._children = children
+
+    def _refresh_entities(self):
+        """
+        Обновление объектов кеша с перестроением дерева. При полном
+        перестроении кеша дерево строится вместе с хеш-таблицей
+        """
+        super()._refresh_entities()
+
+        self._prepare_tree()
+
+    def _get_tree_row_index(self, entity: Any) -> Optional[int]:
+        """
+        Получение номера строки по объекту кеша или первичному ключу
+        """
+        pk = entity.pk if isinstance(entity, (Model, EntityRecord)) else entity
+
+        return self._get_row_indexes_by_pk().get(pk)
+
+    @property
+    @cache_access
+    def roots(self) -> List[Any]:
+        """
+        Корневые объекты дерева
+        """
+        return self._get_entities_by_row_indexes(self._roots)
+
+    @cache_access
+    def parent(self, entity: Any) -> Optional[Any]:
+        """
+        Получение родителя объекта. Для корня возвращается None
+        """
+        row_index = self._get_tree_row_index(entity)
+        parent_row_index = -1 if row_index is None else self._parents[row_index]
+
+        return (
+            self._entities_list[parent_row_index] if
+            parent_row_index >= 0 else
+            None
+        )
+
+    @cache_access
+    def children(self, entity: Any) -> List[Any]:
+        """
+        Получение дочерних объектов
+        """
+        row_index = self._get_tree_row_index(entity)
+
+        return self._get_entities_by_row_indexes(
+            row_index_
+            for row_index_ in self._children.get(row_index, ())
+            if self._parents[row_index_] == row_index
+        )
+
+    @cache_access
+    def ancestors(
+        self,
+        entity: Any,
+        include_self: bool = False,
+    ) -> List[Any]:
+        """
+        Получение предков объекта от родителя до корня
+        """
+        row_index = self._get_tree_row_index(entity)
+        row_indexes = []
+
+        if row_index is not None:
+            if include_self:
+                row_indexes.append(row_index)
+
+            parents = self._parents
+            row_index = parents[row_index]
+
+            while row_index >= 0:
+                row_indexes.append(row_index)
+                row_index = parents[row_index]
+
+        return self._get_entities_by_row_indexes(row_indexes)
+
+    @cache_access
+    def subtree(self, entity: Any) -> List[Any]:
+        """
+        Получение поддерева объекта (объекта и всех его потомков) в порядке
+        обхода в глубину
+        """
+        row_index = self._get_tree_row_index(entity)
+
+        if row_index is None:
+            return []
+
+        return self._get_entities_by_row_indexes(
+            self._tree_order[
+                self._tree_begins[row_index]:self._tree_ends[row_index]
+            ]
+        )
+
+    @cache_access
+    def descendants(self, entity: Any) -> List[Any]:
+        """
+        Получение всех потомков объекта в порядке обхода в глубину
+        """
+        row_index = self._get_tree_row_index(entity)
+
+        if row_index is None:
+            return []
+
+        return self._get_entities_by_row_indexes(
+            self._tree_order[
+                self._tree_begins[row_index] + 1:self._tree_ends[row_index]
+            ]
+        )
+
+    @cache_access
+    def depth(self, entity: Any) -> Optional[int]:
+        """
+        Получение глубины объекта в дереве. Глубина корня равна 0
+        """
+        row_index = self._get_tree_row_index(entity)
+
+        return None if row_index is None else self._depths[row_index]
+
+    @cache_access
+    def is_ancestor(
+        self,
+        ancestor: Any,
+        entity: Any,
+    ) -> bool:
+        """
+        Является ли объект ancestor предком объекта entity
+        """
+        ancestor_row_index = self._get_tree_row_index(ancestor)
+        row_index = self._get_tree_row_index(entity)
+
+        return (
+            ancestor_row_index is not None and
+            row_index is not None and
+            ancestor_row_index != row_index and
+            self._tree_begins[ancestor_row_index] <=
+            self._tree_begins[row_index] <
+            self._tree_ends[ancestor_row_index]
+        )
@@ -1,9 +1,19 @@
 import operator
+from functools import (
+    lru_cache,
+)
+from typing import (
+    Any,
+    Callable,
+    Tuple,
+    Type,
+)
 
 from django.conf import (
     settings,
 )
 from django.core.exceptions import (
+    FieldDoesNotExist,
     ObjectDoesNotExist,
 )
 from django.db.models import (
@@ -14,6 +24,14 @@ from django.utils import (
 )
 
 
+# Исключения, при которых значение атрибута считается пустым
+DEEP_GETATTR_EXCEPTIONS = (
+    AttributeError,
+    ValueError,
+    ObjectDoesNotExist,
+)
+
+
 def deep_getattr(
     obj,
     attr,
@@ -31,16 +49,91 @@ def deep_getattr(
     """
     try:
         value = operator.attrgetter(attr)(obj)
-    except (
-        AttributeError,
-        ValueError,
-        ObjectDoesNotExist,
-    ):
+    except DEEP_GETATTR_EXCEPTIONS:
         value = default
 
     return value
 
 
+@lru_cache(maxsize=None)
+def compile_attrs_getter(
+    attrs: Tuple[str, ...],
+) -> Callable[[Any], Tuple[Any, ...]]:
+    """
+    Получение функции, возвращающей кортеж значений атрибутов объекта.
+
+    Аналог последовательного вызова deep_getattr для каждого атрибута, но
+    значения получаются одним вызовом operator.attrgetter, созданным
+    однократно на весь процесс. Только если получение значения прервалось
+    исключением (например, пустая связь в цепочке атрибутов), значения
+    получаются через deep_getattr со значением по умолчанию None.
+
+    :param attrs: кортеж атрибутов (допускается цепочка через точку)
+    """
+    getter = operator.attrgetter(*attrs)
+
+    if len(attrs) == 1:
+        def get_values(obj):
+            try:
+                values = (getter(obj), )
+            except DEEP_GETATTR_EXCEPTIONS:
+                values = (deep_getattr(obj, attrs[0]), )
+
+            return values
+    else:
+        def get_values(obj):
+            try:
+                values = getter(obj)
+            except DEEP_GETATTR_EXCEPTIONS:
+                values = tuple(deep_getattr(obj, attr) for attr in attrs)
+
+            return values
+
+    return get_values
+
+
+@lru_cache(maxsize=None)
+def prepare_model_attr_path(
+    model: Type[Model],
+    attr: str,
+) -> str:
+    """
+    Замена пути к атрибуту объекта модели на более быстрый эквивалент.
+
+    pk заменяется на наименование колонки первичного ключа, а обращение к
+    первичному ключу связанного объекта (account.pk, account.id) - на колонку
+    внешнего ключа (account_id), что не требует получения связанного объекта.
+    Пути, которые не удалось разобрать, возвращаются без изменений.
+    """
+    *relation_names, attr_name = attr.split('.')
+
+    try:
+        relation_model = model
+        relation_field = None
+
+        for relation_name in relation_names:
+            relation_field = relation_model._meta.get_field(relation_name)
+            relation_model = relation_field.related_model
+
+        if attr_name == 'pk':
+            attr_name = relation_model._meta.pk.attname
+
+        if (
+            relation_field is not None and
+            relation_field.many_to_one and
+            relation_field.concrete and
+            attr_name == relation_field.target_field.attname
+        ):
+            relation_names[-1] = relation_field.attname
+            attr_path = '.'.join(relation_names)
+        else:
+            attr_path = '.'.join((*relation_names, attr_name))
+    except (AttributeError, FieldDoesNotExist):
+        attr_path = attr
+
+    return attr_path
+
+
 def date2str(date, template=None):
     """
     datetime.strftime глючит с годом < 1900
@@ -11,7 +11,7 @@ from setuptools import (
 )
 
 
-__version__ = '0.1.16'
+__version__ = '0.1.17'
 
 here = path.abspath(path.dirname(__file__))
 
@@ -39,6 +39,8 @@ dependency_links = [
 
 excluded_packages = (
     'docs',
+    'tests',
+    'tests.*',
 )
 
 setup(
@@ -62,6 +64,9 @@ setup(
     include_package_data=True,
     author='Alexander Danilenko',
     install_requires=install_requires,
+    extras_require={
+        'numpy': ['numpy>=1.23'],
+    },
     dependency_links=dependency_links,
     author_email='a.danilenko@bars.group',
     url='https://github.com/sandanilenko/function-tools',
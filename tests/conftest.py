@@ -0,0 +1,124 @@
+import datetime
+import os
+import tempfile
+
+import django
+import pytest
+from django.conf import (
+    settings,
+)
+
+
+STATUSES = ('active', 'closed', 'draft')
+
+
+def pytest_configure(config):
+    """
+    Настройка Django с временной базой данных SQLite
+    """
+    db_dir = tempfile.mkdtemp()
+
+    settings.configure(
+        SECRET_KEY='function-tools-tests',
+        INSTALLED_APPS=['tests'],
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(db_dir, 'db.sqlite3'),
+            },
+        },
+        USE_TZ=False,
+    )
+    django.setup()
+
+
+def _populate(Account, Analytic, Supplier):
+    """
+    Заполнение тестовых данных
+    """
+    suppliers = [
+        Supplier.objects.create(code=f'S{index}', name=f'supplier {index}')
+        for index in range(5)
+    ]
+
+    accounts = []
+    for index in range(30):
+        parent = accounts[(index - 1) // 3] if index else None
+        code = f'{parent.code}.{index:02d}' if parent else '101'
+        begin = datetime.date(2020, 1, 1) + datetime.timedelta(days=index * 7)
+
+        accounts.append(
+            Account.objects.create(
+                code=code,
+                name=f'account {index}',
+                parent=parent,
+                begin=begin,
+                end=begin + datetime.timedelta(days=60),
+                updated_at=datetime.datetime(2021, 1, 1),
+            )
+        )
+
+    analytics = []
+    for index in range(600):
+        begin = (
+            datetime.date(2020, 1, 1) +
+            datetime.timedelta(days=index % 100)
+        )
+
+        analytics.append(
+            Analytic(
+                account=accounts[index % len(accounts)],
+                supplier=(
+                    suppliers[index % len(suppliers)] if index % 7 else None
+                ),
+                code=f'C{index % 50}',
+                status=STATUSES[index % len(STATUSES)],
+                amount=index % 97,
+                qty=index % 11,
+                begin=begin,
+                end=begin + datetime.timedelta(days=30),
+            )
+        )
+
+    Analytic.objects.bulk_create(analytics)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    """
+    Создание таблиц тестовых моделей и заполнение данных
+    """
+    from django.db import (
+        connection,
+    )
+
+    from tests.models import (
+        Account,
+        Analytic,
+        Supplier,
+    )
+
+    with connection.schema_editor() as schema_editor:
+        for model in (Supplier, Account, Analytic):
+            schema_editor.create_model(model)
+
+    _populate(Account, Analytic, Supplier)
+
+    yield
+
+    connection.close()
+
+
+@pytest.fixture
+def rollback():
+    """
+    Выполнение теста в транзакции с откатом изменений
+    """
+    from django.db import (
+        transaction,
+    )
+
+    with transaction.atomic():
+        yield
+
+        transaction.set_rollback(True)
@@ -0,0 +1,49 @@
+from django.db import (
+    models,
+)
+
+
+class Supplier(models.Model):
+    """
+    Поставщик
+    """
+
+    code = models.CharField(max_length=20)
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        app_label = 'tests'
+
+
+class Account(models.Model):
+    """
+    Счет с иерархией и периодом действия
+    """
+
+    code = models.CharField(max_length=50)
+    name = models.CharField(max_length=50, null=True)
+    parent = models.ForeignKey('self', null=True, on_delete=models.CASCADE)
+    begin = models.DateField()
+    end = models.DateField()
+    updated_at = models.DateTimeField(null=True)
+
+    class Meta:
+        app_label = 'tests'
+
+
+class Analytic(models.Model):
+    """
+    Аналитика счета
+    """
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    supplier = models.ForeignKey(Supplier, null=True, on_delete=models.CASCADE)
+    code = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, default='active')
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    qty = models.IntegerField(default=0)
+    begin = models.DateField()
+    end = models.DateField()
+
+    class Meta:
+        app_label = 'tests'
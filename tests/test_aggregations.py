@@ -0,0 +1,171 @@
+import datetime
+
+import pytest
+from django.db.models import (
+    Count,
+    Max,
+    Min,
+    Sum,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.enums import (
+    AggregateFunctionEnum,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+AGGREGATIONS = {
+    'total': (AggregateFunctionEnum.SUM, 'amount'),
+    'count': (AggregateFunctionEnum.COUNT, 'pk'),
+    'first_begin': (AggregateFunctionEnum.MIN, 'begin'),
+    'max_qty': (AggregateFunctionEnum.MAX, 'qty'),
+    'accounts': (AggregateFunctionEnum.DISTINCT, 'account_id'),
+}
+FILTER_PARAMS = {'status': 'active', 'qty__gte': 2}
+ORM_AGGREGATIONS = dict(
+    total=Sum('amount'),
+    count=Count('pk'),
+    first_begin=Min('begin'),
+    max_qty=Max('qty'),
+)
+
+
+def _make_columnar_cache():
+    pytest.importorskip('numpy')
+
+    from function_tools.columnar_caches import (
+        ColumnarEntityCache,
+    )
+
+    return ColumnarEntityCache(Analytic)
+
+
+CACHES = {
+    'plain': lambda: EntityCache(Analytic),
+    'records': lambda: EntityCache(Analytic, records_mode=True),
+    'spilled': lambda: EntityCache(Analytic, memory_budget=100),
+    'columnar': _make_columnar_cache,
+}
+
+
+def _normalize(values):
+    """
+    Приведение дат колоночного кеша к датам модели
+    """
+    return {
+        name: (
+            value.date() if
+            isinstance(value, datetime.datetime) else
+            value
+        )
+        for name, value in values.items()
+    }
+
+
+@pytest.fixture(scope='module', params=list(CACHES))
+def cache(request):
+    return CACHES[request.param]()
+
+
+def test_aggregate(cache):
+    """
+    Агрегация объектов кеша совпадает с агрегацией запросом к БД
+    """
+    queryset = Analytic.objects.filter(**FILTER_PARAMS)
+    expected = queryset.aggregate(**ORM_AGGREGATIONS)
+    expected['accounts'] = set(
+        queryset.values_list('account_id', flat=True)
+    )
+
+    result = cache.aggregate(AGGREGATIONS, **FILTER_PARAMS)
+
+    assert _normalize(result) == expected
+    # Результат запоминается для тех же условий после их нормализации
+    assert cache.aggregate(
+        AGGREGATIONS,
+        status__in=['active'],
+        qty__gte=2,
+    ) is result
+
+
+def test_aggregate_without_rows(cache):
+    """
+    Агрегация без подходящих объектов
+    """
+    assert cache.aggregate(
+        {
+            'count': (AggregateFunctionEnum.COUNT, 'pk'),
+            'total': (AggregateFunctionEnum.SUM, 'amount'),
+            'codes': (AggregateFunctionEnum.DISTINCT, 'code'),
+        },
+        status='missing',
+    ) == {'count': 0, 'total': None, 'codes': set()}
+
+
+def test_group_by(cache):
+    """
+    Группировка объектов кеша совпадает с группировкой запросом к БД
+    """
+    expected = {}
+    for values in Analytic.objects.filter(
+        **FILTER_PARAMS,
+    ).values(
+        'account_id',
+    ).annotate(
+        **ORM_AGGREGATIONS,
+    ):
+        account_id = values.pop('account_id')
+        expected[account_id] = dict(values, accounts={account_id})
+
+    result = cache.group_by('account_id', AGGREGATIONS, **FILTER_PARAMS)
+
+    assert {
+        key: _normalize(values) for key, values in result.items()
+    } == expected
+    assert cache.group_by(
+        ('account_id', ),
+        AGGREGATIONS,
+        **FILTER_PARAMS,
+    ) is result
+
+    result = cache.group_by(
+        ('account_id', 'status'),
+        {'count': (AggregateFunctionEnum.COUNT, 'pk')},
+    )
+
+    assert sum(values['count'] for values in result.values()) == (
+        Analytic.objects.count()
+    )
+
+
+@pytest.mark.usefixtures('rollback')
+def test_refresh_invalidates_results():
+    """
+    Запомненные результаты агрегации сбрасываются при обновлении кеша
+    """
+    aggregations = {'count': (AggregateFunctionEnum.COUNT, 'pk')}
+    cache = EntityCache(Analytic, change_marker_field='pk')
+
+    result = cache.aggregate(aggregations)
+    groups = cache.group_by('status', aggregations)
+
+    Analytic.objects.create(
+        account_id=1,
+        code='new',
+        status='active',
+        begin=datetime.date(2020, 1, 1),
+        end=datetime.date(2020, 2, 1),
+    )
+    cache.refresh()
+
+    assert cache.aggregate(aggregations) == {
+        'count': result['count'] + 1,
+    }
+    assert cache.group_by('status', aggregations)['active'] == {
+        'count': groups['active']['count'] + 1,
+    }
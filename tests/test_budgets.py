@@ -0,0 +1,189 @@
+import gc
+from unittest import (
+    mock,
+)
+
+import pytest
+from django.db import (
+    OperationalError,
+)
+
+from function_tools.budgets import (
+    MemoryBudget,
+)
+from function_tools.caches import (
+    CacheStorage,
+    EntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+)
+
+
+def _get_pks(item):
+    if isinstance(item, set):
+        return sorted(entity.pk for entity in item)
+
+    return getattr(item, 'pk', item)
+
+
+def test_spilled_cache_lookups(tmp_path):
+    """
+    Кеш, не уместившийся в бюджете, хранит строки на диске и находит те же
+    объекты, что и кеш в памяти
+    """
+    kwargs = dict(
+        searching_key=('account_id', 'code'),
+        indexes=('status', ),
+        change_marker_field='pk',
+    )
+    reference_cache = EntityCache(Analytic, **kwargs)
+    spilled_cache = EntityCache(
+        Analytic,
+        memory_budget=10_000,
+        spill_dir=str(tmp_path),
+        **kwargs,
+    )
+
+    assert spilled_cache.is_spilled
+    assert not reference_cache.is_spilled
+    # Файл снимка удаляется сразу после открытия
+    assert list(tmp_path.iterdir()) == []
+    assert len(spilled_cache.entities) == len(reference_cache.entities)
+
+    for entity in reference_cache.entities:
+        key = (entity.account_id, entity.code)
+
+        assert _get_pks(spilled_cache.get_by_key(key)) == _get_pks(
+            reference_cache.get_by_key(key)
+        )
+
+    assert spilled_cache.get_by_key((0, 'missing')) is None
+    assert sorted(
+        entity.pk for entity in spilled_cache.filter(status='active')
+    ) == sorted(
+        entity.pk for entity in reference_cache.filter(status='active')
+    )
+
+    spilled_cache.refresh()
+
+    assert spilled_cache.is_spilled
+    assert len(spilled_cache.entities) == len(reference_cache.entities)
+
+
+def test_failed_preparation_releases_reservation():
+    """
+    Резерв памяти освобождается при ошибке построения кеша
+    """
+    budget = MemoryBudget(50_000_000)
+    cache = EntityCache(Analytic, memory_budget=budget, lazy=True)
+
+    with mock.patch.object(
+        EntityCache,
+        '_prepare_entities_hash_table',
+        side_effect=OperationalError('connection lost'),
+    ):
+        with pytest.raises(OperationalError):
+            cache.prepare()
+
+    assert budget.reserved_size == 0
+
+    cache.prepare()
+
+    assert budget.reserved_size > 0
+
+
+def test_close_and_collection_release_reservation():
+    """
+    Резерв памяти освобождается при закрытии и удалении кеша, перестроение
+    кеша не увеличивает резерв
+    """
+    budget = MemoryBudget(50_000_000)
+    cache = EntityCache(
+        Account,
+        memory_budget=budget,
+        change_marker_field='updated_at',
+    )
+    reserved_size = budget.reserved_size
+
+    assert reserved_size > 0
+
+    cache.refresh()
+
+    assert budget.reserved_size == reserved_size
+
+    cache.close()
+
+    assert budget.reserved_size == 0
+
+    cache.get_by_key(1)
+
+    assert budget.reserved_size == reserved_size
+
+    del cache
+    gc.collect()
+
+    assert budget.reserved_size == 0
+
+
+def test_storage_close_releases_reservation():
+    """
+    Закрытие хранилища освобождает резерв памяти его кешей
+    """
+    class Storage(CacheStorage):
+        memory_budget = 50_000_000
+
+        def __init__(self):
+            super().__init__()
+
+            self.accounts = EntityCache(Account)
+            self.analytics = EntityCache(Analytic)
+
+    storage = Storage()
+    budget = storage.accounts._memory_budget
+
+    assert budget.reserved_size > 0
+
+    storage.close()
+
+    assert budget.reserved_size == 0
+
+
+def test_cache_within_budget():
+    """
+    Кеш, уместившийся в бюджете, хранится в памяти
+    """
+    budget = MemoryBudget(10 ** 9)
+    cache = EntityCache(Analytic, memory_budget=budget)
+
+    assert not cache.is_spilled
+    assert budget.reserved_size > 0
+
+
+def test_storage_budget():
+    """
+    Кеши хранилища разделяют бюджет памяти хранилища
+    """
+    class Storage(CacheStorage):
+        memory_budget = 50_000
+
+        def __init__(self):
+            super().__init__()
+
+            self.accounts = EntityCache(Account)
+            self.analytics = EntityCache(Analytic)
+
+    storage = Storage()
+
+    assert not storage.accounts.is_spilled
+    assert storage.analytics.is_spilled
+    assert storage.accounts._memory_budget is storage.analytics._memory_budget
+
+
+def test_invalid_budget():
+    """
+    Бюджет памяти должен быть положительным
+    """
+    with pytest.raises(ValueError):
+        MemoryBudget(0)
@@ -0,0 +1,70 @@
+import pytest
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+def _get_pks(entities):
+    return sorted(entity.pk for entity in entities)
+
+
+@pytest.fixture(scope='module')
+def reference_cache():
+    return EntityCache(Analytic, searching_key='code', indexes=('status', ))
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    (
+        {'chunk_size': 100},
+        {'chunk_size': 100, 'keyset_pagination': True},
+        {'chunk_size': 1000, 'keyset_pagination': True},
+        {'chunk_size': 100, 'keyset_pagination': True, 'records_mode': True},
+    ),
+)
+def test_chunked_build(reference_cache, kwargs):
+    """
+    Кеш, построенный пачками, совпадает с кешем, построенным одним запросом,
+    и не выполняет запросов после построения
+    """
+    cache = EntityCache(
+        Analytic,
+        searching_key='code',
+        indexes=('status', ),
+        **kwargs,
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        assert _get_pks(cache.entities) == _get_pks(reference_cache.entities)
+        assert _get_pks(cache.get_by_key('C7')) == _get_pks(
+            reference_cache.get_by_key('C7')
+        )
+        assert _get_pks(cache.filter(status='draft')) == _get_pks(
+            reference_cache.filter(status='draft')
+        )
+        cache.first()
+
+    assert not queries
+
+
+def test_keyset_pagination_queries():
+    """
+    Постраничная выборка по первичному ключу выполняет запрос на каждую
+    пачку
+    """
+    count = Analytic.objects.count()
+
+    with CaptureQueriesContext(connection) as queries:
+        EntityCache(Analytic, chunk_size=100, keyset_pagination=True)
+
+    assert len(queries) == count // 100 + 1
@@ -0,0 +1,178 @@
+import datetime
+
+import pytest
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    ActualEntityCache,
+    CacheStorage,
+    EntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+)
+
+
+ACTUAL_DATE = datetime.date(2020, 3, 1)
+
+CACHES = dict(
+    active=(
+        EntityCache,
+        (Analytic, ),
+        dict(
+            additional_filter_params={'status': 'active'},
+            searching_key=('account_id', 'code'),
+        ),
+    ),
+    draft=(
+        EntityCache,
+        (Analytic, ),
+        dict(
+            additional_filter_params={
+                'status__in': ['draft'],
+                'account__code__startswith': '101.0',
+            },
+            searching_key='code',
+            indexes=('account_id', ),
+        ),
+    ),
+    all_analytics=(
+        EntityCache,
+        (Analytic, ),
+        dict(only_fields=('code', 'account')),
+    ),
+    cheap=(
+        EntityCache,
+        (Analytic, ),
+        dict(
+            additional_filter_params={'amount__lt': 10},
+            only_fields=('code', 'amount'),
+        ),
+    ),
+    accounts=(
+        EntityCache,
+        (Account, ),
+        dict(searching_key='code'),
+    ),
+    roots=(
+        EntityCache,
+        (Account, ),
+        dict(additional_filter_params={'parent__isnull': True}),
+    ),
+    actual=(
+        ActualEntityCache,
+        (ACTUAL_DATE, Analytic),
+        dict(),
+    ),
+    actual_closed=(
+        ActualEntityCache,
+        (ACTUAL_DATE, Analytic),
+        dict(additional_filter_params={'status': 'closed'}),
+    ),
+)
+
+
+def _make_storage_class(caches, **attrs):
+    """
+    Создание класса хранилища с объединением запросов кешей
+    """
+    def __init__(self):
+        CacheStorage.__init__(self)
+
+        for name, (cache_class, args, kwargs) in caches.items():
+            setattr(self, name, cache_class(*args, **kwargs))
+
+    return type(
+        'Storage',
+        (CacheStorage, ),
+        dict(coalesce_queries=True, __init__=__init__, **attrs),
+    )
+
+
+@pytest.mark.parametrize('concurrent', (False, True))
+def test_coalesced_entities(concurrent):
+    """
+    Объекты кешей, полученные объединенными запросами, совпадают с объектами,
+    полученными отдельными запросами
+    """
+    storage_class = _make_storage_class(CACHES, concurrent=concurrent)
+
+    with CaptureQueriesContext(connection) as queries:
+        storage = storage_class()
+
+    if not concurrent:
+        # Запросы кешей аналитик, актуальных аналитик и счетов
+        assert len(queries) == 3
+
+    for name, (cache_class, args, kwargs) in CACHES.items():
+        cache = getattr(storage, name)
+        reference_cache = cache_class(*args, **kwargs)
+
+        assert sorted(
+            entity.pk for entity in cache.entities
+        ) == sorted(
+            entity.pk for entity in reference_cache.entities
+        ), name
+        assert not any(
+            attr.startswith('_coalesced')
+            for entity in cache.entities
+            for attr in entity.__dict__
+        )
+
+    entity = storage.active.first()
+
+    assert storage.active.get_by_key((entity.account_id, entity.code))
+    assert set(map(id, storage.active.entities)) <= set(
+        map(id, storage.all_analytics.entities)
+    )
+
+
+def test_multi_valued_relation_filter_is_not_coalesced():
+    """
+    Кеш с условием по обратной связи не объединяется с другими кешами,
+    объекты кешей хранилища совпадают с объектами, полученными отдельными
+    запросами
+    """
+    caches = dict(
+        accounts=CACHES['accounts'],
+        with_qty=(
+            EntityCache,
+            (Account, ),
+            dict(additional_filter_params={'analytic__qty': 3}),
+        ),
+    )
+    storage_class = _make_storage_class(caches)
+
+    with CaptureQueriesContext(connection) as queries:
+        storage = storage_class()
+
+    assert len(queries) == 2
+
+    for params, is_coalescable in (
+        ({'analytic__qty': 3}, False),
+        ({'analytic__supplier__code': 'S1'}, False),
+        ({'parent__code__startswith': '101'}, True),
+    ):
+        cache = EntityCache(
+            Account,
+            additional_filter_params=params,
+            lazy=True,
+        )
+
+        assert cache.is_coalescable is is_coalescable, params
+
+    for name, (cache_class, args, kwargs) in caches.items():
+        cache = getattr(storage, name)
+        reference_cache = cache_class(*args, **kwargs)
+
+        assert sorted(
+            entity.pk for entity in cache.entities
+        ) == sorted(
+            entity.pk for entity in reference_cache.entities
+        ), name
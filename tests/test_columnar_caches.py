@@ -0,0 +1,169 @@
+import datetime
+from decimal import (
+    Decimal,
+)
+
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.enums import (
+    AggregateFunctionEnum,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+pytest.importorskip('numpy')
+
+from function_tools.columnar_caches import (  # noqa: E402
+    ColumnarEntityCache,
+)
+
+
+SEARCHING_KEY = ('account_id', 'code')
+
+FILTERS = (
+    {'code': 'C5'},
+    {'code': 'C5', 'status': 'active'},
+    {'account_id': 3, 'status__in': ['active', 'draft']},
+    {'qty': 3},
+    {'pk': 5},
+    {'code': 'missing'},
+    {'supplier_id': None},
+    {'begin': datetime.date(2020, 1, 5)},
+)
+
+
+def _get_pks(item):
+    if isinstance(item, (set, list)):
+        return sorted(entity.pk for entity in item)
+
+    return getattr(item, 'pk', item)
+
+
+@pytest.fixture(scope='module')
+def model_cache():
+    return EntityCache(Analytic, searching_key=SEARCHING_KEY)
+
+
+@pytest.fixture(scope='module')
+def columnar_cache():
+    return ColumnarEntityCache(Analytic, searching_key=SEARCHING_KEY)
+
+
+@pytest.mark.parametrize('filter_params', FILTERS)
+def test_filter(model_cache, columnar_cache, filter_params):
+    """
+    Векторная фильтрация совпадает с фильтрацией объектов модели
+    """
+    assert [
+        entity.pk for entity in columnar_cache.filter(**filter_params)
+    ] == [
+        entity.pk for entity in model_cache.filter(**filter_params)
+    ]
+    assert columnar_cache.count(**filter_params) == len(
+        model_cache.filter(**filter_params)
+    )
+
+
+def test_get_by_key(model_cache, columnar_cache):
+    """
+    Поиск по ключу совпадает с поиском по объектам модели
+    """
+    for entity in model_cache.entities:
+        key = (entity.account_id, entity.code)
+
+        assert _get_pks(columnar_cache.get_by_key(key)) == _get_pks(
+            model_cache.get_by_key(key)
+        )
+
+    assert columnar_cache.get_by_key((0, 'missing')) is None
+    assert columnar_cache.get_by_key(
+        3,
+        strict_mode=False,
+    ).keys() == model_cache.get_by_key(3, strict_mode=False).keys()
+
+
+def test_values_list(model_cache, columnar_cache):
+    """
+    Получение значений полей из колонок
+    """
+    fields = ('pk', 'begin', 'amount', 'supplier_id')
+
+    assert columnar_cache.values_list(fields) == model_cache.values_list(
+        fields
+    )
+    assert columnar_cache.flat_values_list('qty') == (
+        model_cache.flat_values_list('qty')
+    )
+
+
+def test_sum(model_cache, columnar_cache):
+    """
+    Сумма значений колонки совпадает с суммой по объектам модели
+    """
+    assert columnar_cache.sum('amount') == sum(
+        entity.amount for entity in model_cache.entities
+    )
+    assert columnar_cache.sum('qty', status='draft') == sum(
+        entity.qty for entity in model_cache.filter(status='draft')
+    )
+
+
+def test_group_by(model_cache, columnar_cache):
+    """
+    Группировка с агрегацией совпадает с группировкой объектов модели
+    """
+    result = columnar_cache.group_by(
+        'account_id',
+        {
+            'total': (AggregateFunctionEnum.SUM, 'amount'),
+            'count': (AggregateFunctionEnum.COUNT, 'pk'),
+            'max_qty': (AggregateFunctionEnum.MAX, 'qty'),
+        },
+        status='active',
+    )
+
+    expected = {}
+    for entity in model_cache.filter(status='active'):
+        group = expected.setdefault(
+            entity.account_id,
+            {'total': Decimal(0), 'count': 0, 'max_qty': entity.qty},
+        )
+        group['total'] += entity.amount
+        group['count'] += 1
+        group['max_qty'] = max(group['max_qty'], entity.qty)
+
+    assert result == expected
+
+
+def test_empty_cache():
+    """
+    Кеш без строк
+    """
+    cache = ColumnarEntityCache(
+        Analytic,
+        additional_filter_params={'pk': -1},
+    )
+
+    assert cache.count() == 0
+    assert cache.filter(code='C1') == []
+    assert cache.first() is None
+
+
+@pytest.mark.usefixtures('rollback')
+def test_refresh_after_delete():
+    """
+    Колоночный кеш перестраивается, если строки удалены из БД
+    """
+    cache = ColumnarEntityCache(Analytic, change_marker_field='pk')
+    pk = Analytic.objects.order_by('pk').values_list('pk', flat=True)[0]
+
+    Analytic.objects.filter(pk=pk).delete()
+    cache.refresh()
+
+    assert cache.rows_count == Analytic.objects.count()
+    assert cache.filter(pk=pk) == []
@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+from function_tools.caches import (
+    CachesPreparationError,
+    CacheStorage,
+    EntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+    Supplier,
+)
+
+
+class TrackedEntityCache(EntityCache):
+    """
+    Кеш, запоминающий начало и окончание подготовки
+    """
+
+    events = []
+    events_lock = threading.Lock()
+
+    def _prepare(self):
+        with self.events_lock:
+            self.events.append(('start', self._model.__name__))
+
+        time.sleep(0.05)
+        super()._prepare()
+
+        with self.events_lock:
+            self.events.append(('end', self._model.__name__))
+
+
+class FailingEntityCache(EntityCache):
+    """
+    Кеш с ошибкой подготовки
+    """
+
+    def _prepare(self):
+        raise RuntimeError('preparation failed')
+
+
+@pytest.fixture(autouse=True)
+def events():
+    TrackedEntityCache.events = []
+
+    return TrackedEntityCache.events
+
+
+def test_dependencies_are_prepared_first(events):
+    """
+    Кеш готовится после кешей, от которых он зависит, независимые кеши
+    готовятся параллельно
+    """
+    class Storage(CacheStorage):
+        concurrent = True
+        max_workers = 4
+        cache_dependencies = {'analytics': ('accounts', 'suppliers')}
+
+        def __init__(self):
+            super().__init__()
+
+            self.accounts = TrackedEntityCache(Account)
+            self.suppliers = TrackedEntityCache(Supplier)
+            self.analytics = TrackedEntityCache(Analytic)
+
+    storage = Storage()
+
+    assert all(cache.is_prepared for cache in storage.caches.values())
+
+    analytics_start = events.index(('start', 'Analytic'))
+
+    assert events.index(('end', 'Account')) < analytics_start
+    assert events.index(('end', 'Supplier')) < analytics_start
+    # Независимые кеши начинают подготовку до окончания подготовки друг друга
+    assert events.index(('start', 'Supplier')) < events.index(
+        ('end', 'Account')
+    )
+
+
+def test_preparation_error_skips_dependent_caches():
+    """
+    Ошибка подготовки кеша передается через CachesPreparationError, кеши,
+    зависящие от него, не готовятся
+    """
+    class Storage(CacheStorage):
+        concurrent = True
+        cache_dependencies = {
+            'dependent': ('failing', ),
+            'transitive': ('dependent', ),
+        }
+
+        def __init__(self):
+            super().__init__()
+
+            self.failing = FailingEntityCache(Account)
+            self.dependent = EntityCache(Account)
+            self.transitive = EntityCache(Account)
+            self.independent = EntityCache(Supplier)
+
+    with pytest.raises(CachesPreparationError) as error_info:
+        Storage()
+
+    error = error_info.value
+
+    assert list(error.errors) == ['failing']
+    assert isinstance(error.errors['failing'], RuntimeError)
+    assert sorted(error.skipped_caches) == ['dependent', 'transitive']
+    assert 'failing' in str(error)
+
+
+def test_cyclic_dependencies():
+    """
+    Циклические зависимости кешей недопустимы
+    """
+    class Storage(CacheStorage):
+        concurrent = True
+        cache_dependencies = {'first': ('second', ), 'second': ('first', )}
+
+        def __init__(self):
+            super().__init__()
+
+            self.first = EntityCache(Account)
+            self.second = EntityCache(Account)
+
+    with pytest.raises(ValueError):
+        Storage()
+
+
+def test_lazy_concurrent_storage():
+    """
+    Кеши ленивого хранилища готовятся параллельно при вызове prepare
+    """
+    class Storage(CacheStorage):
+        concurrent = True
+        lazy = True
+
+        def __init__(self):
+            super().__init__()
+
+            self.accounts = EntityCache(Account)
+            self.suppliers = EntityCache(Supplier)
+
+    storage = Storage()
+
+    assert not storage.accounts.is_prepared
+
+    storage.prepare()
+
+    assert storage.accounts.is_prepared
+    assert storage.suppliers.is_prepared
@@ -0,0 +1,124 @@
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.enums import (
+    AggregateFunctionEnum,
+)
+from function_tools.interning import (
+    ValuesDictionary,
+)
+from tests.models import (
+    Account,
+    Analytic,
+)
+
+
+def test_values_dictionary():
+    """
+    Коды и общие объекты значений словаря
+    """
+    dictionary = ValuesDictionary()
+    value = ''.join(['act', 'ive'])
+
+    assert dictionary.encode(None) == 0
+    assert dictionary.encode('active') == 1
+    assert dictionary.encode(value) == 1
+    assert dictionary.intern(value) is dictionary.values[1]
+    assert dictionary.get_code('missing') is None
+    assert len(dictionary) == 2
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    (
+        {},
+        {'records_mode': True},
+    ),
+)
+def test_shared_values(kwargs):
+    """
+    Одинаковые значения полей словаря хранятся одним объектом
+    """
+    cache = EntityCache(
+        Analytic,
+        dictionary_fields=('code', 'status'),
+        **kwargs,
+    )
+
+    assert len({id(entity.status) for entity in cache.entities}) == len(
+        {entity.status for entity in cache.entities}
+    )
+    assert len({id(entity.code) for entity in cache.entities}) == len(
+        {entity.code for entity in cache.entities}
+    )
+
+
+def test_deferred_dictionary_field():
+    """
+    Поле словаря, не загружаемое кешем, не загружается при кодировании
+    """
+    cache = EntityCache(
+        Account,
+        dictionary_fields=('name', ),
+        only_fields=('code', ),
+    )
+
+    assert all('name' not in entity.__dict__ for entity in cache.entities)
+
+
+def test_columnar_dictionary_fields():
+    """
+    Колоночный кеш с кодированными полями совпадает с кешем без кодирования
+    """
+    pytest.importorskip('numpy')
+
+    from function_tools.columnar_caches import (
+        ColumnarEntityCache,
+    )
+
+    plain_cache = ColumnarEntityCache(Analytic)
+    cache = ColumnarEntityCache(
+        Analytic,
+        dictionary_fields=('code', 'status'),
+        searching_key=('code', 'status'),
+    )
+    codes = sorted(set(plain_cache.flat_values_list('code')))[:3]
+
+    assert cache._columns['code'].dtype.kind == 'u'
+
+    for filter_params in (
+        {'status': 'active'},
+        {'code__in': codes},
+        {'code__gte': codes[1]},
+        {'code__startswith': 'C1'},
+        {'code__isnull': False},
+        {'status': 'missing'},
+        {'code__range': (codes[0], codes[2]), 'status__in': ['active']},
+    ):
+        assert sorted(
+            entity.pk for entity in cache.filter(**filter_params)
+        ) == sorted(
+            entity.pk for entity in plain_cache.filter(**filter_params)
+        )
+        assert sorted(
+            cache.values_list(('pk', 'code'), **filter_params)
+        ) == sorted(
+            plain_cache.values_list(('pk', 'code'), **filter_params)
+        )
+
+    aggregations = {
+        'count': (AggregateFunctionEnum.COUNT, 'pk'),
+        'codes': (AggregateFunctionEnum.DISTINCT, 'code'),
+        'min_code': (AggregateFunctionEnum.MIN, 'code'),
+    }
+
+    assert cache.group_by(('status', ), aggregations) == plain_cache.group_by(
+        ('status', ),
+        aggregations,
+    )
+
+    entity = cache.first()
+
+    assert cache.get_by_key((entity.code, entity.status)) is not None
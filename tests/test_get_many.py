@@ -0,0 +1,66 @@
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+@pytest.fixture(scope='module')
+def cache():
+    return EntityCache(Analytic, searching_key=('account_id', 'code'))
+
+
+def test_get_many(cache):
+    """
+    Пакетное получение совпадает с получением по одному ключу
+    """
+    keys = [(entity.account_id, entity.code) for entity in cache.entities]
+    keys += [(0, 'missing'), (1, 'missing')]
+
+    assert cache.get_many(keys) == [cache.get_by_key(key) for key in keys]
+
+
+def test_get_many_as_dict(cache):
+    """
+    Получение словаря объектов по ключам со значением по умолчанию и
+    списком отсутствующих ключей
+    """
+    entity = cache.first()
+    key = (entity.account_id, entity.code)
+
+    result, missing_keys = cache.get_many(
+        [key, (0, 'missing')],
+        as_dict=True,
+        with_missing=True,
+        default='default',
+    )
+
+    assert result == {
+        key: cache.get_by_key(key),
+        (0, 'missing'): 'default',
+    }
+    assert missing_keys == [(0, 'missing')]
+
+
+def test_get_many_by_part_of_key(cache):
+    """
+    Пакетное получение по части ключа в нестрогом режиме
+    """
+    keys = [1, 2, 0]
+
+    assert cache.get_many(keys, strict_mode=False) == [
+        cache.get_by_key(key, strict_mode=False) for key in keys
+    ]
+
+    with pytest.raises(ValueError):
+        cache.get_many([1])
+
+
+def test_get_many_without_keys(cache):
+    """
+    Пакетное получение по пустому списку ключей
+    """
+    assert cache.get_many([]) == []
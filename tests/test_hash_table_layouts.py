@@ -0,0 +1,107 @@
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.enums import (
+    HashTableLayoutEnum,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+SEARCHING_KEY = ('account_id', 'supplier_id', 'code')
+
+
+def _normalize(item):
+    if isinstance(item, dict):
+        return {key: _normalize(value) for key, value in item.items()}
+
+    if isinstance(item, set):
+        return frozenset(entity.pk for entity in item)
+
+    return getattr(item, 'pk', item)
+
+
+@pytest.fixture(scope='module')
+def nested_cache():
+    return EntityCache(Analytic, searching_key=SEARCHING_KEY)
+
+
+@pytest.fixture(scope='module')
+def flat_cache():
+    return EntityCache(
+        Analytic,
+        searching_key=SEARCHING_KEY,
+        hash_table_layout=HashTableLayoutEnum.FLAT,
+        prefix_index=True,
+    )
+
+
+@pytest.fixture(scope='module')
+def keys(nested_cache):
+    keys = set()
+
+    for entity in nested_cache.entities:
+        key = (entity.account_id, entity.supplier_id, entity.code)
+        keys |= {key, key[:1], key[:2], (key[0], 0), (key[0], key[1], 'zz')}
+
+    return keys | {(0, ), (1, None), (1, None, 'C1')}
+
+
+def test_get_by_key(nested_cache, flat_cache, keys):
+    """
+    Поиск в плоской хеш-таблице совпадает с поиском во вложенной
+    """
+    for key in keys:
+        if len(key) == len(SEARCHING_KEY):
+            assert _normalize(flat_cache.get_by_key(key)) == _normalize(
+                nested_cache.get_by_key(key)
+            )
+
+        assert _normalize(
+            flat_cache.get_by_key(key, strict_mode=False)
+        ) == _normalize(
+            nested_cache.get_by_key(key, strict_mode=False)
+        )
+
+
+def test_get_many(nested_cache, flat_cache, keys):
+    """
+    Пакетное получение из плоской хеш-таблицы
+    """
+    full_keys = [key for key in keys if len(key) == len(SEARCHING_KEY)]
+
+    assert [
+        _normalize(item) for item in flat_cache.get_many(full_keys)
+    ] == [
+        _normalize(item) for item in nested_cache.get_many(full_keys)
+    ]
+
+
+def test_part_of_key_without_prefix_index():
+    """
+    Поиск по части ключа без индекса префиксов недоступен
+    """
+    cache = EntityCache(
+        Analytic,
+        searching_key=SEARCHING_KEY,
+        hash_table_layout=HashTableLayoutEnum.FLAT,
+    )
+
+    with pytest.raises(ValueError):
+        cache.get_by_key(1, strict_mode=False)
+
+
+def test_single_field_key():
+    """
+    Плоская хеш-таблица с ключом из одного поля
+    """
+    cache = EntityCache(
+        Analytic,
+        hash_table_layout=HashTableLayoutEnum.FLAT,
+    )
+
+    assert cache.get_by_key(5).pk == 5
+    assert [entity.pk for entity in cache.get_many([5, 6])] == [5, 6]
@@ -0,0 +1,88 @@
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.indexes import (
+    HashIndex,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+INDEXES = (
+    'status',
+    'code',
+    ('account_id', 'status'),
+    HashIndex('pk', unique=True),
+)
+
+FILTERS = (
+    {'status': 'active'},
+    {'status__in': ['active', 'draft']},
+    {'code': 'C5', 'status': 'active'},
+    {'account_id': 3, 'status': 'closed'},
+    {'account_id': 3, 'status': 'closed', 'code__in': ['C1', 'C7', 'C45']},
+    {'pk': 5},
+    {'qty': 3},
+    {'status': 'missing'},
+)
+
+
+def _get_pks(entities):
+    return sorted(entity.pk for entity in entities)
+
+
+@pytest.mark.parametrize('filter_params', FILTERS)
+def test_filter_by_indexes(filter_params):
+    """
+    Фильтрация по индексам совпадает с фильтрацией запросом к БД
+    """
+    cache = EntityCache(Analytic, indexes=INDEXES)
+
+    assert _get_pks(cache.filter(**filter_params)) == _get_pks(
+        Analytic.objects.filter(**filter_params)
+    )
+
+
+@pytest.mark.parametrize('filter_params', FILTERS)
+def test_filter_without_indexes(filter_params):
+    """
+    Фильтрация без индексов совпадает с фильтрацией запросом к БД
+    """
+    cache = EntityCache(Analytic)
+
+    assert _get_pks(cache.filter(**filter_params)) == _get_pks(
+        Analytic.objects.filter(**filter_params)
+    )
+
+
+def test_filter_keeps_cache_order():
+    """
+    Отфильтрованные по индексу объекты идут в порядке кеша
+    """
+    cache = EntityCache(Analytic, indexes=('status', ))
+    plain_cache = EntityCache(Analytic)
+
+    assert [entity.pk for entity in cache.filter(status='draft')] == [
+        entity.pk for entity in plain_cache.filter(status='draft')
+    ]
+
+
+def test_filter_only_first():
+    """
+    Получение первого отфильтрованного по индексу объекта
+    """
+    cache = EntityCache(Analytic, indexes=('code', ))
+
+    assert cache.filter(code='C5', only_first=True).code == 'C5'
+    assert cache.filter(code='missing', only_first=True) is None
+
+
+def test_unique_index_with_duplicates():
+    """
+    Уникальный индекс по повторяющимся значениям не строится
+    """
+    with pytest.raises(ValueError):
+        EntityCache(Analytic, indexes=(HashIndex('code', unique=True), ))
@@ -0,0 +1,66 @@
+import pytest
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+SELECT_RELATED_FIELDS = ('account__parent', 'supplier')
+
+
+@pytest.mark.parametrize('kwargs', ({}, {'chunk_size': 70}))
+def test_intern_related_entities(kwargs):
+    """
+    Связанные объекты с одинаковым первичным ключом заменяются одним
+    объектом
+    """
+    cache = EntityCache(
+        Analytic,
+        select_related_fields=SELECT_RELATED_FIELDS,
+        intern_related_entities=True,
+        **kwargs,
+    )
+    plain_cache = EntityCache(
+        Analytic,
+        select_related_fields=SELECT_RELATED_FIELDS,
+        **kwargs,
+    )
+
+    assert len({id(entity.account) for entity in cache.entities}) == len(
+        {entity.account_id for entity in cache.entities}
+    )
+    assert len({id(entity.account) for entity in plain_cache.entities}) == (
+        len(plain_cache.entities)
+    )
+
+    statistics = cache.statistics
+
+    assert statistics.interned_entities_count > 0
+    assert statistics.interned_memory_size > 0
+
+    with CaptureQueriesContext(connection) as queries:
+        for entity, plain_entity in zip(
+            sorted(cache.entities, key=lambda entity: entity.pk),
+            sorted(plain_cache.entities, key=lambda entity: entity.pk),
+        ):
+            assert entity.account.code == plain_entity.account.code
+            assert entity.account.parent_id == plain_entity.account.parent_id
+
+            if entity.account.parent_id is not None:
+                assert entity.account.parent.code == (
+                    plain_entity.account.parent.code
+                )
+
+            if entity.supplier_id is not None:
+                assert entity.supplier.code == plain_entity.supplier.code
+
+    assert not queries
@@ -0,0 +1,242 @@
+import pytest
+from django.db import (
+    connection,
+)
+from django.db.models import (
+    Q,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.indexes import (
+    SortedIndex,
+    TrieIndex,
+)
+from function_tools.key_only_caches import (
+    KeyOnlyEntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+)
+
+
+SEARCHING_KEY = ('account_id', 'code')
+
+
+def _get_pks(entities):
+    if hasattr(entities, 'pk'):
+        return entities.pk
+
+    return sorted(entity.pk for entity in entities)
+
+
+@pytest.fixture(scope='module')
+def full_cache():
+    return EntityCache(Analytic, searching_key=SEARCHING_KEY)
+
+
+@pytest.fixture(
+    params=(
+        {},
+        {'records_mode': True},
+        {'chunk_size': 7},
+        {'hash_table_layout': 'flat', 'prefix_index': True},
+    ),
+    ids=('models', 'records', 'chunks', 'flat'),
+)
+def cache(request):
+    """
+    Кеш ключей аналитик
+    """
+    return KeyOnlyEntityCache(
+        Analytic,
+        searching_key=SEARCHING_KEY,
+        hydration_batch_size=10,
+        indexes=(SortedIndex('qty'), ),
+        **request.param,
+    )
+
+
+def test_get_by_key(cache, full_cache):
+    """
+    Поиск по ключу загружает пачку строк одним запросом
+    """
+    assert cache.hydrated_rows_count == 0
+    assert len(cache.entities) == Analytic.objects.count()
+
+    entity = next(iter(full_cache.entities))
+    key = (entity.account_id, entity.code)
+
+    with CaptureQueriesContext(connection) as queries:
+        result = cache.get_by_key(key)
+        cache.get_by_key(key)
+
+    assert len(queries) == 1
+    assert _get_pks(result) == _get_pks(full_cache.get_by_key(key))
+    assert 1 <= cache.hydrated_rows_count <= 15
+    assert set(
+        cache.get_by_key((entity.account_id, ), strict_mode=False)
+    ) == set(
+        full_cache.get_by_key((entity.account_id, ), strict_mode=False)
+    )
+    assert cache.get_by_pks([entity.pk])[entity.pk].pk == entity.pk
+
+
+def test_get_many(cache, full_cache):
+    """
+    Получение нескольких объектов загружает строки пачками
+    """
+    keys = [
+        (entity.account_id, entity.code)
+        for entity in list(full_cache.entities)[::7]
+    ]
+
+    with CaptureQueriesContext(connection) as queries:
+        entities = cache.get_many([*keys, (0, 'nope')], default='D')
+
+    assert entities[-1] == 'D'
+    assert [_get_pks(entity) for entity in entities[:-1]] == [
+        _get_pks(entity) for entity in full_cache.get_many(keys)
+    ]
+    rows_count = sum(
+        len(entity) if isinstance(entity, set) else 1
+        for entity in entities[:-1]
+    )
+
+    assert len(queries) <= -(-rows_count // 10)
+
+
+def test_filter(cache, full_cache):
+    """
+    Фильтрация совпадает с фильтрацией полного кеша
+    """
+    for params in (
+        {'qty__gte': 3, 'status': 'active'},
+        {'status': 'active'},
+    ):
+        assert _get_pks(cache.filter(**params)) == _get_pks(
+            full_cache.filter(**params)
+        )
+
+
+def test_refresh(cache):
+    """
+    Обновление кеша сбрасывает загруженные строки
+    """
+    entity = Analytic.objects.first()
+
+    cache.get_by_key((entity.account_id, entity.code))
+    cache.refresh()
+
+    assert cache.hydrated_rows_count == 0
+
+
+def test_related_cache():
+    """
+    Связанные объекты присоединяются к пачкам загружаемых строк
+    """
+    batch_size = 20
+    cache = KeyOnlyEntityCache(
+        Analytic,
+        related_caches={'account': EntityCache(Account)},
+        hydration_batch_size=batch_size,
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        for entity in cache.entities:
+            assert entity.account.code
+
+    assert len(queries) == -(-Analytic.objects.count() // batch_size)
+
+
+@pytest.fixture(params=(False, True), ids=('models', 'records'))
+def pk_cache(request):
+    """
+    Кеш ключей аналитик
+    """
+    return KeyOnlyEntityCache(
+        Analytic,
+        indexes=('account_id', TrieIndex('code')),
+        hydration_batch_size=10,
+        records_mode=request.param,
+    )
+
+
+@pytest.mark.usefixtures('rollback')
+def test_deleted_rows_are_skipped(pk_cache):
+    """
+    Строки, удаленные после загрузки ключей, не попадают в результаты
+    """
+    account_id = Analytic.objects.order_by('pk').first().account_id
+    deleted = list(
+        Analytic.objects.filter(account_id=account_id).order_by('pk')[:2]
+    )
+
+    for entity in deleted:
+        entity.delete()
+
+    entities = pk_cache.filter(account_id=account_id)
+
+    assert None not in entities
+    assert _get_pks(entities) == _get_pks(
+        Analytic.objects.filter(account_id=account_id)
+    )
+    assert pk_cache.get_by_key(deleted[0].pk) is None
+
+    code = deleted[0].code
+    entities = pk_cache.filter(account_id=account_id, code=code)
+
+    assert None not in entities
+    assert all(entity.code == code for entity in entities)
+    assert pk_cache.first() is not None
+
+
+@pytest.mark.usefixtures('rollback')
+def test_unindexed_filter_queries_database(pk_cache):
+    """
+    Фильтрация по полям без индексов выполняется одним запросом к БД без
+    загрузки всех строк
+    """
+    with CaptureQueriesContext(connection) as queries:
+        entities = pk_cache.filter(status='active', qty__gte=5)
+
+    assert len(queries) == 1
+    assert _get_pks(entities) == _get_pks(
+        Analytic.objects.filter(status='active', qty__gte=5)
+    )
+    assert pk_cache.hydrated_rows_count < Analytic.objects.count()
+
+
+@pytest.mark.usefixtures('rollback')
+def test_unindexed_filter_skips_rows_added_after_preparation(pk_cache):
+    """
+    Фильтрация запросом к БД не возвращает строки, ключи которых не были
+    загружены при подготовке кеша
+    """
+    entity = Analytic.objects.first()
+    entity.pk = None
+    entity.status = 'added'
+    entity.save()
+
+    assert pk_cache.filter(status='added') == []
+
+
+@pytest.mark.usefixtures('rollback')
+def test_unindexed_filter_with_empty_value(pk_cache):
+    """
+    Пустое значение в условии __in отбирает строки с пустым полем
+    """
+    supplier_id = Analytic.objects.exclude(supplier=None).first().supplier_id
+
+    assert _get_pks(
+        pk_cache.filter(supplier_id__in=[None, supplier_id])
+    ) == _get_pks(
+        Analytic.objects.filter(
+            Q(supplier_id=None) | Q(supplier_id=supplier_id)
+        )
+    )
@@ -0,0 +1,94 @@
+import datetime
+
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    CacheStorage,
+    EntityCache,
+    PeriodicalEntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+    Supplier,
+)
+
+
+class LazyStorage(CacheStorage):
+    """
+    Ленивое хранилище кешей
+    """
+
+    lazy = True
+
+    def __init__(self):
+        super().__init__()
+
+        self.accounts = EntityCache(Account)
+        self.analytics = EntityCache(Analytic, searching_key='code')
+        self.suppliers = EntityCache(Supplier, lazy=False)
+        self.periodical = PeriodicalEntityCache(
+            datetime.date(2020, 2, 1),
+            datetime.date(2020, 3, 1),
+            Account,
+        )
+
+
+def test_lazy_cache_is_prepared_on_first_access():
+    """
+    Ленивый кеш строится при первом обращении
+    """
+    with CaptureQueriesContext(connection) as queries:
+        cache = EntityCache(Analytic, lazy=True)
+
+    assert not queries
+    assert cache.is_lazy
+    assert not cache.is_prepared
+
+    assert cache.get_by_key(1).pk == 1
+    assert cache.is_prepared
+
+
+def test_lazy_storage():
+    """
+    Кеши ленивого хранилища строятся при обращении, хранилище учитывает
+    кеши, к которым не было обращений
+    """
+    with CaptureQueriesContext(connection) as queries:
+        storage = LazyStorage()
+
+    assert len(queries) == 1
+    assert storage.suppliers.is_prepared
+    assert not storage.accounts.is_prepared
+
+    assert len(storage.accounts.entities) == Account.objects.count()
+    assert storage.analytics.get_by_key('C1')
+
+    assert storage.untouched_caches == ['suppliers', 'periodical']
+    assert storage.is_touched
+
+    storage.prepare()
+
+    assert storage.accounts.is_prepared
+    assert storage.analytics.is_prepared
+
+
+def test_eager_storage():
+    """
+    Кеши неленивого хранилища строятся сразу
+    """
+    class Storage(CacheStorage):
+        def __init__(self):
+            super().__init__()
+
+            self.accounts = EntityCache(Account)
+
+    storage = Storage()
+
+    assert storage.accounts.is_prepared
+    assert not storage.accounts.is_lazy
@@ -0,0 +1,104 @@
+import datetime
+from decimal import (
+    Decimal,
+)
+
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.indexes import (
+    SortedIndex,
+)
+from function_tools.lookups import (
+    split_lookup,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+FILTERS = (
+    {'amount__gte': Decimal('50')},
+    {'amount__gt': Decimal('50'), 'amount__lt': Decimal('70')},
+    {'amount__range': (Decimal('10'), Decimal('20'))},
+    {'qty__lte': 5, 'status': 'active'},
+    {'qty__lt': 3, 'status__in': ['active', 'draft']},
+    {'qty__in': [3, 4], 'qty__gt': 3},
+    {'code__startswith': 'C1'},
+    {'code__startswith': 'C12', 'qty__gte': 2},
+    {'code__startswith': ''},
+    {'supplier_id__isnull': True},
+    {'supplier_id__isnull': False, 'begin__gte': datetime.date(2020, 3, 1)},
+    {'begin__range': (datetime.date(2020, 1, 1), datetime.date(2020, 2, 15))},
+    {'end__lt': datetime.date(2020, 3, 1)},
+    {'status': 'active', 'status__in': ['active', 'closed']},
+)
+
+
+def _make_columnar_cache():
+    pytest.importorskip('numpy')
+
+    from function_tools.columnar_caches import (
+        ColumnarEntityCache,
+    )
+
+    return ColumnarEntityCache(Analytic)
+
+
+CACHES = {
+    'plain': lambda: EntityCache(Analytic),
+    'sorted': lambda: EntityCache(
+        Analytic,
+        indexes=(
+            SortedIndex('amount'),
+            SortedIndex('qty'),
+            SortedIndex('code'),
+            SortedIndex('begin'),
+            SortedIndex('end'),
+            'status',
+        ),
+    ),
+    'records': lambda: EntityCache(
+        Analytic,
+        records_mode=True,
+        indexes=(SortedIndex('end'), SortedIndex('code')),
+    ),
+    'spilled': lambda: EntityCache(
+        Analytic,
+        memory_budget=1000,
+        indexes=(SortedIndex('qty'), ),
+    ),
+    'columnar': _make_columnar_cache,
+}
+
+
+@pytest.fixture(scope='module', params=list(CACHES))
+def cache(request):
+    return CACHES[request.param]()
+
+
+@pytest.mark.parametrize('filter_params', FILTERS)
+def test_filter(cache, filter_params):
+    """
+    Фильтрация с условиями сравнения совпадает с фильтрацией запросом к БД
+    """
+    assert sorted(
+        entity.pk for entity in cache.filter(**filter_params)
+    ) == sorted(
+        Analytic.objects.filter(**filter_params).values_list('pk', flat=True)
+    )
+
+
+def test_split_lookup():
+    """
+    Разделение условия на наименование поля и вид условия
+    """
+    assert split_lookup('code') == ('code', 'exact')
+    assert split_lookup('code__in') == ('code', 'in')
+    assert split_lookup('account__code__startswith') == (
+        'account__code',
+        'startswith',
+    )
+    assert split_lookup('domain__inn') == ('domain__inn', 'exact')
@@ -0,0 +1,166 @@
+import datetime
+import threading
+import time
+from unittest import (
+    mock,
+)
+
+import pytest
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    ActualEntityCache,
+    CacheStorage,
+)
+from function_tools.period_caches import (
+    MultiPeriodEntityCache,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+DATES = [datetime.date(2020, month, 1) for month in range(1, 7)]
+PERIOD = (datetime.date(2020, 3, 1), datetime.date(2020, 3, 31))
+SEARCHING_KEY = ('account_id', 'code')
+FILTER_PARAMS = {'status': 'active'}
+
+
+def _get_pks(item):
+    if isinstance(item, set):
+        return sorted(entity.pk for entity in item)
+
+    return getattr(item, 'pk', item)
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    (
+        {},
+        {'records_mode': True, 'indexes': ('code', )},
+        {'only_fields': ('code', 'account')},
+    ),
+)
+def test_multi_period_cache(kwargs):
+    """
+    Кеши периодов, полученные одним запросом, совпадают с кешами актуальных
+    на дату объектов
+    """
+    with CaptureQueriesContext(connection) as queries:
+        cache = MultiPeriodEntityCache(
+            periods=DATES + [PERIOD],
+            model=Analytic,
+            searching_key=SEARCHING_KEY,
+            additional_filter_params=FILTER_PARAMS,
+            **kwargs,
+        )
+
+    assert len(queries) == 1
+
+    for date in DATES:
+        reference_cache = ActualEntityCache(
+            date,
+            Analytic,
+            searching_key=SEARCHING_KEY,
+            additional_filter_params=FILTER_PARAMS,
+        )
+
+        assert sorted(entity.pk for entity in cache[date].entities) == sorted(
+            entity.pk for entity in reference_cache.entities
+        )
+
+        for entity in reference_cache.entities:
+            key = (entity.account_id, entity.code)
+
+            assert _get_pks(cache[date].get_by_key(key)) == _get_pks(
+                reference_cache.get_by_key(key)
+            )
+
+    shared_entities = set(map(id, cache[PERIOD].entities))
+
+    assert set(map(id, cache[PERIOD[0]].entities)) <= shared_entities
+
+
+def test_period_cache_is_read_only():
+    """
+    Кеш периода не обновляется отдельно от кеша нескольких периодов
+    """
+    cache = MultiPeriodEntityCache(periods=DATES[:1], model=Analytic)
+
+    with pytest.raises(ValueError):
+        cache[DATES[0]].refresh()
+
+
+def test_lazy_multi_period_cache():
+    """
+    Ленивый кеш нескольких периодов загружается при обращении к периоду
+    """
+    class Storage(CacheStorage):
+        lazy = True
+
+        def __init__(self):
+            super().__init__()
+
+            self.periods = MultiPeriodEntityCache(
+                periods=DATES,
+                model=Analytic,
+            )
+
+    with CaptureQueriesContext(connection) as queries:
+        storage = Storage()
+
+    assert not queries
+
+    storage.periods[DATES[0]].entities
+
+    assert storage.untouched_caches == []
+
+
+def test_concurrent_lazy_period_access():
+    """
+    Одновременное первое обращение к кешам периодов из нескольких потоков
+    загружает объекты периодов один раз
+    """
+    cache = MultiPeriodEntityCache(periods=DATES, model=Analytic, lazy=True)
+    prepare_entities = MultiPeriodEntityCache._prepare_entities
+    calls = []
+    results = {}
+
+    def counting_prepare_entities(self):
+        calls.append(self)
+        time.sleep(0.05)
+        prepare_entities(self)
+
+    def read(period_date):
+        results[period_date] = _get_pks(set(cache[period_date].entities))
+
+    with mock.patch.object(
+        MultiPeriodEntityCache,
+        '_prepare_entities',
+        counting_prepare_entities,
+    ):
+        threads = [
+            threading.Thread(target=read, args=(period_date, ))
+            for period_date in DATES
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+    assert len(calls) == 1
+
+    for period_date in DATES:
+        assert results[period_date] == sorted(
+            Analytic.objects.filter(
+                begin__lte=period_date,
+                end__gte=period_date,
+            ).values_list('pk', flat=True)
+        )
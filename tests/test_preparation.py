@@ -0,0 +1,134 @@
+import threading
+import time
+from unittest import (
+    mock,
+)
+
+import pytest
+from django.db import (
+    OperationalError,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+def test_failed_preparation_is_retried():
+    """
+    После ошибки построения кеш не считается подготовленным и строится
+    повторно при следующем обращении
+    """
+    cache = EntityCache(Analytic, lazy=True, indexes=('code', ))
+    prepare_entities = EntityCache._prepare_entities
+    calls = []
+
+    def failing_prepare_entities(self):
+        calls.append(self)
+
+        if len(calls) == 1:
+            raise OperationalError('connection lost')
+
+        return prepare_entities(self)
+
+    with mock.patch.object(
+        EntityCache,
+        '_prepare_entities',
+        failing_prepare_entities,
+    ):
+        with pytest.raises(OperationalError):
+            cache.get_by_key(1)
+
+        assert not cache.is_prepared
+
+        assert cache.get_by_key(1).pk == 1
+        assert cache.is_prepared
+
+    assert len(calls) == 2
+    assert len(cache.filter(code='C1')) == (
+        Analytic.objects.filter(code='C1').count()
+    )
+
+
+def test_concurrent_first_access_prepares_once():
+    """
+    Одновременное первое обращение из нескольких потоков строит кеш один раз
+    """
+    cache = EntityCache(Analytic, lazy=True)
+    prepare = EntityCache._prepare
+    builds = []
+    results = []
+
+    def slow_prepare(self):
+        builds.append(self)
+        time.sleep(0.1)
+        prepare(self)
+
+    with mock.patch.object(EntityCache, '_prepare', slow_prepare):
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_by_key(1)),
+            )
+            for _ in range(5)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+    assert len(builds) == 1
+    assert [entity.pk for entity in results] == [1] * len(threads)
+
+
+def test_close_releases_prepared_data():
+    """
+    Закрытый кеш строится заново при следующем обращении
+    """
+    cache = EntityCache(Analytic)
+
+    cache.close()
+
+    assert not cache.is_prepared
+    assert cache.get_by_key(1).pk == 1
+    assert cache.is_prepared
+
+
+def test_prepared_cache_access_skips_preparation():
+    """
+    Обращения к подготовленному кешу не отмечают обращение повторно, не
+    вызывают подготовку и не берут блокировку кеша
+    """
+    cache = EntityCache(Analytic, indexes=('code', ))
+
+    cache.get_by_key(1)
+    cache._lock = mock.MagicMock()
+
+    with mock.patch.object(EntityCache, '_touch') as touch:
+        with mock.patch.object(EntityCache, 'prepare') as prepare:
+            assert cache.get_by_key(1).pk == 1
+            assert cache.get_many([1, 2])[1].pk == 2
+            assert cache.filter(code='C1')
+            assert cache.first() is not None
+
+    assert not touch.called
+    assert not prepare.called
+    assert not cache._lock.__enter__.called
+
+
+def test_first_access_is_touched():
+    """
+    Первое обращение к подготовленному кешу отмечается
+    """
+    cache = EntityCache(Analytic)
+
+    assert cache.is_prepared
+    assert not cache.is_touched
+
+    cache.get_many([1])
+
+    assert cache.is_touched
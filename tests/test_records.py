@@ -0,0 +1,214 @@
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+    Supplier,
+)
+
+
+KWARGS = dict(
+    searching_key=('account_id', 'supplier.code'),
+    select_related_fields=('supplier', ),
+    indexes=('code', ),
+)
+
+
+def _get_pks(item):
+    if isinstance(item, (set, list)):
+        return sorted(entity.pk for entity in item)
+
+    return getattr(item, 'pk', item)
+
+
+@pytest.fixture(scope='module')
+def model_cache():
+    return EntityCache(Analytic, **KWARGS)
+
+
+@pytest.fixture(scope='module')
+def records_cache():
+    return EntityCache(Analytic, records_mode=True, **KWARGS)
+
+
+def test_get_by_key(model_cache, records_cache):
+    """
+    Поиск по ключу в режиме записей совпадает с поиском по объектам модели
+    """
+    for entity in model_cache.entities:
+        key = (
+            entity.account_id,
+            entity.supplier.code if entity.supplier else None,
+        )
+
+        assert _get_pks(records_cache.get_by_key(key)) == _get_pks(
+            model_cache.get_by_key(key)
+        )
+
+    account_id = model_cache.first().account_id
+    model_items = model_cache.get_by_key(account_id, strict_mode=False)
+    records_items = records_cache.get_by_key(account_id, strict_mode=False)
+
+    assert {
+        key: _get_pks(items) for key, items in records_items.items()
+    } == {
+        key: _get_pks(items) for key, items in model_items.items()
+    }
+
+
+@pytest.mark.parametrize(
+    'filter_params',
+    (
+        {'code': 'C3', 'status': 'active'},
+        {'code__in': ['C1', 'C2']},
+        {'qty': 3},
+    ),
+)
+def test_filter(model_cache, records_cache, filter_params):
+    """
+    Фильтрация в режиме записей совпадает с фильтрацией объектов модели
+    """
+    assert _get_pks(records_cache.filter(**filter_params)) == _get_pks(
+        model_cache.filter(**filter_params)
+    )
+
+
+def test_values_list(model_cache, records_cache):
+    """
+    Получение значений полей в режиме записей
+    """
+    fields = ('pk', 'code', 'amount', 'account_id')
+
+    assert records_cache.values_list(fields) == model_cache.values_list(
+        fields
+    )
+    assert records_cache.flat_values_list('qty') == (
+        model_cache.flat_values_list('qty')
+    )
+
+
+def _prepare_relation_filters():
+    accounts = list(Account.objects.order_by('pk')[:2])
+    supplier = Supplier.objects.order_by('pk').first()
+    account_record = EntityCache(Account, records_mode=True).get_by_key(
+        accounts[0].pk,
+    )
+
+    return (
+        {'account': accounts[0]},
+        {'account': accounts[0].pk},
+        {'account': account_record},
+        {'account_id': accounts[0].pk},
+        {'account__in': accounts},
+        {'account__in': [accounts[0], accounts[1].pk]},
+        {'account': accounts[0], 'account_id__in': [accounts[0].pk]},
+        {'account__gte': accounts[1]},
+        {'supplier': supplier, 'status': 'active'},
+        {'supplier': None},
+        {'supplier__isnull': True},
+    )
+
+
+def test_relation_filter(model_cache, records_cache):
+    """
+    Фильтрация по внешнему ключу одинакова в режиме записей и в режиме
+    объектов модели и совпадает с фильтрацией запросом к БД
+    """
+    for filter_params in _prepare_relation_filters():
+        orm_params = {
+            key: value.to_model() if hasattr(value, 'to_model') else value
+            for key, value in filter_params.items()
+        }
+        expected = _get_pks(list(Analytic.objects.filter(**orm_params)))
+
+        assert expected, filter_params
+        assert _get_pks(model_cache.filter(**filter_params)) == expected
+        assert _get_pks(records_cache.filter(**filter_params)) == expected
+
+
+def test_relation_values_list(model_cache, records_cache):
+    """
+    Значениями внешних ключей в режиме записей, как и в режиме объектов
+    модели, являются объекты связанной модели
+    """
+    accounts = records_cache.values_list(('account', ))
+
+    assert accounts == model_cache.values_list(('account', ))
+    assert all(isinstance(account, Account) for account in accounts)
+
+    fields = ('code', 'supplier', 'account')
+
+    assert records_cache.values_list(fields) == model_cache.values_list(
+        fields
+    )
+    assert records_cache.flat_values_list('supplier') == (
+        model_cache.flat_values_list('supplier')
+    )
+
+
+def test_relation_values_list_from_related_cache():
+    """
+    Связанные объекты записей берутся из связанного кеша
+    """
+    accounts = EntityCache(Account)
+    cache = EntityCache(
+        Analytic,
+        records_mode=True,
+        related_caches={'account': accounts},
+    )
+
+    assert cache.flat_values_list('account') == [
+        accounts.get_by_key(account_id)
+        for account_id in cache.flat_values_list('account_id')
+    ]
+
+
+def test_related_record(records_cache):
+    """
+    Связанные объекты записи доступны через атрибуты
+    """
+    record = next(
+        record
+        for record in records_cache.entities
+        if record.supplier_id is not None
+    )
+    entity = Analytic.objects.select_related('supplier').get(pk=record.pk)
+
+    assert record.supplier.pk == entity.supplier_id
+    assert record.supplier.code == entity.supplier.code
+    assert record.account.pk == entity.account_id
+
+
+def test_as_model(records_cache):
+    """
+    Преобразование записи в объект модели с загруженными полями записи
+    """
+    record = records_cache.first()
+    entity = records_cache.as_model(record)
+    expected = Analytic.objects.get(pk=record.pk)
+
+    assert isinstance(entity, Analytic)
+    assert (entity.pk, entity.code, entity.amount, entity.account_id) == (
+        expected.pk,
+        expected.code,
+        expected.amount,
+        expected.account_id,
+    )
+
+
+def test_only_fields():
+    """
+    В режиме записей хранятся только перечисленные поля
+    """
+    cache = EntityCache(
+        Analytic,
+        records_mode=True,
+        only_fields=('code', 'account'),
+    )
+    entity = cache.as_model(cache.first())
+
+    assert 'amount' in entity.get_deferred_fields()
+    assert 'code' not in entity.get_deferred_fields()
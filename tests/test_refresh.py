@@ -0,0 +1,161 @@
+import datetime
+
+import pytest
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.enums import (
+    HashTableLayoutEnum,
+)
+from tests.models import (
+    Account,
+)
+
+
+pytestmark = pytest.mark.usefixtures('rollback')
+
+CHANGED_AT = datetime.datetime(2022, 1, 1)
+
+KWARGS = dict(
+    searching_key=('parent_id', 'code'),
+    indexes=('parent_id', 'name'),
+    additional_filter_params={'name__startswith': 'account'},
+    change_marker_field='updated_at',
+)
+
+VARIANTS = (
+    {},
+    {'records_mode': True},
+    {'hash_table_layout': HashTableLayoutEnum.FLAT, 'prefix_index': True},
+    {'only_fields': ('code', 'parent')},
+)
+
+
+def _normalize(item):
+    if isinstance(item, dict):
+        return {key: _normalize(value) for key, value in item.items()}
+
+    if isinstance(item, set):
+        return frozenset(entity.pk for entity in item)
+
+    if item is None or hasattr(item, 'pk'):
+        return getattr(item, 'pk', item)
+
+    return sorted(entity.pk for entity in item)
+
+
+def _change_accounts():
+    """
+    Изменение, добавление, удаление счетов и исключение счетов из выборки
+    кеша
+    """
+    pks = list(Account.objects.order_by('pk').values_list('pk', flat=True))
+
+    Account.objects.filter(pk__in=pks[:3]).update(
+        name='excluded',
+        updated_at=CHANGED_AT,
+    )
+    Account.objects.filter(pk__in=pks[3:8]).update(
+        code='X',
+        parent=pks[0],
+        updated_at=CHANGED_AT,
+    )
+
+    Account.objects.filter(pk__in=pks[-2:]).delete()
+
+    for index in range(3):
+        Account.objects.create(
+            code=f'N{index}',
+            name=f'account N{index}',
+            parent_id=pks[1],
+            begin=datetime.date(2020, 1, 1),
+            end=datetime.date(2021, 1, 1),
+            updated_at=CHANGED_AT,
+        )
+
+
+@pytest.mark.parametrize('variant', VARIANTS)
+def test_refresh(variant):
+    """
+    Обновленный кеш совпадает с кешем, построенным заново
+    """
+    cache = EntityCache(Account, **KWARGS, **variant)
+
+    _change_accounts()
+    cache.refresh()
+
+    fresh_cache = EntityCache(Account, **KWARGS, **variant)
+
+    assert _normalize(cache.entities) == _normalize(fresh_cache.entities)
+    assert cache.filter(name='excluded') == []
+
+    for entity in fresh_cache.entities:
+        for key, strict_mode in (
+            ((entity.parent_id, entity.code), True),
+            ((entity.parent_id, ), False),
+        ):
+            assert _normalize(
+                cache.get_by_key(key, strict_mode=strict_mode)
+            ) == _normalize(
+                fresh_cache.get_by_key(key, strict_mode=strict_mode)
+            )
+
+        assert _normalize(
+            cache.filter(parent_id=entity.parent_id)
+        ) == _normalize(
+            fresh_cache.filter(parent_id=entity.parent_id)
+        )
+
+
+def test_refresh_without_changes():
+    """
+    Обновление без изменений не изменяет кеш
+    """
+    cache = EntityCache(Account, **KWARGS)
+    pks = _normalize(cache.entities)
+
+    with CaptureQueriesContext(connection) as queries:
+        cache.refresh()
+
+    # Запросы измененных строк, строк, исключенных из выборки, и количества
+    # строк выборки
+    assert len(queries) == 3
+    assert _normalize(cache.entities) == pks
+
+
+@pytest.mark.parametrize('change_marker_field', ('updated_at', 'pk'))
+def test_refresh_after_delete(change_marker_field):
+    """
+    Строки, удаленные из БД, удаляются из кеша при обновлении
+    """
+    cache = EntityCache(
+        Account,
+        searching_key='code',
+        indexes=('parent_id', ),
+        change_marker_field=change_marker_field,
+    )
+    pk, code, parent_id = Account.objects.filter(
+        parent__isnull=False,
+    ).order_by('-pk').values_list('pk', 'code', 'parent_id')[0]
+
+    Account.objects.filter(pk=pk).delete()
+    cache.refresh()
+
+    assert cache.get_by_key(code) is None
+    assert pk not in _normalize(cache.filter(parent_id=parent_id))
+    assert _normalize(cache.entities) == _normalize(Account.objects.all())
+
+
+def test_refresh_without_change_marker():
+    """
+    Обновление кеша без поля-маркера изменения недоступно
+    """
+    with pytest.raises(ValueError):
+        EntityCache(Account).refresh()
@@ -0,0 +1,266 @@
+import threading
+import time
+from unittest import (
+    mock,
+)
+
+import pytest
+from django.db import (
+    OperationalError,
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    CacheStorage,
+    EntityCache,
+)
+from function_tools.registries import (
+    SharedCacheRegistry,
+)
+from tests.models import (
+    Account,
+    Analytic,
+    Supplier,
+)
+
+
+def test_same_params_share_cache():
+    """
+    Кеши с одинаковыми параметрами разделяются, разделяемые кеши доступны
+    только для чтения
+    """
+    registry = SharedCacheRegistry()
+    kwargs = dict(
+        searching_key='code',
+        additional_filter_params={'name__in': ['account 1', 'account 2']},
+        lazy=True,
+    )
+
+    cache = registry.get(EntityCache, Account, **kwargs)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert registry.get(EntityCache, Account, **kwargs) is cache
+
+    assert not queries
+    assert registry.get(EntityCache, Account) is not cache
+    assert cache.is_shared
+    assert cache.is_prepared
+
+    with pytest.raises(ValueError):
+        cache.refresh()
+
+    registry.invalidate(Account)
+
+    assert len(registry) == 0
+
+
+def test_eviction_by_entries_count():
+    """
+    Вытеснение давно не запрашивавшихся кешей при превышении количества
+    кешей
+    """
+    registry = SharedCacheRegistry(max_entries=2)
+
+    accounts = registry.get(EntityCache, Account)
+    suppliers = registry.get(EntityCache, Supplier)
+    registry.get(EntityCache, Account)
+    registry.get(EntityCache, Analytic)
+
+    assert len(registry) == 2
+    assert registry.get(EntityCache, Account) is accounts
+    assert accounts.is_prepared
+    assert not suppliers.is_prepared
+    assert registry.get(EntityCache, Supplier) is not suppliers
+
+
+def test_eviction_by_rows_count():
+    """
+    Вытеснение кешей при превышении суммарного количества строк
+    """
+    registry = SharedCacheRegistry(max_rows=100)
+
+    accounts = registry.get(EntityCache, Account)
+    registry.get(EntityCache, Supplier)
+    analytics = registry.get(EntityCache, Analytic)
+
+    assert len(registry) == 1
+    assert registry.rows_count == Analytic.objects.count()
+    assert not accounts.is_prepared
+    assert analytics.is_prepared
+
+
+def test_expiration():
+    """
+    Кеш с истекшим временем жизни строится заново
+    """
+    registry = SharedCacheRegistry(ttl=0.05)
+    cache = registry.get(EntityCache, Supplier)
+
+    time.sleep(0.1)
+
+    assert registry.get(EntityCache, Supplier) is not cache
+    assert not cache.is_prepared
+
+
+def test_removed_cache_is_closed_after_build():
+    """
+    Кеш с истекшим временем жизни закрывается после построения нового кеша
+    с тем же ключом
+    """
+    registry = SharedCacheRegistry(ttl=0.05)
+    cache = registry.get(EntityCache, Supplier)
+    prepare = EntityCache._prepare
+    is_prepared_while_building = []
+
+    def checking_prepare(self):
+        is_prepared_while_building.append(cache.is_prepared)
+        prepare(self)
+
+    time.sleep(0.1)
+
+    with mock.patch.object(EntityCache, '_prepare', checking_prepare):
+        new_cache = registry.get(EntityCache, Supplier)
+
+    assert new_cache is not cache
+    assert is_prepared_while_building == [True]
+    assert not cache.is_prepared
+    assert new_cache.is_prepared
+
+
+def test_registered_child_cache_is_not_closed():
+    """
+    При закрытии удаленного хранилища не закрываются его кеши, которые
+    также находятся в реестре
+    """
+    registry = SharedCacheRegistry(max_entries=2)
+
+    class Storage(CacheStorage):
+        def __init__(self):
+            super().__init__()
+
+            self.accounts = registry.get(EntityCache, Account)
+            self.suppliers = EntityCache(Supplier)
+
+    storage = registry.get(Storage)
+    accounts = registry.get(EntityCache, Account)
+    registry.get(EntityCache, Analytic)
+
+    assert len(registry) == 2
+    assert storage.accounts is accounts
+    assert accounts.is_prepared
+    assert not storage.suppliers.is_prepared
+
+
+def test_concurrent_get_builds_once():
+    """
+    Одновременный запрос кеша из нескольких потоков строит кеш один раз
+    """
+    registry = SharedCacheRegistry()
+    caches = []
+
+    threads = [
+        threading.Thread(
+            target=lambda: caches.append(registry.get(EntityCache, Analytic)),
+        )
+        for _ in range(4)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(caches) == 4
+    assert len(set(map(id, caches))) == 1
+
+
+def test_failed_build_is_serialized():
+    """
+    После ошибки построения ожидающие потоки строят кеш по очереди
+    """
+    registry = SharedCacheRegistry()
+    prepare = EntityCache._prepare
+    lock = threading.Lock()
+    state = {'active': 0, 'max_active': 0, 'calls': 0}
+    results = []
+
+    def flaky_prepare(self):
+        with lock:
+            state['calls'] += 1
+            state['active'] += 1
+            state['max_active'] = max(state['max_active'], state['active'])
+            is_failed = state['calls'] == 1
+
+        try:
+            time.sleep(0.05)
+
+            if is_failed:
+                raise OperationalError('connection lost')
+
+            prepare(self)
+        finally:
+            with lock:
+                state['active'] -= 1
+
+    def get_cache():
+        try:
+            results.append(registry.get(EntityCache, Account))
+        except OperationalError as error:
+            results.append(error)
+
+    with mock.patch.object(EntityCache, '_prepare', flaky_prepare):
+        threads = [threading.Thread(target=get_cache) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+    caches = [result for result in results if isinstance(result, EntityCache)]
+
+    assert state['max_active'] == 1
+    assert len(caches) == 3
+    assert len(set(map(id, caches))) == 1
+
+
+def test_shared_cache_concurrent_reads():
+    """
+    Одновременное чтение разделяемого кеша из нескольких потоков
+    """
+    registry = SharedCacheRegistry()
+    cache = registry.get(EntityCache, Account, indexes=('parent_id', ))
+    expected = sorted(
+        Account.objects.filter(parent_id=1).values_list('pk', flat=True)
+    )
+    errors = []
+
+    def read():
+        for _ in range(50):
+            pks = sorted(entity.pk for entity in cache.filter(parent_id=1))
+
+            if pks != expected:
+                errors.append(pks)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert 0 < cache.statistics.filter_count <= 200
+
+
+def test_invalid_budget():
+    """
+    Ограничения реестра должны быть положительными
+    """
+    with pytest.raises(ValueError):
+        SharedCacheRegistry(max_rows=0)
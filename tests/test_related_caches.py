@@ -0,0 +1,149 @@
+import pytest
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    CacheStorage,
+    EntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+    Supplier,
+)
+
+
+def test_related_cache_entities():
+    """
+    Связанные объекты берутся из связанных кешей без запросов к БД и
+    являются общими для ссылающихся на них объектов
+    """
+    accounts = EntityCache(Account)
+    suppliers = EntityCache(Supplier)
+    analytics = EntityCache(
+        Analytic,
+        related_caches={'account': accounts, 'supplier': suppliers},
+        select_related_fields=('account', ),
+        only_fields=('code', ),
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        for entity in analytics.entities:
+            assert entity.account is accounts.get_by_pks(
+                [entity.account_id]
+            )[entity.account_id]
+
+            if entity.supplier_id is not None:
+                assert entity.supplier.pk == entity.supplier_id
+
+    assert not queries
+
+    entity = analytics.first()
+
+    assert analytics.get_related(entity, 'account') is entity.account
+
+
+def _make_entity_cache(**kwargs):
+    return EntityCache(Account, **kwargs)
+
+
+def _make_columnar_cache(**kwargs):
+    pytest.importorskip('numpy')
+
+    from function_tools.columnar_caches import (
+        ColumnarEntityCache,
+    )
+
+    return ColumnarEntityCache(Account, **kwargs)
+
+
+@pytest.mark.parametrize(
+    'make_related_cache, kwargs',
+    (
+        (_make_entity_cache, {}),
+        (_make_entity_cache, {'records_mode': True}),
+        (_make_columnar_cache, {}),
+    ),
+    ids=('models', 'records', 'columnar'),
+)
+def test_related_cache_entities_are_models(make_related_cache, kwargs):
+    """
+    Объекты, полученные из связанных кешей в любом режиме, являются объектами
+    модели и общими для ссылающихся на них объектов
+    """
+    accounts = make_related_cache(**kwargs)
+    analytics = EntityCache(Analytic, related_caches={'account': accounts})
+
+    entity = analytics.get_by_key(1)
+
+    with CaptureQueriesContext(connection) as queries:
+        account = entity.account
+
+    assert not queries
+    assert isinstance(account, Account)
+    assert account.pk == entity.account_id
+    assert account.code == Account.objects.get(pk=entity.account_id).code
+    assert all(
+        item.account is account
+        for item in analytics.entities
+        if item.account_id == entity.account_id
+    )
+
+
+def test_related_caches_by_storage_names():
+    """
+    Связанные кеши, заданные именами, берутся из хранилища и готовятся
+    раньше зависящих от них кешей
+    """
+    class Storage(CacheStorage):
+        concurrent = True
+
+        def __init__(self):
+            super().__init__()
+
+            self.analytics = EntityCache(
+                Analytic,
+                related_caches={
+                    'account': 'accounts',
+                    'supplier': 'suppliers',
+                },
+            )
+            self.accounts = EntityCache(Account)
+            self.suppliers = EntityCache(Supplier)
+
+    storage = Storage()
+
+    assert storage._prepare_cache_dependencies()['analytics'] == {
+        'accounts',
+        'suppliers',
+    }
+
+    with CaptureQueriesContext(connection) as queries:
+        for entity in storage.analytics.entities:
+            entity.account.code
+
+    assert not queries
+
+
+def test_unknown_related_cache():
+    """
+    Связанный кеш должен быть в хранилище, поле должно быть внешним ключом
+    """
+    class Storage(CacheStorage):
+        def __init__(self):
+            super().__init__()
+
+            self.analytics = EntityCache(
+                Analytic,
+                related_caches={'account': 'missing'},
+            )
+
+    with pytest.raises(ValueError):
+        Storage()
+
+    with pytest.raises(ValueError):
+        EntityCache(Analytic, related_caches={'code': EntityCache(Account)})
@@ -0,0 +1,461 @@
+import datetime
+import logging
+import pickle
+from decimal import (
+    Decimal,
+)
+
+import pytest
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools import (
+    snapshots,
+)
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.registries import (
+    SharedCacheRegistry,
+)
+from function_tools.snapshot_caches import (
+    SnapshotEntityCache,
+)
+from function_tools.snapshots import (
+    EntitySnapshot,
+    hash_snapshot_key,
+    open_entity_snapshot,
+    write_entity_snapshot,
+)
+from tests.models import (
+    Account,
+    Analytic,
+)
+
+
+def _get_pks(item):
+    if isinstance(item, set):
+        return sorted(entity.pk for entity in item)
+
+    return getattr(item, 'pk', item)
+
+
+def _make_str(*parts):
+    """
+    Создание строки, не являющейся интернированной
+    """
+    return ''.join(parts)
+
+
+def _write_snapshot(path, version='v1'):
+    rows = [(index, index % 5, f'k{index % 3}') for index in range(50)]
+
+    write_entity_snapshot(
+        path=path,
+        version=version,
+        columns=('id', 'group', 'key'),
+        key_positions=(1, 2),
+        rows=rows,
+    )
+
+    return rows
+
+
+def test_snapshot_round_trip(tmp_path):
+    """
+    Чтение строк снимка и поиск строк по значениям ключа
+    """
+    path = str(tmp_path / 'rows.snap')
+    rows = _write_snapshot(path)
+
+    snapshot = EntitySnapshot(path)
+
+    try:
+        assert len(snapshot) == len(rows)
+        assert snapshot.columns == ('id', 'group', 'key')
+        assert list(snapshot.iterate_rows()) == rows
+        assert snapshot.find_row_indexes((1, 'k1')) == [
+            index
+            for index, row in enumerate(rows)
+            if row[1:] == (1, 'k1')
+        ]
+        assert snapshot.find_row_indexes((9, 'k1')) == []
+    finally:
+        snapshot.close()
+
+
+def test_hash_of_equal_but_distinct_keys():
+    """
+    Равные значения ключа с разной идентичностью объектов имеют один хеш
+    """
+    value = _make_str('ab', 'c')
+    same_value = _make_str('a', 'bc')
+
+    assert value is not same_value
+    assert hash_snapshot_key((value, value)) == hash_snapshot_key(
+        (value, same_value)
+    )
+
+
+def test_hash_of_equal_numbers():
+    """
+    Равные числа разных типов имеют один хеш
+    """
+    assert (
+        hash_snapshot_key((1, )) ==
+        hash_snapshot_key((True, )) ==
+        hash_snapshot_key((1.0, )) ==
+        hash_snapshot_key((Decimal('1.00'), ))
+    )
+    assert hash_snapshot_key((Decimal('0.5'), )) == hash_snapshot_key((0.5, ))
+
+
+def test_hash_of_different_keys():
+    """
+    Разные значения ключа имеют разный хеш
+    """
+    assert hash_snapshot_key(('1', )) != hash_snapshot_key((1, ))
+    assert hash_snapshot_key(('a', 'b')) != hash_snapshot_key(('ab', ''))
+    assert hash_snapshot_key((None, )) != hash_snapshot_key(('None', ))
+    assert hash_snapshot_key(
+        (datetime.date(2021, 1, 1), )
+    ) != hash_snapshot_key(
+        (datetime.date(2021, 1, 2), )
+    )
+
+
+def test_find_rows_by_equal_but_distinct_keys(tmp_path):
+    """
+    Строки снимка находятся по равным, но не идентичным значениям ключа
+    """
+    path = str(tmp_path / 'rows.snap')
+    rows = [
+        (index, _make_str('k', str(index % 5)), Decimal(index % 3))
+        for index in range(50)
+    ]
+
+    write_entity_snapshot(
+        path=path,
+        version='v1',
+        columns=('id', 'key', 'amount'),
+        key_positions=(1, 2),
+        rows=rows,
+    )
+
+    snapshot = EntitySnapshot(path)
+
+    try:
+        key = (_make_str('k', '1'), 1)
+        expected = [
+            index
+            for index, row in enumerate(rows)
+            if (row[1], row[2]) == key
+        ]
+
+        assert expected
+        assert snapshot.find_row_indexes(key) == expected
+        assert snapshot.find_row_indexes((_make_str('k', '1'), 1.0)) == (
+            expected
+        )
+        assert snapshot.find_row_indexes(('k9', 0)) == []
+    finally:
+        snapshot.close()
+
+    assert list(tmp_path.iterdir()) == [tmp_path / 'rows.snap']
+
+
+def test_open_snapshot_with_other_version(tmp_path):
+    """
+    Снимок с другой меткой версии и отсутствующий снимок не открываются
+    """
+    path = str(tmp_path / 'rows.snap')
+
+    assert open_entity_snapshot(path, 'v1') is None
+
+    _write_snapshot(path)
+
+    assert open_entity_snapshot(path, 'v2') is None
+
+    snapshot = open_entity_snapshot(path, 'v1')
+
+    assert snapshot is not None
+
+    snapshot.close()
+
+
+@pytest.mark.parametrize(
+    'searching_key',
+    ('code', ('account_id', 'code')),
+)
+def test_snapshot_cache_round_trip(tmp_path, searching_key):
+    """
+    Кеш, открытый из снимка, находит те же объекты, что и обычный кеш, без
+    запроса строк
+    """
+    path = str(tmp_path / 'analytics.snap')
+    reference_cache = EntityCache(
+        Analytic,
+        searching_key=searching_key,
+        records_mode=True,
+    )
+
+    built_cache = SnapshotEntityCache(
+        Analytic,
+        searching_key=searching_key,
+        snapshot_path=path,
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        loaded_cache = SnapshotEntityCache(
+            Analytic,
+            searching_key=searching_key,
+            snapshot_path=path,
+            indexes=('status', ),
+        )
+
+    assert not built_cache.is_loaded_from_snapshot
+    assert loaded_cache.is_loaded_from_snapshot
+    assert not queries
+
+    for entity in reference_cache.entities:
+        code = _make_str(entity.code[:1], entity.code[1:])
+        key = (
+            code if
+            isinstance(searching_key, str) else
+            (entity.account_id, code)
+        )
+
+        assert _get_pks(loaded_cache.get_by_key(key)) == _get_pks(
+            reference_cache.get_by_key(key)
+        )
+
+    assert _get_pks(set(loaded_cache.filter(status='active'))) == _get_pks(
+        set(reference_cache.filter(status='active'))
+    )
+    assert len(loaded_cache.entities) == len(reference_cache.entities)
+
+
+def test_snapshot_cache_with_other_params(tmp_path):
+    """
+    Снимок кеша с другими параметрами выборки строится заново
+    """
+    path = str(tmp_path / 'accounts.snap')
+
+    SnapshotEntityCache(Account, searching_key='code', snapshot_path=path)
+    cache = SnapshotEntityCache(
+        Account,
+        searching_key='code',
+        snapshot_path=path,
+        additional_filter_params={'name': 'account 1'},
+    )
+
+    assert not cache.is_loaded_from_snapshot
+    assert [entity.name for entity in cache.entities] == ['account 1']
+
+
+class UnsafeValue:
+    """
+    Значение, класс которого не допускается в снимке
+    """
+
+    def __eq__(self, other):
+        return isinstance(other, UnsafeValue)
+
+
+def test_snapshot_with_unsafe_values(tmp_path, monkeypatch):
+    """
+    Значения недопустимых типов не записываются в снимок и не
+    восстанавливаются из измененного файла снимка
+    """
+    path = str(tmp_path / 'rows.snap')
+
+    with pytest.raises(pickle.UnpicklingError):
+        write_entity_snapshot(
+            path=path,
+            version='v1',
+            columns=('id', 'value'),
+            key_positions=(0, ),
+            rows=[(1, UnsafeValue())],
+        )
+
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setattr(
+        snapshots,
+        '_dumps',
+        lambda value: pickle.dumps(value, protocol=4),
+    )
+    write_entity_snapshot(
+        path=path,
+        version='v1',
+        columns=('id', 'value'),
+        key_positions=(0, ),
+        rows=[(1, UnsafeValue())],
+    )
+
+    snapshot = EntitySnapshot(path)
+
+    try:
+        with pytest.raises(pickle.UnpicklingError):
+            snapshot.get_row(0)
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_with_model_field_values(tmp_path):
+    """
+    Значения полей моделей восстанавливаются из снимка
+    """
+    path = str(tmp_path / 'rows.snap')
+    row = (
+        1,
+        Decimal('1.50'),
+        datetime.date(2021, 1, 1),
+        datetime.datetime(2021, 1, 1, 12, tzinfo=datetime.timezone.utc),
+        datetime.timedelta(days=1),
+        b'bytes',
+        None,
+        True,
+    )
+
+    write_entity_snapshot(
+        path=path,
+        version='v1',
+        columns=tuple(f'column_{index}' for index in range(len(row))),
+        key_positions=(0, ),
+        rows=[row],
+        extra={'change_marker_value': datetime.datetime(2021, 1, 1)},
+    )
+
+    snapshot = EntitySnapshot(path)
+
+    try:
+        assert snapshot.get_row(0) == row
+        assert snapshot.extra['change_marker_value'] == datetime.datetime(
+            2021,
+            1,
+            1,
+        )
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_cache_close(tmp_path):
+    """
+    Закрытие кеша закрывает снимок, при следующем обращении снимок
+    открывается заново
+    """
+    path = str(tmp_path / 'accounts.snap')
+
+    SnapshotEntityCache(Account, searching_key='code', snapshot_path=path)
+    cache = SnapshotEntityCache(
+        Account,
+        searching_key='code',
+        snapshot_path=path,
+    )
+    snapshot = cache._snapshot
+
+    cache.close()
+
+    assert not cache.is_loaded_from_snapshot
+    assert snapshot._mmap.closed
+    assert cache.get_by_key('101').pk == 1
+    assert cache.is_loaded_from_snapshot
+    assert cache._snapshot is not snapshot
+
+
+def test_snapshot_cache_write_error(tmp_path, caplog):
+    """
+    Ошибка записи снимка не прерывает подготовку кеша
+    """
+    path = str(tmp_path / 'missing' / 'accounts.snap')
+
+    with caplog.at_level(logging.ERROR):
+        cache = SnapshotEntityCache(
+            Account,
+            searching_key='code',
+            snapshot_path=path,
+        )
+
+    assert cache.is_prepared
+    assert not cache.is_loaded_from_snapshot
+    assert cache.get_by_key('101').pk == 1
+    assert path in caplog.text
+
+
+@pytest.mark.usefixtures('rollback')
+def test_snapshot_cache_refresh(tmp_path):
+    """
+    Обновление кеша, открытого из снимка, переносит строки в память.
+    Разделяемый кеш не обновляется
+    """
+    path = str(tmp_path / 'accounts.snap')
+    kwargs = dict(
+        searching_key='code',
+        snapshot_path=path,
+        change_marker_field='updated_at',
+    )
+
+    SnapshotEntityCache(Account, **kwargs)
+    cache = SnapshotEntityCache(Account, **kwargs)
+    shared_cache = SharedCacheRegistry().get(
+        SnapshotEntityCache,
+        Account,
+        **kwargs,
+    )
+
+    Account.objects.filter(code='101').update(
+        name='changed',
+        updated_at=datetime.datetime(2022, 1, 1),
+    )
+
+    cache.refresh()
+
+    assert not cache.is_loaded_from_snapshot
+    assert cache.get_by_key('101').name == 'changed'
+
+    with pytest.raises(ValueError):
+        shared_cache.refresh()
+
+    assert shared_cache.is_loaded_from_snapshot
+    assert shared_cache.get_by_key('101').name != 'changed'
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    (
+        {'records_mode': False},
+        {'hash_table_layout': 'nested'},
+        {'prefix_index': True},
+    ),
+)
+def test_snapshot_cache_incompatible_params(tmp_path, kwargs):
+    """
+    Параметры, несовместимые со снимком, не принимаются
+    """
+    with pytest.raises(ValueError, match=next(iter(kwargs))):
+        SnapshotEntityCache(
+            Account,
+            snapshot_path=str(tmp_path / 'accounts.snap'),
+            **kwargs,
+        )
+
+
+def test_snapshot_cache_partial_key(tmp_path):
+    """
+    Поиск по части ключа в кеше со снимком не поддерживается
+    """
+    cache = SnapshotEntityCache(
+        Analytic,
+        searching_key=('account_id', 'code'),
+        snapshot_path=str(tmp_path / 'analytics.snap'),
+        records_mode=True,
+        prefix_index=False,
+    )
+
+    with pytest.raises(ValueError, match='strict_mode=False'):
+        cache.get_by_key((1, ), strict_mode=False)
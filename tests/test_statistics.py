@@ -0,0 +1,129 @@
+import json
+
+from function_tools.caches import (
+    CacheStorage,
+    EntityCache,
+)
+from function_tools.helpers import (
+    BaseHelper,
+)
+from tests.models import (
+    Account,
+    Analytic,
+)
+
+
+class Storage(CacheStorage):
+    """
+    Хранилище кешей для проверки статистики
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.analytics = EntityCache(
+            Analytic,
+            searching_key=('account_id', 'code'),
+            indexes=('status', ),
+        )
+        self.accounts = EntityCache(
+            Account,
+            searching_key='code',
+            change_marker_field='updated_at',
+        )
+
+
+class Helper(BaseHelper):
+    """
+    Помощник с хранилищем кешей
+    """
+
+    def _prepare_cache_class(self):
+        return Storage
+
+
+def test_cache_statistics():
+    """
+    Учет построения кеша, попаданий и промахов поиска
+    """
+    cache = EntityCache(
+        Analytic,
+        searching_key=('account_id', 'code'),
+        indexes=('status', ),
+    )
+    entity = cache.first()
+    key = (entity.account_id, entity.code)
+
+    cache.get_by_key(key)
+    cache.get_by_key((0, 'missing'))
+    cache.get_many([key, (0, 'missing')])
+    cache.filter(status='active')
+    cache.filter(status='missing')
+
+    statistics = cache.statistics
+
+    assert statistics.rows_count == Analytic.objects.count()
+    assert statistics.query_time > 0
+    assert statistics.build_time > 0
+    assert (
+        statistics.get_by_key_count,
+        statistics.get_by_key_hits,
+        statistics.get_by_key_misses,
+        statistics.get_many_count,
+        statistics.get_many_hits,
+        statistics.get_many_misses,
+        statistics.filter_count,
+        statistics.filter_hits,
+        statistics.filter_misses,
+    ) == (2, 1, 1, 1, 1, 1, 2, 1, 1)
+    assert cache.estimate_memory_size() > 0
+
+
+def test_statistics_of_caches_are_independent():
+    """
+    Обращения к кешу учитываются только в статистике этого кеша
+    """
+    accounts = EntityCache(Account, searching_key='code')
+    other_accounts = EntityCache(Account, searching_key='code')
+
+    accounts.get_by_key('101')
+    accounts.get_by_key('missing')
+    accounts.get_many(['101', 'missing'])
+
+    assert accounts.statistics.get_by_key_count == 2
+    assert accounts.statistics.get_by_key_hits == 1
+    assert accounts.statistics.get_many_hits == 1
+    assert accounts.statistics.get_many_misses == 1
+    assert other_accounts.statistics.get_by_key_count == 0
+    assert other_accounts.statistics.get_many_count == 0
+
+
+def test_refresh_statistics():
+    """
+    Учет обновлений кеша
+    """
+    cache = EntityCache(Account, change_marker_field='updated_at')
+
+    cache.refresh()
+
+    assert cache.statistics.refresh_count == 1
+
+
+def test_helper_statistics_report():
+    """
+    Отчет помощника включает статистику хранилища и его кешей
+    """
+    helper = Helper()
+    storage = helper.cache
+
+    storage.accounts.get_by_key('101')
+
+    report = helper.get_statistics_report()
+
+    json.dumps(report)
+
+    assert storage.statistics.rows_count == sum(
+        cache.statistics.rows_count for cache in storage.caches.values()
+    )
+    assert storage.statistics.get_by_key_hits == 1
+    assert json.dumps(report).count('"rows_count"') >= 3
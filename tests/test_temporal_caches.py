@@ -0,0 +1,154 @@
+import datetime
+from types import (
+    SimpleNamespace,
+)
+
+import pytest
+
+from function_tools.caches import (
+    ActualEntityCache,
+    EntityCache,
+)
+from function_tools.indexes import (
+    IntervalIndex,
+)
+from function_tools.period_caches import (
+    TemporalEntityCache,
+)
+from tests.models import (
+    Account,
+    Analytic,
+)
+
+
+DAY = datetime.timedelta(days=1)
+SEARCHING_KEY = ('account_id', 'code')
+
+
+def _get_pks(item):
+    if item is None:
+        return None
+
+    if isinstance(item, set):
+        return frozenset(entity.pk for entity in item)
+
+    return item.pk
+
+
+def _get_boundary_dates():
+    """
+    Границы периодов действия аналитик и соседние с ними даты
+    """
+    dates = set()
+
+    for begin, end in Analytic.objects.values_list('begin', 'end'):
+        dates |= {begin - DAY, begin, end, end + DAY}
+
+    return sorted(dates)
+
+
+def test_interval_index_endpoints():
+    """
+    Версия актуальна на даты начала и окончания периода включительно
+    """
+    index = IntervalIndex('code')
+    begin = datetime.date(2020, 1, 10)
+    end = datetime.date(2020, 1, 20)
+    versions = [
+        SimpleNamespace(code='A', begin=begin, end=end),
+        SimpleNamespace(code='A', begin=end + DAY, end=end + 10 * DAY),
+        SimpleNamespace(code='B', begin=end, end=end),
+        SimpleNamespace(code='C', begin=None, end=end),
+    ]
+
+    for row_index, version in enumerate(versions):
+        index.add(version, row_index)
+
+    assert index.get_actual('A', begin - DAY) == []
+    assert index.get_actual('A', begin) == [0]
+    assert index.get_actual('A', end) == [0]
+    assert index.get_actual('A', end + DAY) == [1]
+    assert index.get_actual('A', end + 11 * DAY) == []
+    assert index.get_actual('B', end) == [2]
+    assert index.get_actual('C', end) == []
+
+    assert sorted(index.all_actual(begin - DAY)) == []
+    assert sorted(index.all_actual(end)) == [0, 2]
+    assert sorted(index.all_actual(end + DAY)) == [1]
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    (
+        {},
+        {'records_mode': True},
+        {'only_fields': ('code', 'account')},
+    ),
+)
+def test_temporal_cache_at_boundaries(kwargs):
+    """
+    Актуальные на даты границ периодов объекты совпадают с объектами
+    ActualEntityCache
+    """
+    cache = TemporalEntityCache(
+        Analytic,
+        searching_key=SEARCHING_KEY,
+        **kwargs,
+    )
+
+    for date in _get_boundary_dates()[::3]:
+        reference_cache = ActualEntityCache(
+            date,
+            Analytic,
+            searching_key=SEARCHING_KEY,
+        )
+
+        assert sorted(
+            entity.pk for entity in cache.all_actual(date)
+        ) == sorted(
+            entity.pk for entity in reference_cache.entities
+        )
+
+        for entity in reference_cache.entities:
+            key = (entity.account_id, entity.code)
+
+            assert _get_pks(cache.get_actual(key, date)) == _get_pks(
+                reference_cache.get_by_key(key)
+            )
+
+    assert cache.get_actual((1, 'missing'), datetime.date(2020, 1, 1)) is None
+
+
+@pytest.mark.usefixtures('rollback')
+def test_refresh_adds_version():
+    """
+    Обновление кеша добавляет новую версию объекта
+    """
+    cache = TemporalEntityCache(
+        Account,
+        searching_key='code',
+        change_marker_field='updated_at',
+    )
+    account = Account.objects.get(code='101')
+
+    Account.objects.create(
+        code='101',
+        name='version 2',
+        begin=account.end + DAY,
+        end=datetime.date(2030, 1, 1),
+        updated_at=datetime.datetime(2023, 1, 1),
+    )
+
+    cache.refresh()
+
+    assert cache.get_actual('101', account.end).name == account.name
+    assert cache.get_actual('101', account.end + DAY).name == 'version 2'
+    assert len(cache.all_actual(account.end + DAY)) == len(
+        EntityCache(
+            Account,
+            additional_filter_params={
+                'begin__lte': account.end + DAY,
+                'end__gte': account.end + DAY,
+            },
+        ).entities
+    )
@@ -0,0 +1,172 @@
+import datetime
+from unittest import (
+    mock,
+)
+
+import pytest
+
+from function_tools.tree_caches import (
+    TreeEntityCache,
+)
+from tests.models import (
+    Account,
+)
+
+
+@pytest.fixture
+def parents():
+    return dict(Account.objects.values_list('pk', 'parent_id'))
+
+
+def _get_ancestors(parents, pk):
+    ancestors = []
+    parent_id = parents[pk]
+
+    while parent_id is not None and parent_id in parents:
+        ancestors.append(parent_id)
+        parent_id = parents[parent_id]
+
+    return ancestors
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    (
+        {},
+        {'records_mode': True},
+        {'only_fields': ('code', )},
+        {'memory_budget': 10},
+    ),
+)
+def test_tree(parents, kwargs):
+    """
+    Обход иерархии совпадает с обходом по родительским ссылкам
+    """
+    cache = TreeEntityCache(Account, **kwargs)
+
+    for pk in parents:
+        ancestors = _get_ancestors(parents, pk)
+        descendants = {
+            other_pk
+            for other_pk in parents
+            if pk in _get_ancestors(parents, other_pk)
+        }
+
+        assert [entity.pk for entity in cache.ancestors(pk)] == ancestors
+        assert {entity.pk for entity in cache.descendants(pk)} == descendants
+        assert cache.subtree(cache.get_by_key(pk))[0].pk == pk
+        assert len(cache.subtree(pk)) == len(descendants) + 1
+        assert cache.depth(pk) == len(ancestors)
+        assert {entity.pk for entity in cache.children(pk)} == {
+            other_pk
+            for other_pk, parent_id in parents.items()
+            if parent_id == pk
+        }
+
+        parent = cache.parent(pk)
+
+        assert (parent.pk if parent else None) == parents[pk]
+
+    assert {entity.pk for entity in cache.roots} == {
+        pk for pk, parent_id in parents.items() if parent_id is None
+    }
+    assert cache.depth(0) is None
+    assert cache.subtree(0) == []
+    assert cache.ancestors(0) == []
+
+
+def test_orphans_are_roots():
+    """
+    Объекты, родители которых не попали в кеш, являются корнями
+    """
+    cache = TreeEntityCache(
+        Account,
+        additional_filter_params={'code__startswith': '101.01'},
+    )
+
+    assert cache.roots
+    assert all(entity.code == '101.01' for entity in cache.roots)
+    assert all(cache.parent(entity) is None for entity in cache.roots)
+    assert len(cache.entities) == sum(
+        len(cache.subtree(entity)) for entity in cache.roots
+    )
+
+
+@pytest.mark.usefixtures('rollback')
+def test_cycle():
+    """
+    Цикл в иерархии не приводит к зацикливанию обхода
+    """
+    first, second = Account.objects.filter(
+        parent__isnull=False,
+    ).order_by('pk')[:2]
+
+    Account.objects.filter(pk=first.pk).update(parent=second.pk)
+    Account.objects.filter(pk=second.pk).update(parent=first.pk)
+
+    cache = TreeEntityCache(Account)
+
+    assert len(cache._tree_order) == Account.objects.count()
+    assert cache.depth(first.pk) is not None
+    assert len(cache.ancestors(second.pk)) < 2
+    assert len(cache.subtree(first.pk)) >= 1
+
+
+@pytest.mark.usefixtures('rollback')
+def test_refresh(parents):
+    """
+    Обновление кеша перестраивает иерархию
+    """
+    cache = TreeEntityCache(Account, change_marker_field='updated_at')
+    root_pk = next(
+        pk for pk, parent_id in parents.items() if parent_id is None
+    )
+    leaf_pk = max(parents)
+
+    Account.objects.filter(pk=leaf_pk).update(
+        parent=root_pk,
+        updated_at=datetime.datetime(2022, 1, 1),
+    )
+    child = Account.objects.create(
+        code='new',
+        parent_id=leaf_pk,
+        begin=datetime.date(2020, 1, 1),
+        end=datetime.date(2021, 1, 1),
+        updated_at=datetime.datetime(2022, 1, 1),
+    )
+
+    cache.refresh()
+
+    assert cache.parent(leaf_pk).pk == root_pk
+    assert cache.depth(leaf_pk) == 1
+    assert [entity.pk for entity in cache.ancestors(child.pk)] == [
+        leaf_pk,
+        root_pk,
+    ]
+    assert child.pk in {entity.pk for entity in cache.descendants(root_pk)}
+
+
+def test_refresh_prepares_tree_once():
+    """
+    Дерево строится один раз как при подготовке кеша обновлением, так и при
+    инкрементальном обновлении
+    """
+    cache = TreeEntityCache(
+        Account,
+        change_marker_field='updated_at',
+        lazy=True,
+    )
+
+    with mock.patch.object(
+        TreeEntityCache,
+        '_prepare_tree',
+        autospec=True,
+        side_effect=TreeEntityCache._prepare_tree,
+    ) as prepare_tree:
+        cache.refresh()
+
+        assert prepare_tree.call_count == 1
+
+        cache.refresh()
+
+        assert prepare_tree.call_count == 2
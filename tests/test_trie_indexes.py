@@ -0,0 +1,109 @@
+import pytest
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.indexes import (
+    TrieIndex,
+)
+from tests.models import (
+    Account,
+)
+
+
+PREFIXES = (
+    '',
+    '1',
+    '10',
+    '101',
+    '101.',
+    '101.0',
+    '101.01',
+    '101.01.0',
+    '101.01.04',
+    '101.01.045',
+    '2',
+    'zzz',
+)
+
+
+@pytest.fixture(scope='module')
+def codes():
+    return list(Account.objects.values_list('code', flat=True))
+
+
+@pytest.mark.parametrize('separator', (None, '.'))
+@pytest.mark.parametrize(
+    'kwargs',
+    (
+        {},
+        {'records_mode': True},
+        {'memory_budget': 10},
+    ),
+)
+def test_filter_by_prefix(separator, kwargs):
+    """
+    Фильтрация по началу кода совпадает с фильтрацией запросом к БД
+    """
+    cache = EntityCache(
+        Account,
+        indexes=(TrieIndex('code', separator=separator), ),
+        **kwargs,
+    )
+
+    for prefix in PREFIXES:
+        assert sorted(
+            entity.pk for entity in cache.filter(code__startswith=prefix)
+        ) == sorted(
+            Account.objects.filter(
+                code__startswith=prefix,
+            ).values_list('pk', flat=True)
+        )
+        assert sorted(
+            entity.pk
+            for entity in cache.filter(
+                code__in=[prefix, '101'],
+                code__startswith='10',
+            )
+        ) == sorted(
+            Account.objects.filter(
+                code__in=[prefix, '101'],
+                code__startswith='10',
+            ).values_list('pk', flat=True)
+        )
+
+
+@pytest.mark.parametrize('separator', (None, '.'))
+def test_find_longest_prefix(codes, separator):
+    """
+    Поиск объекта по наибольшему префиксу кода
+    """
+    cache = EntityCache(
+        Account,
+        indexes=(TrieIndex('code', separator=separator), ),
+    )
+
+    for value in (
+        '101.01.04.99',
+        '101.01.0',
+        '101.01',
+        '999',
+        '101.019',
+    ):
+        prefixes = [
+            code
+            for code in codes
+            if value.startswith(code) and (
+                separator is None or
+                value == code or
+                value.startswith(code + separator)
+            )
+        ]
+        entity = cache.find_longest_prefix('code', value)
+
+        assert (entity.code if entity is not None else None) == (
+            max(prefixes, key=len) if prefixes else None
+        )
+
+    with pytest.raises(ValueError):
+        cache.find_longest_prefix('name', 'account')
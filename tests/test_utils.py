@@ -0,0 +1,72 @@
+from types import (
+    SimpleNamespace,
+)
+
+from django.db import (
+    connection,
+)
+from django.test.utils import (
+    CaptureQueriesContext,
+)
+
+from function_tools.caches import (
+    EntityCache,
+)
+from function_tools.utils import (
+    compile_attrs_getter,
+    prepare_model_attr_path,
+)
+from tests.models import (
+    Analytic,
+)
+
+
+def test_compile_attrs_getter():
+    """
+    Получение значений атрибутов с пустыми значениями для прерванных цепочек
+    """
+    obj = SimpleNamespace(
+        code='C1',
+        parent=SimpleNamespace(code='P1'),
+        empty=None,
+    )
+
+    assert compile_attrs_getter(('code', ))(obj) == ('C1', )
+    assert compile_attrs_getter(('code', 'parent.code'))(obj) == ('C1', 'P1')
+    assert compile_attrs_getter(('code', 'empty.code'))(obj) == ('C1', None)
+    assert compile_attrs_getter(('missing', ))(obj) == (None, )
+    assert compile_attrs_getter(('code', )) is compile_attrs_getter(
+        ('code', )
+    )
+
+
+def test_prepare_model_attr_path():
+    """
+    Пути к первичным ключам связанных объектов заменяются колонками модели
+    """
+    assert prepare_model_attr_path(Analytic, 'pk') == 'id'
+    assert prepare_model_attr_path(Analytic, 'supplier.pk') == 'supplier_id'
+    assert prepare_model_attr_path(Analytic, 'supplier.id') == 'supplier_id'
+    assert prepare_model_attr_path(Analytic, 'supplier.code') == (
+        'supplier.code'
+    )
+
+
+def test_key_by_related_pk_does_not_fetch_related():
+    """
+    Построение кеша по первичному ключу связанного объекта не загружает
+    связанные объекты
+    """
+    with CaptureQueriesContext(connection) as queries:
+        cache = EntityCache(Analytic, searching_key=('supplier.id', 'code'))
+
+    assert len(queries) == 1
+
+    entity = next(
+        entity
+        for entity in cache.entities
+        if entity.supplier_id is not None
+    )
+    item = cache.get_by_key((entity.supplier_id, entity.code))
+
+    assert entity in (item if isinstance(item, set) else {item})